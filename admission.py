@@ -0,0 +1,251 @@
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from metrics import counter, gauge, histogram
+from solver_pool import cpuCount
+
+# estimated milliseconds of solver work of a solve (p50 to p99 of a scrambled cube), by cube type and engine
+COSTS = {
+    ("2x2", "optimal"): 1,
+    ("2x2", "ortega"): 15,
+    ("3x3", "cfop"): 5,
+    # the least the budgeted engines cost: one CFOP solve per candidate they always try
+    ("3x3", "neutral"): 30,
+    ("3x3", "neutral24"): 120,
+    ("3x3", "anytime"): 5,
+    ("4x4", "staged"): 150,
+    ("4x4", "reduction"): 100
+}
+# engines that keep searching until their time budget runs out, they cost their budget
+BUDGETED = ("neutral", "neutral24", "anytime")
+DEFAULT_BUDGET_MS = 1000
+# estimated milliseconds of every frame of an animation (applying its moves and copying the faces)
+FRAME_COSTS = {"2x2": 0.07, "3x3": 0.08, "4x4": 0.15}
+# estimated milliseconds of warming a cube type up (loading its tables and solving warmup.SCRAMBLES)
+WARMUP_COSTS = {"2x2": 20, "3x3": 10, "4x4": 400}
+# requests estimated to cost at most this go to the "fast" lane, the others to "search" ("batch" for batches)
+FAST_COST_MS = float(os.environ.get("PYCUBE_ADMISSION_FAST_MS", 50))
+
+admissionAdmitted = counter("pycube_admission_admitted_total", "Requests admitted by the admission controller.", ("lane",))
+admissionRejected = counter("pycube_admission_rejected_total", "Requests rejected with a 429 by the admission controller.", ("lane", "reason"))
+admissionWait = histogram("pycube_admission_wait_seconds", "Time admitted requests waited in the queue of their lane.",
+                          [0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0], ("lane",))
+
+class InvalidBudget(ValueError):
+    """
+    Raised for a time budget that is not a positive, finite number of milliseconds.
+    """
+
+def readBudget(value):
+    """
+    Reads the budget_ms of a request.
+
+    Returns
+    -------
+    budget_ms : float or None
+        The budget, None if there is none.
+
+    Raises
+    ------
+    InvalidBudget
+        If the budget is not a positive, finite number.
+    """
+    if(value is None):
+        return None
+    try:
+        budget_ms = float(value) if not isinstance(value, bool) else math.nan
+    except (TypeError, ValueError):
+        budget_ms = math.nan
+    if(not math.isfinite(budget_ms) or budget_ms <= 0):
+        raise InvalidBudget("budget_ms must be a positive number of milliseconds, not " + repr(value))
+    return budget_ms
+
+class Saturated(Exception):
+    """
+    Raised when a lane cannot take a request: its queue is full, or the request waited too long.
+
+    Parameters
+    ----------
+    lane : string
+        The name of the lane.
+    retry_after : int
+        Seconds after which the lane should have room again, for the Retry-After header.
+    """
+
+    def __init__(self, lane, retry_after):
+        super().__init__("The " + lane + " lane is saturated, retry in " + str(retry_after) + " s")
+        self.lane = lane
+        self.retry_after = retry_after
+
+def estimateCost(cube_type, engine, budget_ms = None):
+    """
+    Estimates the milliseconds of solver work of a solve, from COSTS or the time budget of the engine,
+    never less than its cost in COSTS.
+    """
+    cost = float(COSTS.get((cube_type, engine), FAST_COST_MS))
+    if(engine in BUDGETED):
+        return max(cost, float(DEFAULT_BUDGET_MS if budget_ms is None else budget_ms))
+    return cost
+
+def estimateFrames(cube_type, frames):
+    """
+    Estimates the milliseconds of work of an animation of a number of frames.
+    """
+    return 1.0 + FRAME_COSTS.get(cube_type, FRAME_COSTS["3x3"]) * frames
+
+def estimateWarmUp(cube_types):
+    """
+    Estimates the milliseconds of work of warming up cube types that are not warm yet.
+    """
+    return 1.0 + sum(WARMUP_COSTS.get(cube_type, 0) for cube_type in cube_types)
+
+def laneFor(cost):
+    """
+    Gives the lane of a single request of an estimated cost.
+    """
+    return "fast" if cost <= FAST_COST_MS else "search"
+
+class Lane:
+    """
+    A queue of requests, weighted by their estimated cost in milliseconds of work, in front of a
+    bounded amount of work in flight.
+
+    A request is admitted at once if its cost fits in what is left of the capacity (or if nothing is
+    in flight, so that a request bigger than the capacity still gets its turn). Otherwise it waits in
+    line, if the costs already waiting leave room for it in the queue, and is rejected otherwise.
+
+    Parameters
+    ----------
+    name : string
+        The name of the lane, e.g. "fast".
+    capacity : float
+        Milliseconds of estimated work the lane may have in flight.
+    queue_limit : float
+        Milliseconds of estimated work that may wait in line.
+    max_wait : float
+        Seconds a request may wait in line before it is rejected.
+
+    Example
+    -------
+    >>> lane = Lane("search", capacity=1000, queue_limit=4000, max_wait=5)
+    >>> with lane.admit(estimateCost("4x4", "staged")):
+    ...     solveState("4x4", cube_state, "staged")
+    """
+
+    def __init__(self, name, capacity, queue_limit, max_wait):
+        self.name = name
+        self.capacity = capacity
+        self.queue_limit = queue_limit
+        self.max_wait = max_wait
+        self.__condition = threading.Condition()
+        self.__inFlight = 0.0
+        self.__running = 0
+        self.__queued = 0.0
+        self.__line = []
+
+    def retryAfter(self):
+        """
+        Gives the seconds the lane needs to get through its work in flight and in line, at least 1,
+        taking the capacity as the work done per second.
+        """
+        return max(1, math.ceil((self.__inFlight + self.__queued) / self.capacity))
+
+    def __fits(self, cost):
+        return self.__running == 0 or self.__inFlight + cost <= self.capacity
+
+    def acquire(self, cost, deadline = None):
+        """
+        Waits for the lane to have room for a request, which then counts as in flight until release().
+
+        Parameters
+        ----------
+        cost : float
+            The estimated milliseconds of work of the request.
+        deadline : float, default=None
+            A time.monotonic() value after which the request is of no use, if sooner than `max_wait`.
+
+        Raises
+        ------
+        Saturated
+            If the queue has no room for the cost, or the request could not be admitted in time.
+        """
+        started = time.monotonic()
+        until = started + self.max_wait if deadline is None else min(deadline, started + self.max_wait)
+        with self.__condition:
+            if(len(self.__line) > 0 or not self.__fits(cost)):
+                # a request bigger than the whole queue may still wait when it would be next in line
+                if(self.__queued + cost > self.queue_limit and len(self.__line) > 0):
+                    admissionRejected.inc(lane=self.name, reason="queue_full")
+                    raise Saturated(self.name, self.retryAfter())
+                ticket = object()
+                self.__line.append(ticket)
+                self.__queued += cost
+                try:
+                    # requests are admitted in the order they came, a cheap one does not overtake a waiting one
+                    while(self.__line[0] is not ticket or not self.__fits(cost)):
+                        remaining = until - time.monotonic()
+                        if(remaining <= 0):
+                            admissionRejected.inc(lane=self.name, reason="timeout")
+                            raise Saturated(self.name, self.retryAfter())
+                        self.__condition.wait(remaining)
+                finally:
+                    self.__line.remove(ticket)
+                    self.__queued -= cost
+                    self.__condition.notify_all()
+            self.__inFlight += cost
+            self.__running += 1
+        admissionAdmitted.inc(lane=self.name)
+        admissionWait.observe(time.monotonic() - started, lane=self.name)
+
+    def release(self, cost):
+        """
+        Ends a request admitted by acquire().
+        """
+        with self.__condition:
+            self.__inFlight -= cost
+            self.__running -= 1
+            self.__condition.notify_all()
+
+    @contextmanager
+    def admit(self, cost, deadline = None):
+        """
+        Admits a request with acquire() for the block it runs in.
+        """
+        self.acquire(cost, deadline)
+        try:
+            yield
+        finally:
+            self.release(cost)
+
+    def inFlight(self):
+        """
+        Gives the estimated milliseconds of work in flight.
+        """
+        return self.__inFlight
+
+    def queued(self):
+        """
+        Gives the estimated milliseconds of work waiting in line.
+        """
+        return self.__queued
+
+def createLanes():
+    """
+    Gives the "fast", "search" and "batch" lanes, configured from the environment: each may have
+    PYCUBE_ADMISSION_CAPACITY_MS of work in flight (default a second of work per CPU) and 4 times
+    that in line (PYCUBE_ADMISSION_QUEUE_MS), for up to PYCUBE_ADMISSION_WAIT_MS (default 5000).
+    """
+    capacity = float(os.environ.get("PYCUBE_ADMISSION_CAPACITY_MS", 1000 * cpuCount()))
+    queue_limit = float(os.environ.get("PYCUBE_ADMISSION_QUEUE_MS", 4 * capacity))
+    max_wait = float(os.environ.get("PYCUBE_ADMISSION_WAIT_MS", 5000)) / 1000.0
+    return {name: Lane(name, capacity, queue_limit, max_wait) for name in ("fast", "search", "batch")}
+
+def registerGauges(lanes):
+    """
+    Exports the work in flight and in line of every lane at /metrics.
+    """
+    for name, lane in lanes.items():
+        gauge("pycube_admission_" + name + "_in_flight_ms", "Estimated milliseconds of work in flight in the " + name + " lane.", lane.inFlight)
+        gauge("pycube_admission_" + name + "_queued_ms", "Estimated milliseconds of work waiting in the " + name + " lane.", lane.queued)
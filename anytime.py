@@ -0,0 +1,110 @@
+import time
+from concurrent.futures import wait, FIRST_COMPLETED
+from color_neutral import RECOLORINGS, CROSS_RECOLORINGS, solveOrientation
+from solver_pool import cpuCount, getPool
+
+# single turns tried as a setup before the solve, once every orientation has been tried
+SETUPS = ["U", "U'", "U2", "D", "D'", "D2", "R", "R'", "R2", "L", "L'", "L2", "F", "F'", "F2", "B", "B'", "B2"]
+
+def candidates():
+    """
+    Gives the (recoloring, setup) pairs tried after the baseline, most promising first:
+    the other cross colors, then the other orientations, then setup turns from every cross color.
+    """
+    pairs = [(recoloring, "") for recoloring in CROSS_RECOLORINGS[1:]]
+    pairs += [(recoloring, "") for recoloring in RECOLORINGS if recoloring not in CROSS_RECOLORINGS]
+    pairs += [(recoloring, setup) for setup in SETUPS for recoloring in CROSS_RECOLORINGS]
+    return pairs
+
+def improve(cube_state, budget_ms, optimize = True):
+    """
+    Solves a 3x3 cube and keeps looking for shorter solutions until the time budget runs out.
+
+    The first result is the CFOP solution of the standard orientation, computed right away. The
+    alternatives of candidates() are then solved in the persistent process pool (or inline inside
+    a pool worker) and every shorter solution is yielded as soon as it is found.
+
+    Parameters
+    ----------
+    cube_state : list of size (6, 3, 3)
+        The cube faces matrix array.
+    budget_ms : float
+        Time budget in milliseconds, counted from the call.
+    optimize : bool, default=True
+        Passed on to the solver.
+
+    Yields
+    ------
+    best : dict
+        The best result so far (see color_neutral.solveOrientation()), along with "tried", the
+        number of candidates solved, "complete", whether all of them were, and "elapsed_ms".
+        The last value yielded is the final answer.
+    """
+    started = time.monotonic()
+    deadline = started + budget_ms / 1000.0
+    pending = candidates()
+    total = len(pending) + 1
+    best = solveOrientation(cube_state, RECOLORINGS[0], optimize)
+    tried = 1
+
+    def summary():
+        result = dict(best)
+        result["tried"] = tried
+        result["complete"] = tried == total
+        result["elapsed_ms"] = (time.monotonic() - started) * 1000.0
+        return result
+
+    def better(result):
+        if(result["solved"] != best["solved"]):
+            return result["solved"]
+        return result["length"] < best["length"]
+
+    yield summary()
+    pool = getPool()
+    if(pool is None):
+        for recoloring, setup in pending:
+            if(time.monotonic() >= deadline):
+                break
+            result = solveOrientation(cube_state, recoloring, optimize, setup)
+            tried += 1
+            if(better(result)):
+                best = result
+                yield summary()
+    else:
+        # keep a couple of candidates queued per worker so none of them idles between results
+        running = set()
+        queue = list(pending)
+        try:
+            while(time.monotonic() < deadline and (len(queue) > 0 or len(running) > 0)):
+                while(len(queue) > 0 and len(running) < 2 * cpuCount()):
+                    recoloring, setup = queue.pop(0)
+                    running.add(pool.submit(solveOrientation, cube_state, recoloring, optimize, setup))
+                done, running = wait(running, timeout=max(0.0, deadline - time.monotonic()), return_when=FIRST_COMPLETED)
+                for future in done:
+                    if(future.exception() is not None):
+                        continue
+                    tried += 1
+                    if(better(future.result())):
+                        best = future.result()
+                        yield summary()
+        finally:
+            for future in running:
+                future.cancel()
+    yield summary()
+
+def solve(cube_state, budget_ms, optimize = True):
+    """
+    Gives the best solution improve() finds within the time budget.
+
+    Example
+    -------
+    >>> cb = Cube()
+    >>> cb.doMoves(getScramble(25))
+    >>> result = solve(cb.getFaces(), 500)
+    >>> result["solved"]
+    True
+    """
+    best = None
+    for best in improve(cube_state, budget_ms, optimize):
+        pass
+    return best
@@ -1,17 +1,91 @@
-from flask import Flask, render_template, jsonify, request
-from cube import Cube
-from cube2x2 import Cube2x2
-from cube4x4 import Cube4x4
-from solver import Solver
-from solver4x4 import Solver4x4
-from solver2x2 import Solver2x2
-from helper import getScramble
-from helper2x2 import getScramble2x2
-from helper4x4 import getScramble4x4
+from flask import Flask, Response, g, render_template, jsonify, request, stream_with_context
+from helper import splitFormula
+from metrics import CONTENT_TYPE, renderMetrics
+from request_metrics import countCacheLookup, cubeTypeLabel, observeRequest
+from admission import InvalidBudget, Saturated, createLanes, estimateCost, estimateFrames, estimateWarmUp, laneFor, readBudget, registerGauges as registerLaneGauges
+from solve_service import getEngine, newCube, solveItem, streamSolve, publishStats
+from solution_cache import SolutionCache, solutionKey, registerGauges
+from solution_store import openStore
+from single_flight import SingleFlight, registerGauges as registerFlightGauges
+from state_format import checkFormat, readState, writeStates
+from structured_log import logEvent
+from solver_pool import DeadlineExceeded, RequestAbandoned, getPool, runInPool, socketClosed, submit
+from validator import CubeStateError, validateState
+from warmup import SCRAMBLES, isWarm, warmUp
+from concurrent.futures import as_completed, TimeoutError as FutureTimeoutError
 import json
+import logging
+import os
+import time
 
 app = Flask(__name__)
 
+# finished /api/solve payloads keyed by (cube_type, engine, optimize, state hash)
+solution_cache = SolutionCache(maxsize=int(os.environ.get('PYCUBE_CACHE_SIZE', 1024)),
+                               ttl=float(os.environ.get('PYCUBE_CACHE_TTL', 600)))
+registerGauges(solution_cache)
+# optional SQLite store shared by every worker on the host, enabled with PYCUBE_STORE_PATH
+solution_store = openStore()
+
+# identical /api/solve requests in flight share one solve, a follower waits this long for it before solving on its own
+single_flight = SingleFlight(timeout=float(os.environ.get('PYCUBE_SINGLE_FLIGHT_TIMEOUT_MS', 10000)) / 1000.0)
+registerFlightGauges(single_flight)
+
+# requests are admitted by estimated cost, cheap solves and searches in lanes of their own, and
+# turned away with a 429 when their lane is saturated rather than queuing until the gunicorn timeout
+lanes = createLanes()
+registerLaneGauges(lanes)
+
+# a solve that takes longer than this (or the request's deadline_ms) is given up with a 504
+DEFAULT_SOLVE_DEADLINE_MS = float(os.environ.get('PYCUBE_SOLVE_DEADLINE_MS', 30000))
+
+# cube types create_app() warms up before serving, the others are loaded by their first request (or /api/warmup)
+WARMUP_CUBE_TYPES = [cube_type.strip() for cube_type in os.environ.get('PYCUBE_WARMUP', '2x2,3x3,4x4').split(',') if cube_type.strip()]
+
+# limits of /api/solve_batch
+MAX_BATCH_ITEMS = int(os.environ.get('PYCUBE_BATCH_MAX_ITEMS', 1000))
+DEFAULT_BATCH_DEADLINE_MS = 60000
+
+@app.before_request
+def start_request():
+    g.started = time.perf_counter()
+
+@app.after_request
+def record_request(response):
+    """Record the latency, sizes and outcome of every request at /metrics, and log it"""
+    started = g.get('started', time.perf_counter())
+    # the route as declared, so that the labels stay few whatever the paths requested
+    route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+    # set by the routes that take a cube type, once they read it
+    cube_type = cubeTypeLabel(g.get('cube_type'))
+    status = str(response.status_code)
+    response_bytes = None if response.is_streamed else response.calculate_content_length()
+    # the routes answer most failures with a 200 and a success false payload, and say so with failure()
+    # or g.request_failed, which a stream may still set while it runs
+    flags = g._get_current_object()
+    method = request.method
+    request_bytes = request.content_length
+    
+    def finish():
+        # called once the response is sent, which for a stream is after its last event
+        seconds = time.perf_counter() - started
+        failed = response.status_code >= 400 or flags.get('request_failed', False)
+        observeRequest(route, cube_type, status, seconds, request_bytes, response_bytes, failed)
+        logEvent('request', logging.WARNING if failed else logging.INFO, method=method, route=route,
+                 cube_type=cube_type, status=response.status_code, ms=round(seconds * 1000, 3), bytes=response_bytes)
+    
+    response.call_on_close(finish)
+    return response
+
+def failure(payload):
+    """The JSON response of a failed request, counted as an error at /metrics"""
+    g.request_failed = True
+    return jsonify(payload)
+
+def log_failure(route, e):
+    """Log an exception a route answers with an error payload"""
+    logEvent('request_failed', logging.ERROR, route=route, error=str(e), error_type=type(e).__name__)
+
 @app.route('/')
 def index():
     return render_template('index.html')
@@ -23,186 +97,546 @@ def scramble_cube():
         data = request.get_json()
         scramble_length = data.get('length', 20)
         cube_type = data.get('cube_type', '3x3')  # '2x2', '3x3', or '4x4'
+        g.cube_type = cube_type
+        state_format = checkFormat(data.get('format'))
         
+        # the scramble helpers and the cube class are only imported for the cube types asked for
         if cube_type == '2x2':
-            # Create new 2x2 cube and scramble it
-            cube = Cube2x2()
+            from helper2x2 import getScramble2x2
             scramble = getScramble2x2(min(scramble_length, 11)) # Ortega is better, can handle more
-            cube.doMoves(scramble)
-            # Create readable version for display by adding spaces
-            import re
-            scramble_display = re.sub(r"([RUFDLBrufxyz](?:'|2)?)", r"\1 ", scramble).strip()
         elif cube_type == '4x4':
-            # Create new 4x4 cube and scramble it
-            cube = Cube4x4()
+            from helper4x4 import getScramble4x4
             scramble = getScramble4x4(min(scramble_length, 40)) # 4x4 needs more moves
-            cube.doMoves(scramble)
-            # Create readable version for display by adding spaces
-            import re
-            scramble_display = re.sub(r"([RUFDLBrufxyz](?:'|2)?)", r"\1 ", scramble).strip()
         else:
-            # Create new 3x3 cube and scramble it (default)
-            cube = Cube()
+            from helper import getScramble
             scramble = getScramble(scramble_length)
-            cube.doMoves(scramble)
-            scramble_display = scramble
+        cube = newCube(cube_type)
+        cube.doMoves(scramble)
+        # Create readable version for display by adding spaces
+        scramble_display = ' '.join(splitFormula(scramble)) or scramble
         
-        return jsonify({
+        return jsonify(writeStates({
             'success': True,
             'scramble': scramble_display,
             'cube_state': cube.getFaces(),
             'cube_display': str(cube),
             'cube_type': cube_type
-        })
+        }, state_format))
     except Exception as e:
-        print(f"Error in /api/scramble: {e}")
-        return jsonify({'success': False, 'error': str(e)})
+        log_failure('/api/scramble', e)
+        return failure({'success': False, 'error': str(e)})
 
 @app.route('/api/solve', methods=['POST'])
 def solve_cube():
     """Solve the cube and return step-by-step solution"""
     try:
         data = request.get_json()
-        cube_state = data.get('cube_state')
         cube_type = data.get('cube_type', '3x3')
+        g.cube_type = cube_type
+        cube_state = readState(data.get('cube_state'), cube_type)
+        state_format = checkFormat(data.get('format'))
+        optimize = bool(data.get('optimize', True))
+        want_stats = bool(data.get('stats', False))
+        budget_ms = readBudget(data.get('budget_ms'))
         
         if not cube_state:
-            return jsonify({'success': False, 'error': 'No cube state provided'})
+            return failure({'success': False, 'error': 'No cube state provided'})
         
-        if cube_type == '2x2':
-            cube = Cube2x2(faces=cube_state)
-            solver = Solver2x2(cube)
-            solver.solveCube(optimize=True)
-            solution_plain = solver.getMoves(decorated=False)
-            solution_decorated = solver.getMoves(decorated=True)
-            
-            # Since this uses the Ortega method, we don't have detailed steps like CFOP
-            steps = [{"name": "2x2 Solution (Ortega Method)", "moves": solution_plain}]
-
-            solved_cube = Cube2x2(faces=cube_state)
-            if solution_plain and "Already solved" not in solution_plain and "Could not solve" not in solution_plain:
-                solved_cube.doMoves(solution_plain)
+        # impossible states would only show up after a full solve, so they are rejected first
+        validateState(cube_type, cube_state)
+        engine = getEngine(cube_type, data.get('engine'), budget_ms)
+        key = solutionKey(cube_type, engine, optimize, cube_state)
+        deadline = time.monotonic() + float(data.get('deadline_ms', DEFAULT_SOLVE_DEADLINE_MS)) / 1000.0
+        abandoned = client_watch()
+        payload = lookup_solution(key)
+        cached = payload is not None
+        coalesced = False
+        if not cached:
+            def solve():
+                # the solve before may have finished between the lookup and taking the lead
+                return lookup_solution(key, count=False) or solve_and_keep(key, cube_type, cube_state, engine, optimize,
+                                                                           budget_ms, deadline, abandoned)
+            # the time budget changes the result of the anytime engines, so only equal budgets share a solve
+            payload, coalesced = shared_solve(key + (budget_ms,), solve, deadline, abandoned)
+        
+        countCacheLookup('/api/solve', cube_type, 'hit' if cached else 'coalesced' if coalesced else 'miss')
+        # the cached payload is shared, so the response is built on a copy
+        response = dict(payload)
+        if not want_stats:
+            response.pop('stats', None)
+        response['cached'] = cached
+        response['coalesced'] = coalesced
+        # e.g. a solve that ran out of its budget
+        g.request_failed = not payload.get('success')
+        return jsonify(writeStates(response, state_format))
+    except CubeStateError as e:
+        return failure({'success': False, 'error': str(e), 'error_code': e.code}), 422
+    except InvalidBudget as e:
+        return invalid_budget(e)
+    except Saturated as e:
+        return saturated(e)
+    except DeadlineExceeded as e:
+        return failure({'success': False, 'error': str(e), 'error_code': 'DEADLINE_EXCEEDED'}), 504
+    except RequestAbandoned as e:
+        # nobody reads this
+        return failure({'success': False, 'error': str(e)}), 499
+    except Exception as e:
+        log_failure('/api/solve', e)
+        return failure({'success': False, 'error': str(e)})
 
-        elif cube_type == '4x4':
-            cube = Cube4x4(faces=cube_state)
-            solver = Solver4x4(cube)
-            solver.solveCube(optimize=True)
-            solution_decorated = solver.getMoves(decorated=True)
-            solution_plain = solver.getMoves(decorated=False)
-            steps = [{"name": "4x4 Reduction Method", "moves": solution_plain}]
-            
-            solved_cube = Cube4x4(faces=cube_state)
-            if solution_plain and "Already solved" not in solution_plain and "Could not solve" not in solution_plain:
-                solved_cube.doMoves(solution_plain)
+@app.route('/api/solve/stream', methods=['POST'])
+def solve_cube_stream():
+    """Solve the cube like /api/solve, sending every step as a server-sent event as soon as it is computed"""
+    try:
+        data = request.get_json()
+        cube_type = data.get('cube_type', '3x3')
+        g.cube_type = cube_type
+        cube_state = readState(data.get('cube_state'), cube_type)
+        state_format = checkFormat(data.get('format'))
+        optimize = bool(data.get('optimize', True))
+        want_stats = bool(data.get('stats', False))
+        budget_ms = readBudget(data.get('budget_ms'))
+        
+        if not cube_state:
+            return failure({'success': False, 'error': 'No cube state provided'})
+        
+        validateState(cube_type, cube_state)
+        engine = getEngine(cube_type, data.get('engine'), budget_ms)
+        key = solutionKey(cube_type, engine, optimize, cube_state)
+        deadline = time.monotonic() + float(data.get('deadline_ms', DEFAULT_SOLVE_DEADLINE_MS)) / 1000.0
+        abandoned = client_watch()
+        payload = lookup_solution(key)
+        cost = estimateCost(cube_type, engine, budget_ms)
+        lane = laneFor(cost)
+        if payload is None:
+            # admitted like /api/solve, before the stream starts so that a saturated lane still gets a 429
+            lanes[lane].acquire(cost, deadline)
+    except CubeStateError as e:
+        return failure({'success': False, 'error': str(e), 'error_code': e.code}), 422
+    except InvalidBudget as e:
+        return invalid_budget(e)
+    except Saturated as e:
+        return saturated(e)
+    except Exception as e:
+        log_failure('/api/solve/stream', e)
+        return failure({'success': False, 'error': str(e)})
+    
+    def event(name, data):
+        return f"event: {name}\ndata: {json.dumps(data)}\n\n"
+    
+    def finish(payload, result):
+        countCacheLookup('/api/solve/stream', cube_type, result)
+        g.request_failed = not payload.get('success')
+        response = dict(payload)
+        if not want_stats:
+            response.pop('stats', None)
+        response['cached'] = result == 'hit'
+        response['coalesced'] = result == 'coalesced'
+        return event('done', writeStates(response, state_format))
+    
+    def replay(payload, result):
+        # a solve that was not streamed is sent at once, its steps first so that clients handle it like a streamed one
+        cube = newCube(cube_type, cube_state)
+        for step in payload['steps']:
+            cube.doMoves(step['moves'])
+            yield event('step', writeStates({'name': step['name'], 'moves': step['moves'], 'cube_state': cube.getFaces()}, state_format))
+        yield finish(payload, result)
+    
+    def generate():
+        if payload is not None:
+            yield from replay(payload, 'hit')
+            return
+        # identical solves in flight, streamed or not, share one solve like /api/solve does
+        flight_key = key + (budget_ms,)
+        try:
+            if lane == 'fast':
+                # a cheap solve runs on a thread of the request and streams its steps as they are found
+                def flight(solve):
+                    try:
+                        return single_flight.do(flight_key, lambda: finish_solve(key, solve()), flight_timeout(deadline))
+                    except FutureTimeoutError:
+                        # the leader is stuck, this request solves (and streams) on its own like /api/solve does
+                        return finish_solve(key, solve()), False
+                for kind, data in streamSolve(cube_type, cube_state, engine, optimize, budget_ms, deadline, abandoned, flight):
+                    if kind == 'step':
+                        yield event('step', writeStates(data, state_format))
+                    elif kind == 'done':
+                        yield finish(data, 'miss')
+                    elif kind == 'shared':
+                        yield from replay(data, 'coalesced')
+                    else:
+                        raise data
+            else:
+                # a search runs in the process pool like /api/solve, its steps are sent once it is done
+                solve = lambda: finish_solve(key, run_solve(lane, cube_type, cube_state, engine, optimize, budget_ms, deadline, abandoned))
+                solved, coalesced = shared_solve(flight_key, lambda: lookup_solution(key, count=False) or solve(), deadline, abandoned)
+                yield from replay(solved, 'coalesced' if coalesced else 'miss')
+        except RequestAbandoned:
+            # nobody reads this
+            g.request_failed = True
+            return
+        except DeadlineExceeded as e:
+            g.request_failed = True
+            yield event('error', {'success': False, 'error': str(e), 'error_code': 'DEADLINE_EXCEEDED'})
+        except Exception as e:
+            g.request_failed = True
+            log_failure('/api/solve/stream', e)
+            yield event('error', {'success': False, 'error': str(e)})
+    
+    # no buffering by proxies, so that every event goes out as it is written
+    response = Response(stream_with_context(generate()), mimetype='text/event-stream',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    if payload is None:
+        response.call_on_close(lambda: lanes[lane].release(cost))
+    return response
+
+def shared_solve(flight_key, solve, deadline, abandoned=None):
+    """Run a solve, or wait for the identical one in flight and share its payload
+
+    A request waits for the one in flight until its own deadline at most. When that one is stuck, or
+    fails for reasons of its own (its deadline, its client going away, its lane being saturated), a
+    request with time left solves on its own.
+
+    Returns the payload, and whether it was shared.
+    """
+    led = False
+    def lead():
+        nonlocal led
+        led = True
+        return solve()
+    try:
+        return single_flight.do(flight_key, lead, flight_timeout(deadline))
+    except (FutureTimeoutError, RequestAbandoned, DeadlineExceeded, Saturated):
+        if led:
+            raise
+        if abandoned is not None and abandoned():
+            raise RequestAbandoned("The client went away")
+        if time.monotonic() >= deadline:
+            raise DeadlineExceeded("Deadline exceeded")
+        return solve(), False
+
+def flight_timeout(deadline):
+    """Seconds a request may wait for the identical solve in flight: until its deadline, and the single-flight timeout at most"""
+    remaining = max(0.0, deadline - time.monotonic())
+    return remaining if single_flight.timeout is None else min(single_flight.timeout, remaining)
+
+def solve_and_keep(key, cube_type, cube_state, engine, optimize, budget_ms, deadline, abandoned=None):
+    """Solve a cube state once its lane admits it, publish the stats of the solve and keep its payload"""
+    cost = estimateCost(cube_type, engine, budget_ms)
+    lane = laneFor(cost)
+    with lanes[lane].admit(cost, deadline):
+        payload = run_solve(lane, cube_type, cube_state, engine, optimize, budget_ms, deadline, abandoned)
+    return finish_solve(key, payload)
+
+def run_solve(lane, cube_type, cube_state, engine, optimize, budget_ms, deadline, abandoned=None):
+    """Solve a cube state admitted to a lane
+
+    Solves of the fast lane run on the request thread, so that they never wait behind a search in the
+    process pool, the others run in the pool.
+    """
+    if lane == 'fast':
+        return solveItem(cube_type, cube_state, engine, optimize, budget_ms)
+    return runInPool(solveItem, (cube_type, cube_state, engine, optimize, budget_ms), deadline, abandoned)
+
+def finish_solve(key, payload):
+    """Publish the stats of a fresh solve and keep its payload"""
+    publishStats(payload)
+    keep_solution(key, payload)
+    return payload
+
+def saturated(e):
+    """The 429 response of a request turned away by its lane, with when to retry"""
+    return failure({'success': False, 'error': str(e), 'error_code': 'SATURATED', 'lane': e.lane}), 429, {'Retry-After': str(e.retry_after)}
+
+def invalid_budget(e):
+    """The 400 response of a request with a budget_ms that is not a positive number"""
+    return failure({'success': False, 'error': str(e), 'error_code': 'INVALID_BUDGET'}), 400
+
+def client_watch():
+    """Give a check of whether the client of the current request went away, None if the server does not tell"""
+    sock = request.environ.get('gunicorn.socket') or request.environ.get('werkzeug.socket')
+    if sock is None:
+        return None
+    return lambda: socketClosed(sock)
+
+def lookup_solution(key, count=True):
+    """Find a finished payload in the in-process cache or the persistent store
+
+    With count False the lookup does not count in their hit rates, for the second look of a request
+    that already missed.
+    """
+    payload = solution_cache.get(key, count)
+    if payload is None and solution_store is not None:
+        payload = solution_store.get(key, count)
+        if payload is not None:
+            solution_cache.put(key, payload)
+    return payload
 
+def keep_solution(key, payload):
+    """Cache a finished payload, unless its time budget ran out (a later solve may beat it)"""
+    if payload.get('success') and payload.get('complete'):
+        solution_cache.put(key, payload)
+        if solution_store is not None:
+            solution_store.put(key, payload)
+
+def batch_results(items, optimize, budget_ms, deadline):
+    """Solve the batch items in the process pool, yielding (index, result) as they finish"""
+    pool = getPool()
+    futures = {}
+    for index, item in enumerate(items):
+        try:
+            if not isinstance(item, dict) or not item.get('cube_state'):
+                raise ValueError('No cube state provided')
+            cube_type = item.get('cube_type', '3x3')
+            cube_state = readState(item['cube_state'], cube_type)
+            validateState(cube_type, cube_state)
+            engine = getEngine(cube_type, item.get('engine'), budget_ms)
+            key = solutionKey(cube_type, engine, optimize, cube_state)
+        except CubeStateError as e:
+            yield index, {'success': False, 'error': str(e), 'error_code': e.code}
+            continue
+        except Exception as e:
+            yield index, {'success': False, 'error': str(e)}
+            continue
+        payload = lookup_solution(key)
+        if payload is not None:
+            result = dict(payload)
+            result['cached'] = True
+            yield index, result
+        elif pool is None:
+            payload = solveItem(cube_type, cube_state, engine, optimize, budget_ms)
+            publishStats(payload)
+            keep_solution(key, payload)
+            yield index, dict(payload, cached=False)
         else:
-            # Create 3x3 cube with the given state (default)
-            cube = Cube(faces=cube_state)
-            solver = Solver(cube)
-            solver.solveCube(optimize=True)
-            solution_decorated = solver.getMoves(decorated=True)
-            solution_plain = solver.getMoves(decorated=False)
-            steps = parse_solution_steps(solution_decorated)
-            solved_cube = Cube(faces=cube_state)
-            if solution_plain and "Already solved" not in solution_plain:
-                solved_cube.doMoves(solution_plain)
+            futures[submit(pool, solveItem, cube_type, cube_state, engine, optimize, budget_ms)] = (index, key)
+    try:
+        for future in as_completed(futures, timeout=max(0.0, deadline - time.monotonic())):
+            index, key = futures.pop(future)
+            try:
+                payload = future.result()
+            except Exception as e:
+                # the worker itself died, e.g. it ran out of memory
+                yield index, {'success': False, 'error': f'Worker failed: {e}'}
+                continue
+            publishStats(payload)
+            keep_solution(key, payload)
+            yield index, dict(payload, cached=False)
+    except FutureTimeoutError:
+        pass
+    finally:
+        # whatever is left ran past the deadline (or the client went away)
+        for future, (index, key) in list(futures.items()):
+            future.cancel()
+    for future, (index, key) in futures.items():
+        yield index, {'success': False, 'error': 'Deadline exceeded'}
+
+def batch_cost(items, budget_ms):
+    """Estimate the work of the batch items, those that are not valid cost nothing"""
+    cost = 0.0
+    for item in items:
+        try:
+            cube_type = item.get('cube_type', '3x3')
+            cost += estimateCost(cube_type, getEngine(cube_type, item.get('engine'), budget_ms), budget_ms)
+        except Exception:
+            continue
+    return cost
+
+@app.route('/api/solve_batch', methods=['POST'])
+def solve_batch():
+    """Solve a list of cubes in parallel and return the results in input order (or stream them as they finish)"""
+    try:
+        data = request.get_json()
+        items = data.get('items')
+        optimize = bool(data.get('optimize', True))
+        want_stats = bool(data.get('stats', False))
+        state_format = checkFormat(data.get('format'))
+        budget_ms = readBudget(data.get('budget_ms'))
+        deadline = time.monotonic() + float(data.get('deadline_ms', DEFAULT_BATCH_DEADLINE_MS)) / 1000.0
         
+        if not isinstance(items, list) or not items:
+            return failure({'success': False, 'error': 'No items provided'})
+        if len(items) > MAX_BATCH_ITEMS:
+            return failure({'success': False, 'error': f'Too many items, at most {MAX_BATCH_ITEMS} are allowed'})
+        
+        def finish(index, result):
+            if 'cached' in result:
+                countCacheLookup('/api/solve_batch', result.get('cube_type'), 'hit' if result['cached'] else 'miss')
+            if not want_stats:
+                result.pop('stats', None)
+            result['index'] = index
+            return writeStates(result, state_format)
+        
+        # the whole batch is admitted at once, in a lane of its own so that it holds up no single solve
+        cost = batch_cost(items, budget_ms)
+        lanes['batch'].acquire(cost, deadline)
+        
+        if data.get('stream', False):
+            # newline delimited JSON, one line per item in completion order
+            def generate():
+                for index, result in batch_results(items, optimize, budget_ms, deadline):
+                    yield json.dumps(finish(index, result)) + '\n'
+            response = Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+            response.call_on_close(lambda: lanes['batch'].release(cost))
+            return response
+        
+        results = [None] * len(items)
+        try:
+            for index, result in batch_results(items, optimize, budget_ms, deadline):
+                results[index] = finish(index, result)
+        finally:
+            lanes['batch'].release(cost)
         return jsonify({
             'success': True,
-            'solution': solution_decorated,
-            'solution_plain': solution_plain,
-            'steps': steps,
-            'solved_state': solved_cube.getFaces(),
-            'solved_display': str(solved_cube),
-            'cube_type': cube_type
+            'results': results,
+            'solved': sum(1 for result in results if result['success']),
+            'failed': sum(1 for result in results if not result['success'])
         })
+    except InvalidBudget as e:
+        return invalid_budget(e)
+    except Saturated as e:
+        return saturated(e)
     except Exception as e:
-        print(f"Error in /api/solve: {e}")
-        return jsonify({'success': False, 'error': str(e)})
+        log_failure('/api/solve_batch', e)
+        return failure({'success': False, 'error': str(e)})
 
 @app.route('/api/apply_moves', methods=['POST'])
 def apply_moves():
     """Apply moves to a cube and return the new state"""
     try:
         data = request.get_json()
-        cube_state = data.get('cube_state')
         moves = data.get('moves')
         cube_type = data.get('cube_type', '3x3')
+        g.cube_type = cube_type
+        cube_state = readState(data.get('cube_state'), cube_type)
+        state_format = checkFormat(data.get('format'))
         
         if not cube_state or not moves:
-            return jsonify({'success': False, 'error': 'Missing cube state or moves'})
+            return failure({'success': False, 'error': 'Missing cube state or moves'})
         
         # Create cube with the given state
-        if cube_type == '2x2':
-            cube = Cube2x2(faces=cube_state)
-        elif cube_type == '4x4':
-            cube = Cube4x4(faces=cube_state)
-        else:
-            cube = Cube(faces=cube_state)
-            
+        cube = newCube(cube_type, cube_state)
         cube.doMoves(moves)
         
-        return jsonify({
+        return jsonify(writeStates({
             'success': True,
             'cube_state': cube.getFaces(),
             'cube_display': str(cube),
             'cube_type': cube_type
-        })
+        }, state_format))
     except Exception as e:
-        return jsonify({'success': False, 'error': str(e)})
+        return failure({'success': False, 'error': str(e)})
+
+# frame encodings of /api/animate_solution: full cube states, sticker changes, or the moves alone
+ANIMATION_ENCODINGS = ('full', 'delta', 'moves')
 
 @app.route('/api/animate_solution', methods=['POST'])
 def animate_solution():
     """Get step-by-step cube states for solution animation"""
     try:
         data = request.get_json()
-        cube_state = data.get('cube_state')
         steps = data.get('steps', [])
         cube_type = data.get('cube_type', '3x3')
+        g.cube_type = cube_type
+        cube_state = readState(data.get('cube_state'), cube_type)
+        state_format = checkFormat(data.get('format'))
+        encoding = data.get('encoding', 'full')
+        per_move = bool(data.get('per_move', False))
         
         if not cube_state:
-            return jsonify({'success': False, 'error': 'No cube state provided'})
-        
-        animation_states = []
-        if cube_type == '2x2':
-            current_cube = Cube2x2(faces=cube_state)
-        elif cube_type == '4x4':
-            current_cube = Cube4x4(faces=cube_state)
-        else:
-            current_cube = Cube(faces=cube_state)
-        
-        # Add initial state
-        animation_states.append({
-            'step_name': 'Initial State',
-            'moves': '',
-            'cube_state': current_cube.getFaces(),
-            'cube_display': str(current_cube)
-        })
+            return failure({'success': False, 'error': 'No cube state provided'})
+        if encoding not in ANIMATION_ENCODINGS:
+            return failure({'success': False, 'error': f"Unknown encoding '{encoding}', expected one of {', '.join(ANIMATION_ENCODINGS)}"})
         
-        # Apply each step and capture states
+        current_cube = newCube(cube_type, cube_state)
+        frames = []
         for step in steps:
-            if step.get('moves'):
-                current_cube.doMoves(step['moves'])
-                animation_states.append({
-                    'step_name': step['name'],
-                    'moves': step['moves'],
-                    'cube_state': current_cube.getFaces(),
-                    'cube_display': str(current_cube)
-                })
+            if not step.get('moves'):
+                continue
+            # a step that cannot be split (e.g. it has parentheses) stays one frame
+            split = splitFormula(step['moves']) if per_move else []
+            for moves in (split or [step['moves']]):
+                frames.append({'step_name': step['name'], 'moves': moves})
         
-        return jsonify({
+        # an animation long enough to cost as much as a search goes to the search lane
+        cost = estimateFrames(cube_type, len(frames))
+        with lanes[laneFor(cost)].admit(cost):
+            return animation_response(current_cube, frames, encoding, cube_type, state_format)
+    except Saturated as e:
+        return saturated(e)
+    except Exception as e:
+        return failure({'success': False, 'error': str(e)})
+
+def animation_response(current_cube, frames, encoding, cube_type, state_format):
+    """Build the /api/animate_solution response of the frames from a cube"""
+    if encoding != 'full':
+        # the initial state once, then what every frame changes: the stickers
+        # (index side * n * n + row * n + col, new color), or nothing but the moves
+        initial_state = current_cube.getFaces()
+        before = [sticker for face in initial_state for row in face for sticker in row]
+        if encoding == 'delta':
+            for frame in frames:
+                current_cube.doMoves(frame['moves'])
+                after = [sticker for face in current_cube.getFaces() for row in face for sticker in row]
+                frame['changes'] = [[i, color] for i, (old, color) in enumerate(zip(before, after)) if old != color]
+                before = after
+        return jsonify(writeStates({
             'success': True,
-            'animation_states': animation_states,
+            'encoding': encoding,
+            'initial_state': initial_state,
+            'frames': frames,
             'cube_type': cube_type
+        }, state_format))
+
+    # Add initial state
+    animation_states = [{
+        'step_name': 'Initial State',
+        'moves': '',
+        'cube_state': current_cube.getFaces(),
+        'cube_display': str(current_cube)
+    }]
+
+    # Apply each step (or move) and capture states
+    for frame in frames:
+        current_cube.doMoves(frame['moves'])
+        animation_states.append(dict(frame, cube_state=current_cube.getFaces(), cube_display=str(current_cube)))
+
+    return jsonify(writeStates({
+        'success': True,
+        'animation_states': animation_states,
+        'cube_type': cube_type
+    }, state_format))
+
+@app.route('/api/warmup', methods=['POST'])
+def warmup():
+    """Load the solvers and tables of some cube types now rather than on their first solve"""
+    try:
+        data = request.get_json(silent=True) or {}
+        cube_types = data.get('cube_types', list(SCRAMBLES))
+        # loading tables is solver work like any other, so it is admitted like a solve
+        cost = estimateWarmUp([cube_type for cube_type in cube_types if not isWarm(cube_type)])
+        with lanes[laneFor(cost)].admit(cost):
+            timings = warmUp(cube_types)
+        return jsonify({
+            'success': True,
+            'warm_ms': {cube_type: round(seconds * 1000, 3) for cube_type, seconds in timings.items()},
+            'warm': [cube_type for cube_type in SCRAMBLES if isWarm(cube_type)]
         })
+    except Saturated as e:
+        return saturated(e)
     except Exception as e:
-        return jsonify({'success': False, 'error': str(e)})
+        return failure({'success': False, 'error': str(e)})
+
+@app.route('/metrics')
+def metrics():
+    """Export the process-wide solver histograms in Prometheus text format"""
+    return Response(renderMetrics(), content_type=CONTENT_TYPE)
 
 @app.route('/api/test4x4')
 def test_4x4():
     """Test route to check 4x4 functionality"""
     try:
-        cube = Cube4x4()
+        cube = newCube('4x4')
         faces = cube.getFaces()
         return jsonify({
             'success': True,
@@ -210,7 +644,7 @@ def test_4x4():
             'face_structure': [[len(row) for row in face] for face in faces]
         })
     except Exception as e:
-        return jsonify({'success': False, 'error': str(e)})
+        return failure({'success': False, 'error': str(e)})
 
 @app.route('/api/reset', methods=['POST'])
 def reset_cube():
@@ -218,56 +652,31 @@ def reset_cube():
     try:
         data = request.get_json()
         cube_type = data.get('cube_type', '3x3')
-        print(f"Reset cube called with cube_type: {cube_type}", flush=True)
+        g.cube_type = cube_type
+        state_format = checkFormat(data.get('format'))
         
-        if cube_type == '2x2':
-            cube = Cube2x2()
-            print(f"Created 2x2 cube with face dimensions: {len(cube.getFaces()[0])}x{len(cube.getFaces()[0][0])}", flush=True)
-        elif cube_type == '4x4':
-            cube = Cube4x4()
-            print(f"Created 4x4 cube with face dimensions: {len(cube.getFaces()[0])}x{len(cube.getFaces()[0][0])}", flush=True)
-        else:
-            cube = Cube()
-            print(f"Created 3x3 cube with face dimensions: {len(cube.getFaces()[0])}x{len(cube.getFaces()[0][0])}", flush=True)
-            
+        cube = newCube(cube_type)
         faces = cube.getFaces()
-        print(f"Returning cube with {len(faces)} faces, first face is {len(faces[0])}x{len(faces[0][0])}", flush=True)
         
-        return jsonify({
+        return jsonify(writeStates({
             'success': True,
             'cube_state': faces,
             'cube_display': str(cube),
             'cube_type': cube_type
-        })
+        }, state_format))
     except Exception as e:
-        print(f"Error in reset_cube: {e}", flush=True)
-        return jsonify({'success': False, 'error': str(e)})
-
-def parse_solution_steps(decorated_moves):
-    """Parse the decorated solution string into individual steps"""
-    if "Ortega" in decorated_moves:
-        moves = decorated_moves.replace("Ortega Solution: ", "").strip()
-        return [{"name": "Full Solve", "moves": moves}]
-        
-    steps = []
-    lines = decorated_moves.strip().split('\n')
-    
-    for line in lines:
-        if line.startswith('For '):
-            # Extract step name and moves
-            parts = line.split(': ')
-            if len(parts) == 2:
-                step_name = parts[0].replace('For ', '')
-                moves = parts[1].strip()
-                if moves:  # Only add non-empty move sequences
-                    steps.append({
-                        'name': step_name,
-                        'moves': moves
-                    })
-    
-    return steps
+        log_failure('/api/reset', e)
+        return failure({'success': False, 'error': str(e)})
+
+def create_app():
+    """Warm the solvers of PYCUBE_WARMUP up and give the app, e.g. `gunicorn "app:create_app()"`
+
+    With preload_app (see gunicorn.conf.py) this runs once in the master, and every worker it forks
+    shares the loaded tables and caches rather than loading its own.
+    """
+    warmUp(WARMUP_CUBE_TYPES, log=lambda line: logEvent('warm_up', detail=line), freeze=True)
+    return app
 
 if __name__ == '__main__':
-    import os
     port = int(os.environ.get('PORT', 8080))
     app.run(debug=False, host='0.0.0.0', port=port)
@@ -0,0 +1,155 @@
+import copy
+import time
+from concurrent.futures import wait
+from cube import Cube
+from helper import countMoves
+from solver import Solver
+from solver_pool import getPool
+from solver_tables import loadTables
+
+def schemeRotations():
+    """
+    Gives the recoloring of every whole cube rotation of the standard color scheme (identity first),
+    found by rotating a solved cube. Each recoloring maps the rotated scheme back to the standard one.
+    """
+    sideTocmap = Cube().sideTocmap
+    recolorings = []
+    seen = set()
+    queue = [""]
+    while(len(queue) > 0):
+        form = queue.pop(0)
+        cube = Cube()
+        cube.doMoves(form)
+        centers = tuple(cube.cube[side][1][1] for side in range(6))
+        if(centers in seen):
+            continue
+        seen.add(centers)
+        recolorings.append({centers[side]: sideTocmap[side] for side in range(6)})
+        for rotation in ["x", "y", "z"]:
+            queue.append(form + rotation)
+    return recolorings
+
+def crossColor(recoloring):
+    """
+    Gives the color that a recoloring turns into white, i.e. the color of the cross that gets solved.
+    """
+    for color in recoloring:
+        if(recoloring[color] == "W"):
+            return color
+
+# all 24 recolorings (identity first) and one recoloring per cross color (white first)
+# compiled into the tables artifact by table_builder.py, built here when there is none
+RECOLORINGS = loadTables().get("recolorings") or schemeRotations()
+CROSS_RECOLORINGS = []
+for _recoloring in RECOLORINGS:
+    if(crossColor(_recoloring) not in [crossColor(recoloring) for recoloring in CROSS_RECOLORINGS]):
+        CROSS_RECOLORINGS.append(_recoloring)
+
+def recolor(cube_state, recoloring):
+    """
+    Relabels the stickers of a cube faces matrix array.
+
+    Parameters
+    ----------
+    cube_state : list of size (6, N, N)
+        The cube faces matrix array.
+    recoloring : dict
+        Maps every color to its new color.
+
+    Returns
+    -------
+    faces : list of size (6, N, N)
+        A new cube faces matrix array with the relabelled stickers.
+    """
+    return [[[recoloring[sticker] for sticker in row] for row in face] for face in cube_state]
+
+def solveOrientation(cube_state, recoloring, optimize = True, setup = ""):
+    """
+    Runs the CFOP pipeline on a recolored copy of the cube.
+
+    The solver always builds a white cross, so recoloring another color to white makes it
+    build that cross instead. The moves do not depend on the colors, hence they solve the
+    original cube as well.
+
+    Parameters
+    ----------
+    setup : string, default=""
+        Formula applied before the solve, it is part of the solution (as the "Setup" step).
+        A different starting point often leads to a shorter solve.
+
+    Returns
+    -------
+    result : dict
+        The decorated and plain solution, its length in the half turn metric, the cross color,
+        whether the moves solve the original cube and the solver stats.
+    """
+    start = Cube(faces=recolor(cube_state, recoloring))
+    start.doMoves(setup)
+    solver = Solver(start)
+    solver.solveCube(optimize=optimize)
+    plain = solver.getMoves(decorated=False)
+    decorated = solver.getMoves(decorated=True)
+    if(bool(setup)):
+        plain = setup + "\n" + plain
+        decorated = "For Setup: " + setup + "\n" + decorated
+    check = Cube(faces=copy.deepcopy(cube_state))
+    check.doMoves("".join(plain.split()))
+    solved = all(sticker == face[1][1] for face in check.cube for row in face for sticker in row)
+    return {
+        "decorated": decorated,
+        "plain": plain,
+        "length": countMoves(plain),
+        "cross": crossColor(recoloring),
+        "solved": solved,
+        "stats": solver.getStats().toDict()
+    }
+
+def solveNeutral(cube_state, orientations = 6, budget_ms = 1000, optimize = True):
+    """
+    Solves the cube color neutrally and gives the shortest solution found.
+
+    The CFOP pipeline is run from every cross color (or every one of the 24 orientations) in the
+    persistent process pool. The standard (white cross) orientation is solved inline, so there is
+    always a result, and whatever the pool finishes within the time budget is compared against it.
+
+    Parameters
+    ----------
+    cube_state : list of size (6, 3, 3)
+        The cube faces matrix array.
+    orientations : int, default=6
+        6 to try one orientation per cross color, 24 to try every orientation.
+    budget_ms : float, default=1000
+        Time budget in milliseconds. Orientations that are not done by then are dropped.
+    optimize : bool, default=True
+        Passed on to the solver.
+
+    Returns
+    -------
+    best : dict
+        The shortest result (see solveOrientation()), along with "tried", the number of
+        orientations that finished, and "complete", whether all of them did.
+    """
+    recolorings = RECOLORINGS if orientations == 24 else CROSS_RECOLORINGS
+    deadline = time.monotonic() + budget_ms / 1000.0
+    pool = getPool()
+    # (index, result) pairs, the index breaks ties so that equal lengths always give the same answer
+    results = []
+    if(pool is not None):
+        futures = {pool.submit(solveOrientation, cube_state, recoloring, optimize): index for index, recoloring in enumerate(recolorings) if index > 0}
+        results.append((0, solveOrientation(cube_state, recolorings[0], optimize)))
+        done, pending = wait(futures, timeout=max(0.0, deadline - time.monotonic()))
+        for future in pending:
+            future.cancel()
+        for future in done:
+            if(future.exception() is None):
+                results.append((futures[future], future.result()))
+    else:
+        for index, recoloring in enumerate(recolorings):
+            if(len(results) > 0 and time.monotonic() >= deadline):
+                break
+            results.append((index, solveOrientation(cube_state, recoloring, optimize)))
+    solved = [pair for pair in results if pair[1]["solved"]]
+    best = dict(min(solved or results, key=lambda pair: (pair[1]["length"], pair[0]))[1])
+    best["tried"] = len(results)
+    best["complete"] = len(results) == len(recolorings)
+    return best
@@ -0,0 +1,219 @@
+from array import array
+from functools import lru_cache
+from cube2x2 import Cube2x2
+from solver_tables import loadTables
+from validator import PIECES, SCHEMES
+
+# the moves of the coordinates, none of them moves the down-back-left corner so the cube never needs rotating
+MOVES = ["R", "R'", "R2", "U", "U'", "U2", "F", "F'", "F2"]
+PERMUTATIONS = 5040
+ORIENTATIONS = 729
+STATES = PERMUTATIONS * ORIENTATIONS
+SOLVED_INDEX = 0
+
+CORNERS = PIECES[2][0]
+DBL = [k for k, corner in enumerate(CORNERS) if sorted(side for side, _, _ in corner) == [2, 3, 4]][0]
+# the 7 corners that move, each one ordered clockwise from its U/D sticker
+SLOTS = [corner for k, corner in enumerate(CORNERS) if k != DBL]
+STANDARD_SCHEME = tuple(face[0][0] for face in Cube2x2().getFaces())
+
+def _stickerIndex(side, row, col):
+    return side * 4 + row * 2 + col
+
+def _cornerMoves():
+    # for every move and every slot, the slot its new piece comes from and the twist it gets on the way
+    # found by applying the move to a cube whose stickers are their own indices
+    where = {_stickerIndex(*position): (slot, i) for slot, corner in enumerate(SLOTS) for i, position in enumerate(corner)}
+    moves = []
+    for move in MOVES:
+        cube = Cube2x2(faces=[[[_stickerIndex(side, row, col) for col in range(2)] for row in range(2)] for side in range(6)])
+        cube.doMoves(move)
+        moves.append([])
+        for corner in SLOTS:
+            side, row, col = corner[0]
+            source, i = where[cube.cube[side][row][col]]
+            # the sticker i of the source slot lands first in this slot, so every sticker moves back by i
+            moves[-1].append((source, -i % 3))
+    return moves
+
+CORNER_MOVES = _cornerMoves()
+
+def rankPermutation(permutation):
+    """
+    Ranks a permutation of the 7 moving corners (Lehmer code), 0 for the identity and up to 5039.
+    """
+    rank = 0
+    for i in range(7):
+        smaller = sum(1 for j in range(i + 1, 7) if permutation[j] < permutation[i])
+        rank = rank * (7 - i) + smaller
+    return rank
+
+def unrankPermutation(rank):
+    """
+    Gives the permutation of the 7 moving corners of a rank from rankPermutation().
+    """
+    digits = []
+    for base in range(1, 8):
+        rank, digit = divmod(rank, base)
+        digits.append(digit)
+    digits.reverse()
+    remaining = list(range(7))
+    return [remaining.pop(digit) for digit in digits]
+
+def rankOrientation(orientation):
+    """
+    Ranks the twists of the 7 moving corners, 0 to 728. The last twist follows from the others.
+    """
+    rank = 0
+    for twist in orientation[:6]:
+        rank = rank * 3 + twist
+    return rank
+
+def unrankOrientation(rank):
+    """
+    Gives the twists of the 7 moving corners of a rank from rankOrientation().
+    """
+    orientation = []
+    for _ in range(6):
+        rank, twist = divmod(rank, 3)
+        orientation.append(twist)
+    orientation.reverse()
+    return orientation + [-sum(orientation) % 3]
+
+def buildMoveTables():
+    """
+    Gives the permutation and orientation move tables, where table[rank * 9 + move] is the rank after the move.
+    """
+    permutationTable = array("H", [0] * (PERMUTATIONS * len(MOVES)))
+    for rank in range(PERMUTATIONS):
+        permutation = unrankPermutation(rank)
+        for m, move in enumerate(CORNER_MOVES):
+            permutationTable[rank * len(MOVES) + m] = rankPermutation([permutation[source] for source, _ in move])
+    orientationTable = array("H", [0] * (ORIENTATIONS * len(MOVES)))
+    for rank in range(ORIENTATIONS):
+        orientation = unrankOrientation(rank)
+        for m, move in enumerate(CORNER_MOVES):
+            orientationTable[rank * len(MOVES) + m] = rankOrientation([(orientation[source] + twist) % 3 for source, twist in move])
+    return permutationTable, orientationTable
+
+@lru_cache(maxsize=None)
+def moveTables():
+    """
+    Gives the move tables of buildMoveTables(), from the tables artifact when it has them.
+    """
+    # compiled into the tables artifact by table_builder.py as the bytes of the two arrays
+    compiled = loadTables().get("moves2x2")
+    if(compiled is None):
+        return buildMoveTables()
+    permutationTable = array("H")
+    permutationTable.frombytes(compiled["permutation"])
+    orientationTable = array("H")
+    orientationTable.frombytes(compiled["orientation"])
+    return permutationTable, orientationTable
+
+def applyMove(index, move):
+    """
+    Gives the state index after a move (an index of MOVES), with two table lookups.
+    """
+    permutationTable, orientationTable = moveTables()
+    permutation, orientation = divmod(index, ORIENTATIONS)
+    return permutationTable[permutation * len(MOVES) + move] * ORIENTATIONS + orientationTable[orientation * len(MOVES) + move]
+
+def applyFormula(index, form):
+    """
+    Gives the state index after a formula made of MOVES separated by spaces.
+
+    Raises
+    ------
+    ValueError
+        If the formula has another move, e.g. one that moves the down-back-left corner.
+    """
+    for move in form.split():
+        index = applyMove(index, MOVES.index(move))
+    return index
+
+def schemeOf(faces):
+    """
+    Gives the color scheme a 2x2 cube is solved in, the one its down-back-left corner is home in.
+
+    Raises
+    ------
+    ValueError
+        If the down-back-left corner has a color combination that does not exist.
+    """
+    colors = tuple(faces[side][row][col] for side, row, col in CORNERS[DBL])
+    for scheme in SCHEMES:
+        if(tuple(scheme[side] for side, _, _ in CORNERS[DBL]) == colors):
+            return scheme
+    raise ValueError("There is no corner with the colors " + "".join(colors))
+
+def stateIndex(faces):
+    """
+    Gives the index (permutation rank * 729 + orientation rank) of a 2x2 cube state.
+
+    The state is read relative to the down-back-left corner, so a cube that is held any other way
+    (or whose colors are shuffled around the standard scheme) still gets the index of its solve.
+
+    Parameters
+    ----------
+    faces : list of size (6, 2, 2)
+        The cube faces matrix array.
+
+    Returns
+    -------
+    index : int
+        0 for a solved cube, up to 3674159.
+
+    Raises
+    ------
+    ValueError
+        If a corner does not exist in the color scheme.
+    """
+    scheme = schemeOf(faces)
+    solved = {frozenset(scheme[side] for side, _, _ in corner): slot for slot, corner in enumerate(SLOTS)}
+    permutation = []
+    orientation = []
+    for corner in SLOTS:
+        colors = [faces[side][row][col] for side, row, col in corner]
+        if(frozenset(colors) not in solved):
+            raise ValueError("There is no corner with the colors " + "".join(colors))
+        permutation.append(solved[frozenset(colors)])
+        orientation.append([i for i, color in enumerate(colors) if color in (scheme[4], scheme[5])][0])
+    return rankPermutation(permutation) * ORIENTATIONS + rankOrientation(orientation)
+
+def stateFaces(index, scheme = STANDARD_SCHEME):
+    """
+    Gives the cube faces matrix array of a state index, the inverse of stateIndex().
+
+    Parameters
+    ----------
+    index : int
+        The state index.
+    scheme : tuple of size 6, default=STANDARD_SCHEME
+        The colors of the sides when solved, one of validator.SCHEMES.
+
+    Example
+    -------
+    >>> stateIndex(stateFaces(1234)) == 1234
+    True
+    """
+    permutation = unrankPermutation(index // ORIENTATIONS)
+    orientation = unrankOrientation(index % ORIENTATIONS)
+    faces = [[[scheme[side]] * 2 for _ in range(2)] for side in range(6)]
+    for slot, corner in enumerate(SLOTS):
+        colors = [scheme[side] for side, _, _ in SLOTS[permutation[slot]]]
+        for i, (side, row, col) in enumerate(corner):
+            faces[side][row][col] = colors[(i - orientation[slot]) % 3]
+    return faces
+
+def stateKey(faces):
+    """
+    Gives a single int that identifies a 2x2 cube state, colors included: the index of its
+    color scheme in validator.SCHEMES * 3674160 + its state index.
+
+    Raises
+    ------
+    ValueError
+        If a corner does not exist in the color scheme.
+    """
+    return SCHEMES.index(schemeOf(faces)) * STATES + stateIndex(faces)
@@ -0,0 +1,203 @@
+from array import array
+from math import comb
+from fast_cube import PERMUTATIONS, compose
+from validator import PIECES
+
+# the face turns of a 3x3, named like the outer turns of fast_cube4x4.MOVES
+MOVES = [face + turn for face in ["U", "D", "R", "L", "F", "B"] for turn in ["", "'", "2"]]
+CORNERS, EDGES = PIECES[3][0], PIECES[3][1]
+# the edges of the three middle slices: between F/B and R/L (E), U/D and F/B (M), U/D and R/L (S)
+E_EDGES = [k for k, edge in enumerate(EDGES) if edge[0][0] not in (4, 5)]
+M_EDGES = [k for k, edge in enumerate(EDGES) if edge[0][0] in (4, 5) and edge[1][0] in (0, 2)]
+S_EDGES = [k for k, edge in enumerate(EDGES) if edge[0][0] in (4, 5) and edge[1][0] in (1, 3)]
+# the slots outside the E slice, where the M and S edges are once the E ones are home
+UD_EDGES = sorted(M_EDGES + S_EDGES)
+
+def _stickerIndex(side, row, col):
+    return side * 9 + row * 3 + col
+
+def _pieceMoves(pieces, turns):
+    # for every move and every slot, the slot its new piece comes from and the change of orientation on the way
+    where = {_stickerIndex(*position): (slot, i) for slot, piece in enumerate(pieces) for i, position in enumerate(piece)}
+    moves = {}
+    for move in MOVES:
+        permutation = PERMUTATIONS[move[0] + ("P" if move.endswith("'") else "")]
+        if(move.endswith("2")):
+            permutation = compose(permutation, permutation)
+        moves[move] = []
+        for piece in pieces:
+            source, i = where[permutation[_stickerIndex(*piece[0])]]
+            # the sticker i of the source slot lands first in this slot, so the piece turns back by i
+            moves[move].append((source, -i % turns))
+        moves[move] = tuple(moves[move])
+    return moves
+
+CORNER_MOVES = _pieceMoves(CORNERS, 3)
+EDGE_MOVES = _pieceMoves(EDGES, 2)
+
+SOLVED = (tuple(range(8)), (0,) * 8, tuple(range(12)), (0,) * 12)
+
+def cubies(faces):
+    """
+    Gives the cubies of a 3x3 cube, read relative to its centers.
+
+    Parameters
+    ----------
+    faces : list of size (6, 3, 3)
+        The cube faces matrix array.
+
+    Returns
+    -------
+    cubies : tuple
+        (corner permutation, corner twists, edge permutation, edge flips): for every slot, the slot
+        its piece is solved in and how far the piece is turned from its solved orientation.
+        A corner is turned by the position of its U/D sticker, an edge by the position of its U/D
+        sticker (F/B sticker for the E slice edges).
+
+    Raises
+    ------
+    ValueError
+        If a piece has a color combination that does not exist.
+    """
+    scheme = tuple(faces[side][1][1] for side in range(6))
+    result = []
+    for pieces in (CORNERS, EDGES):
+        solved = {}
+        for slot, piece in enumerate(pieces):
+            colors = tuple(scheme[side] for side, _, _ in piece)
+            for turn in range(len(piece)):
+                solved[colors[turn:] + colors[:turn]] = (slot, turn)
+        permutation = []
+        orientation = []
+        for piece in pieces:
+            colors = tuple(faces[side][row][col] for side, row, col in piece)
+            if(colors not in solved):
+                raise ValueError("There is no piece with the colors " + "".join(colors))
+            slot, turn = solved[colors]
+            permutation.append(slot)
+            # the colors read from the sticker `turn` of the solved piece on, so that one sits at -turn
+            orientation.append(-turn % len(piece))
+        result += [tuple(permutation), tuple(orientation)]
+    return tuple(result)
+
+def applyMove(cubie, move):
+    """
+    Gives the cubies of cubies() after a move of MOVES.
+    """
+    cornerPermutation, twists, edgePermutation, flips = cubie
+    corners = CORNER_MOVES[move]
+    edges = EDGE_MOVES[move]
+    return (tuple(cornerPermutation[source] for source, _ in corners), tuple((twists[source] + twist) % 3 for source, twist in corners),
+            tuple(edgePermutation[source] for source, _ in edges), tuple((flips[source] + flip) % 2 for source, flip in edges))
+
+def applyFormula(cubie, form):
+    """
+    Gives the cubies after a formula of MOVES separated by spaces.
+    """
+    for move in form.split():
+        cubie = applyMove(cubie, move)
+    return cubie
+
+def rankPermutation(permutation):
+    """
+    Ranks a permutation (Lehmer code), 0 for the identity and up to n! - 1.
+    """
+    rank = 0
+    for i in range(len(permutation)):
+        smaller = sum(1 for j in range(i + 1, len(permutation)) if permutation[j] < permutation[i])
+        rank = rank * (len(permutation) - i) + smaller
+    return rank
+
+def unrankPermutation(rank, n):
+    """
+    Gives the permutation of n items of a rank from rankPermutation().
+    """
+    digits = []
+    for base in range(1, n + 1):
+        rank, digit = divmod(rank, base)
+        digits.append(digit)
+    digits.reverse()
+    remaining = list(range(n))
+    return tuple(remaining.pop(digit) for digit in digits)
+
+def rankCombination(slots):
+    """
+    Ranks a set of slots among the sets of as many slots (combinatorial number system),
+    e.g. 0 to 494 for 4 slots out of 12.
+    """
+    return sum(comb(slot, k + 1) for k, slot in enumerate(sorted(slots)))
+
+def flipIndex(flips):
+    """
+    Ranks the edge flips, 0 to 2047. The last flip follows from the others.
+    """
+    index = 0
+    for flip in flips[:11]:
+        index = index * 2 + flip
+    return index
+
+def twistIndex(twists):
+    """
+    Ranks the corner twists, 0 to 2186. The last twist follows from the others.
+    """
+    index = 0
+    for twist in twists[:7]:
+        index = index * 3 + twist
+    return index
+
+def sliceIndex(edgePermutation):
+    """
+    Ranks the slots of the E slice edges, 0 to 494.
+    """
+    return rankCombination([slot for slot, piece in enumerate(edgePermutation) if piece in E_EDGES])
+
+def middleIndex(edgePermutation):
+    """
+    Ranks the slots of the M slice edges among the slots outside the E slice, 0 to 69.
+    Only meaningful once the E slice edges are in the E slice.
+    """
+    return rankCombination([k for k, slot in enumerate(UD_EDGES) if edgePermutation[slot] in M_EDGES])
+
+def slicePermutationIndex(edgePermutation):
+    """
+    Ranks the order of the edges within each of the E, M and S slices, 0 to 13823.
+    Only meaningful once every edge is in its slice.
+    """
+    index = 0
+    for slots in (E_EDGES, M_EDGES, S_EDGES):
+        index = index * 24 + rankPermutation([slots.index(edgePermutation[slot]) for slot in slots])
+    return index
+
+HALF_TURNS = [move for move in MOVES if move.endswith("2")]
+
+def buildCornerClasses():
+    """
+    Sorts the 40320 corner permutations by the group of those that half turns alone reach from solved (96 of them).
+
+    Returns
+    -------
+    cosets : array of size 40320
+        By rankPermutation(), the coset of the group the permutation is in, 0 to 419 and 0 for the group itself.
+        Two permutations are in the same coset when the same moves take both of them into the group.
+    members : array of size 40320
+        By rankPermutation(), the index of the permutation in the group, 0 to 95, and 65535 outside of it.
+    """
+    group = [SOLVED[0]]
+    for permutation in group:
+        for move in HALF_TURNS:
+            following = tuple(permutation[source] for source, _ in CORNER_MOVES[move])
+            if(following not in group):
+                group.append(following)
+    members = array("H", [65535] * 40320)
+    for k, permutation in enumerate(group):
+        members[rankPermutation(permutation)] = k
+    # a move acts on the slots, so relabeling the pieces by a member of the group keeps the coset
+    cosets = array("H", [65535] * 40320)
+    count = 0
+    for rank in range(40320):
+        if(cosets[rank] == 65535):
+            permutation = unrankPermutation(rank, 8)
+            for member in group:
+                cosets[rankPermutation([member[piece] for piece in permutation])] = count
+            count += 1
+    return cosets, members
@@ -0,0 +1,149 @@
+from math import comb
+from coords2x2 import stateIndex
+from fast_cube4x4 import MOVES, PERMUTATIONS
+from validator import PIECES
+
+# the 4 center stickers of every side, in the order of the state tuple
+CENTER_SLOTS = [side * 16 + row * 4 + col for side in range(6) for row in (1, 2) for col in (1, 2)]
+# the 24 wings as pairs of state indices, in the order of validator.PIECES
+WING_SLOTS = [tuple(side * 16 + row * 4 + col for side, row, col in wing) for wing in PIECES[4][2]]
+# a corner of the 4x4 is the corner of the 2x2 it projects to
+CORNER_STICKERS = (0, 3)
+CENTER_MASKS = comb(24, 4)
+
+def _centerMoves():
+    # for every move and every center slot, the center slot its sticker comes from
+    where = {position: slot for slot, position in enumerate(CENTER_SLOTS)}
+    return {move: tuple(where[PERMUTATIONS[move][position]] for position in CENTER_SLOTS) for move in MOVES}
+
+def _wingMoves():
+    # for every move and every wing slot, the wing slot its piece comes from
+    # (wings cannot be flipped in place, the first sticker of a wing always lands first)
+    where = {wing[0]: slot for slot, wing in enumerate(WING_SLOTS)}
+    return {move: tuple(where[PERMUTATIONS[move][wing[0]]] for wing in WING_SLOTS) for move in MOVES}
+
+CENTER_MOVES = _centerMoves()
+WING_MOVES = _wingMoves()
+
+def _maskMoves():
+    # a center mask is moved one byte at a time: for every move, the bits that the set bits of each byte move to
+    tables = {}
+    for move, sources in CENTER_MOVES.items():
+        targets = [0] * 24
+        for slot, source in enumerate(sources):
+            targets[source] = slot
+        tables[move] = tuple(tuple(sum(1 << targets[shift + bit] for bit in range(8) if value >> bit & 1) for value in range(256)) for shift in (0, 8, 16))
+    return tables
+
+MASK_MOVES = _maskMoves()
+
+def centerMask(state, color):
+    """
+    Gives the center slots that show a color, as a 24-bit mask (bit i for CENTER_SLOTS[i]).
+
+    Parameters
+    ----------
+    state : tuple of size 96
+        A 4x4 state tuple (see fast_cube4x4).
+    color : string
+        The color, e.g. "W".
+    """
+    mask = 0
+    for slot, position in enumerate(CENTER_SLOTS):
+        if(state[position] == color):
+            mask |= 1 << slot
+    return mask
+
+def moveMask(mask, move):
+    """
+    Gives a center mask after a move of fast_cube4x4.MOVES, with three table lookups.
+
+    Example
+    -------
+    >>> moveMask(centerMask(applyFormula(SOLVED, "Rw"), "W"), "Rw'") == centerMask(SOLVED, "W")
+    True
+    """
+    low, middle, high = MASK_MOVES[move]
+    return low[mask & 255] | middle[(mask >> 8) & 255] | high[mask >> 16]
+
+def moveWings(ids, move):
+    """
+    Gives the wing ids of wingIds() after a move of fast_cube4x4.MOVES.
+    """
+    return tuple(ids[source] for source in WING_MOVES[move])
+
+def rankMask(mask):
+    """
+    Ranks a mask among the masks with as many set bits (combinatorial number system),
+    e.g. 0 to 10625 for the four centers of a color.
+    """
+    rank = 0
+    k = 0
+    for slot in range(24):
+        if(mask >> slot & 1):
+            k += 1
+            rank += comb(slot, k)
+    return rank
+
+def unrankMask(rank, count = 4):
+    """
+    Gives the mask with `count` set bits of a rank from rankMask().
+    """
+    mask = 0
+    for k in range(count, 0, -1):
+        slot = k - 1
+        while(comb(slot + 1, k) <= rank):
+            slot += 1
+        rank -= comb(slot, k)
+        mask |= 1 << slot
+    return mask
+
+def wingIds(state, scheme):
+    """
+    Gives the wing in every wing slot: for slot i, the slot the wing there is solved in.
+
+    Every edge of a 4x4 is two wings with the same colors, they are told apart by the order
+    the colors read in (see validator.buildPieces()).
+
+    Parameters
+    ----------
+    state : tuple of size 96
+        A 4x4 state tuple.
+    scheme : tuple of size 6
+        The colors of the sides when solved, one of validator.SCHEMES.
+
+    Returns
+    -------
+    ids : tuple of size 24
+        A permutation of range(24) for a valid cube, the identity when the edges are solved.
+
+    Raises
+    ------
+    ValueError
+        If a wing has a color combination that does not exist in the scheme.
+    """
+    solved = {tuple(scheme[position // 16] for position in wing): slot for slot, wing in enumerate(WING_SLOTS)}
+    ids = []
+    for wing in WING_SLOTS:
+        colors = tuple(state[position] for position in wing)
+        if(colors not in solved):
+            raise ValueError("There is no wing with the colors " + "".join(colors))
+        ids.append(solved[colors])
+    return tuple(ids)
+
+def cornerFaces(state):
+    """
+    Gives the 2x2 cube faces matrix array that the corners of a 4x4 state tuple make up.
+    """
+    return [[[state[side * 16 + row * 4 + col] for col in CORNER_STICKERS] for row in CORNER_STICKERS] for side in range(6)]
+
+def cornerIndex(state):
+    """
+    Gives the coords2x2 state index of the corners of a 4x4 state tuple.
+
+    Raises
+    ------
+    ValueError
+        If a corner does not exist in a color scheme.
+    """
+    return stateIndex(cornerFaces(state))
@@ -48,6 +48,19 @@ class Cube2x2:
         """Return the faces as a tuple of tuples for hashing."""
         return tuple(tuple(map(tuple, face)) for face in self.cube)
 
+    def getStateIndex(self):
+        """
+        Gives the integer index of the state, below 3674160 (see coords2x2.stateIndex()).
+
+        Raises
+        ------
+        ValueError
+            If a corner does not exist in the color scheme.
+        """
+        # imported here since coords2x2 builds its move tables with Cube2x2
+        from coords2x2 import stateIndex
+        return stateIndex(self.cube)
+
     def __str__(self):
         pstr = ""
         # Top face
@@ -159,33 +172,33 @@ class Cube2x2:
         """Rotate the up face"""
         self.__rotateFace(5, inverted)
         if not inverted:
-            temp = [self.cube[0][0][0], self.cube[0][0][1]]
-            self.cube[0][0][0], self.cube[0][0][1] = self.cube[3][0][0], self.cube[3][0][1]
-            self.cube[3][0][0], self.cube[3][0][1] = self.cube[2][0][0], self.cube[2][0][1]
-            self.cube[2][0][0], self.cube[2][0][1] = self.cube[1][0][0], self.cube[1][0][1]
-            self.cube[1][0][0], self.cube[1][0][1] = temp[0], temp[1]
-        else:
             temp = [self.cube[0][0][0], self.cube[0][0][1]]
             self.cube[0][0][0], self.cube[0][0][1] = self.cube[1][0][0], self.cube[1][0][1]
             self.cube[1][0][0], self.cube[1][0][1] = self.cube[2][0][0], self.cube[2][0][1]
             self.cube[2][0][0], self.cube[2][0][1] = self.cube[3][0][0], self.cube[3][0][1]
             self.cube[3][0][0], self.cube[3][0][1] = temp[0], temp[1]
+        else:
+            temp = [self.cube[0][0][0], self.cube[0][0][1]]
+            self.cube[0][0][0], self.cube[0][0][1] = self.cube[3][0][0], self.cube[3][0][1]
+            self.cube[3][0][0], self.cube[3][0][1] = self.cube[2][0][0], self.cube[2][0][1]
+            self.cube[2][0][0], self.cube[2][0][1] = self.cube[1][0][0], self.cube[1][0][1]
+            self.cube[1][0][0], self.cube[1][0][1] = temp[0], temp[1]
 
     def __rotateDownFace(self, inverted):
         """Rotate the down face"""
         self.__rotateFace(4, inverted)
         if not inverted:
-            temp = [self.cube[0][1][0], self.cube[0][1][1]]
-            self.cube[0][1][0], self.cube[0][1][1] = self.cube[1][1][0], self.cube[1][1][1]
-            self.cube[1][1][0], self.cube[1][1][1] = self.cube[2][1][0], self.cube[2][1][1]
-            self.cube[2][1][0], self.cube[2][1][1] = self.cube[3][1][0], self.cube[3][1][1]
-            self.cube[3][1][0], self.cube[3][1][1] = temp[0], temp[1]
-        else:
             temp = [self.cube[0][1][0], self.cube[0][1][1]]
             self.cube[0][1][0], self.cube[0][1][1] = self.cube[3][1][0], self.cube[3][1][1]
             self.cube[3][1][0], self.cube[3][1][1] = self.cube[2][1][0], self.cube[2][1][1]
             self.cube[2][1][0], self.cube[2][1][1] = self.cube[1][1][0], self.cube[1][1][1]
             self.cube[1][1][0], self.cube[1][1][1] = temp[0], temp[1]
+        else:
+            temp = [self.cube[0][1][0], self.cube[0][1][1]]
+            self.cube[0][1][0], self.cube[0][1][1] = self.cube[1][1][0], self.cube[1][1][1]
+            self.cube[1][1][0], self.cube[1][1][1] = self.cube[2][1][0], self.cube[2][1][1]
+            self.cube[2][1][0], self.cube[2][1][1] = self.cube[3][1][0], self.cube[3][1][1]
+            self.cube[3][1][0], self.cube[3][1][1] = temp[0], temp[1]
 
     def __rotateFrontFace(self, inverted):
         """Rotate the front face"""
@@ -1,5 +1,11 @@
+from operator import itemgetter
+from fast_cube4x4 import MOVES, PERMUTATIONS, SOLVED, fromFaces, toFaces
 from helper import parseFormula
-import copy
+
+# the instructions of parseFormula() that turn a 4x4, e.g. "rP" (a wide R'), and the move they apply
+GETTERS = {(move[0].lower() if "w" in move else move[0]) + ("P" if move.endswith("'") else ""): itemgetter(*PERMUTATIONS[move])
+           for move in MOVES if not move.endswith("2")}
+MOVE_GETTERS = {move: itemgetter(*PERMUTATIONS[move]) for move in MOVES}
 
 class Cube4x4:
     """
@@ -12,8 +18,11 @@ class Cube4x4:
 
     Attributes
     ----------
+    state : tuple of size 96
+        The stickers of the cube, side * 16 + row * 4 + col (see fast_cube4x4). Every move is a
+        precomputed permutation of it.
     cube : list of size (6, 4, 4)
-        The internal cube faces matrix array for the 4x4 cube object.
+        The cube faces matrix array, built from the state when read.
     
     Example
     -------
@@ -25,35 +34,37 @@ class Cube4x4:
     def __init__(self, faces = "None"):
         self.sideTocmap = ["G", "O", "B", "R", "W", "Y"]
         if(faces == "None"):
-            self.cube = [[[self.sideTocmap[c]] * 4 for _ in range(4)] for c in range(6)]
+            self.state = SOLVED
         else:
-            self.cube = faces
+            self.state = fromFaces(faces)
+        # the states before the moves of pushMove(), for popMove()
+        self.__trail = []
+
+    @property
+    def cube(self):
+        return toFaces(self.state)
+
+    @cube.setter
+    def cube(self, faces):
+        self.state = fromFaces(faces)
 
     def getFacesAsTuple(self):
         """Return the faces as a tuple of tuples for hashing."""
-        return tuple(tuple(map(tuple, face)) for face in self.cube)
+        return tuple(tuple(tuple(self.state[side * 16 + row * 4: side * 16 + row * 4 + 4]) for row in range(4)) for side in range(6))
 
     def __str__(self):
+        def row(side, i):
+            return "".join(self.state[side * 16 + i * 4: side * 16 + i * 4 + 4])
         pstr = ""
         # Top face
         for i in range(4):
-            pstr += "    "
-            for j in range(4):
-                pstr += self.cube[5][i][j]
-            pstr += "\n"
+            pstr += "    " + row(5, i) + "\n"
         # Middle row (left, front, right, back)
         for i in range(4):
-            for face in [3, 0, 1, 2]:
-                for j in range(4):
-                    pstr += self.cube[face][i][j]
-                pstr += " " if face != 2 else ""
-            pstr += "\n"
+            pstr += " ".join(row(face, i) for face in [3, 0, 1, 2]) + "\n"
         # Bottom face
         for i in range(4):
-            pstr += "    "
-            for j in range(4):
-                pstr += self.cube[4][i][j]
-            pstr += "\n"
+            pstr += "    " + row(4, i) + "\n"
         return pstr
 
     def getFaces(self):
@@ -63,9 +74,27 @@ class Cube4x4:
         Returns
         -------
         cube : list of size (6, 4, 4)
-            The internal cube faces matrix array for the cube object.
+            The cube faces matrix array for the cube object.
+        """
+        return toFaces(self.state)
+
+    def getState(self):
+        """
+        Returns the state of the cube as a tuple of 96 stickers, which is cheap to copy, compare and hash.
         """
-        return copy.deepcopy(self.cube)
+        return self.state
+
+    def isSolved(self):
+        """
+        Checks whether every side of the cube shows a single color, without copying the faces.
+        """
+        state = self.state
+        for side in range(0, 96, 16):
+            color = state[side]
+            for i in range(side + 1, side + 16):
+                if(state[i] != color):
+                    return False
+        return True
 
     def doMoves(self, formula):
         """
@@ -74,298 +103,89 @@ class Cube4x4:
         Parameters
         ----------
         formula : string
-            Formula to be applied to this cube. Example: "R U' L D2 F'"
+            Formula to be applied to this cube. Example: "R U' L D2 F'". Wide moves are written
+            "Rw" or "r", and instructions that turn no 4x4 layer (slices, rotations) are ignored.
         """
-        moves = parseFormula(formula)
-        for move in moves:
-            self.__applyMove(move)
-
-    def __applyMove(self, move):
-        """Apply a single move to the cube"""
-        if move == "R":
-            self.__rotateRightFace(False)
-        elif move == "RP":
-            self.__rotateRightFace(True)
-        elif move == "L":
-            self.__rotateLeftFace(False)
-        elif move == "LP":
-            self.__rotateLeftFace(True)
-        elif move == "U":
-            self.__rotateUpFace(False)
-        elif move == "UP":
-            self.__rotateUpFace(True)
-        elif move == "D":
-            self.__rotateDownFace(False)
-        elif move == "DP":
-            self.__rotateDownFace(True)
-        elif move == "F":
-            self.__rotateFrontFace(False)
-        elif move == "FP":
-            self.__rotateFrontFace(True)
-        elif move == "B":
-            self.__rotateBackFace(False)
-        elif move == "BP":
-            self.__rotateBackFace(True)
-        # Wide moves for 4x4
-        elif move == "r":
-            self.__rotateRightWide(False)
-        elif move == "rP":
-            self.__rotateRightWide(True)
-        elif move == "l":
-            self.__rotateLeftWide(False)
-        elif move == "lP":
-            self.__rotateLeftWide(True)
-        elif move == "u":
-            self.__rotateUpWide(False)
-        elif move == "uP":
-            self.__rotateUpWide(True)
-        elif move == "d":
-            self.__rotateDownWide(False)
-        elif move == "dP":
-            self.__rotateDownWide(True)
-        elif move == "f":
-            self.__rotateFrontWide(False)
-        elif move == "fP":
-            self.__rotateFrontWide(True)
-        elif move == "b":
-            self.__rotateBackWide(False)
-        elif move == "bP":
-            self.__rotateBackWide(True)
+        state = self.state
+        for move in parseFormula(formula):
+            if(move in GETTERS):
+                state = GETTERS[move](state)
+        self.state = state
 
-    def __rotateRightFace(self, inverted):
-        """Rotate the right face (only outer layer)"""
-        self.__rotateFace(1, inverted)
-        # Cycle edges for 4x4 cube (outer layer only)
-        if not inverted:
-            temp = [self.cube[5][i][3] for i in range(4)]
-            for i in range(4):
-                self.cube[5][i][3] = self.cube[0][i][3]
-                self.cube[0][i][3] = self.cube[4][i][3]
-                self.cube[4][i][3] = self.cube[2][3-i][0]
-                self.cube[2][3-i][0] = temp[i]
-        else:
-            temp = [self.cube[5][i][3] for i in range(4)]
-            for i in range(4):
-                self.cube[5][i][3] = self.cube[2][3-i][0]
-                self.cube[2][3-i][0] = self.cube[4][i][3]
-                self.cube[4][i][3] = self.cube[0][i][3]
-                self.cube[0][i][3] = temp[i]
-
-    def __rotateRightWide(self, inverted):
-        """Rotate both right layers (wide move)"""
-        self.__rotateRightFace(inverted)
-        # Also rotate the inner right layer
-        if not inverted:
-            temp = [self.cube[5][i][2] for i in range(4)]
-            for i in range(4):
-                self.cube[5][i][2] = self.cube[0][i][2]
-                self.cube[0][i][2] = self.cube[4][i][2]
-                self.cube[4][i][2] = self.cube[2][3-i][1]
-                self.cube[2][3-i][1] = temp[i]
-        else:
-            temp = [self.cube[5][i][2] for i in range(4)]
-            for i in range(4):
-                self.cube[5][i][2] = self.cube[2][3-i][1]
-                self.cube[2][3-i][1] = self.cube[4][i][2]
-                self.cube[4][i][2] = self.cube[0][i][2]
-                self.cube[0][i][2] = temp[i]
-
-    def __rotateLeftFace(self, inverted):
-        """Rotate the left face (only outer layer)"""
-        self.__rotateFace(3, inverted)
-        if not inverted:
-            temp = [self.cube[5][i][0] for i in range(4)]
-            for i in range(4):
-                self.cube[5][i][0] = self.cube[2][3-i][3]
-                self.cube[2][3-i][3] = self.cube[4][i][0]
-                self.cube[4][i][0] = self.cube[0][i][0]
-                self.cube[0][i][0] = temp[i]
-        else:
-            temp = [self.cube[5][i][0] for i in range(4)]
-            for i in range(4):
-                self.cube[5][i][0] = self.cube[0][i][0]
-                self.cube[0][i][0] = self.cube[4][i][0]
-                self.cube[4][i][0] = self.cube[2][3-i][3]
-                self.cube[2][3-i][3] = temp[i]
+    def applyMoves(self, moves):
+        """
+        Apply moves of fast_cube4x4.MOVES to this cube, skipping the formula parser.
 
-    def __rotateLeftWide(self, inverted):
-        """Rotate both left layers (wide move)"""
-        self.__rotateLeftFace(inverted)
-        # Also rotate the inner left layer
-        if not inverted:
-            temp = [self.cube[5][i][1] for i in range(4)]
-            for i in range(4):
-                self.cube[5][i][1] = self.cube[2][3-i][2]
-                self.cube[2][3-i][2] = self.cube[4][i][1]
-                self.cube[4][i][1] = self.cube[0][i][1]
-                self.cube[0][i][1] = temp[i]
-        else:
-            temp = [self.cube[5][i][1] for i in range(4)]
-            for i in range(4):
-                self.cube[5][i][1] = self.cube[0][i][1]
-                self.cube[0][i][1] = self.cube[4][i][1]
-                self.cube[4][i][1] = self.cube[2][3-i][2]
-                self.cube[2][3-i][2] = temp[i]
+        Parameters
+        ----------
+        moves : string or list of strings
+            The moves, separated by spaces if a string. Example: "Rw U2 Rw'"
 
-    def __rotateUpFace(self, inverted):
-        """Rotate the up face (only outer layer)"""
-        self.__rotateFace(5, inverted)
-        if not inverted:
-            temp = [self.cube[0][0][j] for j in range(4)]
-            for j in range(4):
-                self.cube[0][0][j] = self.cube[3][0][j]
-                self.cube[3][0][j] = self.cube[2][0][j]
-                self.cube[2][0][j] = self.cube[1][0][j]
-                self.cube[1][0][j] = temp[j]
-        else:
-            temp = [self.cube[0][0][j] for j in range(4)]
-            for j in range(4):
-                self.cube[0][0][j] = self.cube[1][0][j]
-                self.cube[1][0][j] = self.cube[2][0][j]
-                self.cube[2][0][j] = self.cube[3][0][j]
-                self.cube[3][0][j] = temp[j]
+        Raises
+        ------
+        KeyError
+            If a move is not one of fast_cube4x4.MOVES.
+        """
+        if(isinstance(moves, str)):
+            moves = moves.split()
+        state = self.state
+        for move in moves:
+            state = MOVE_GETTERS[move](state)
+        self.state = state
 
-    def __rotateUpWide(self, inverted):
-        """Rotate both up layers (wide move)"""
-        self.__rotateUpFace(inverted)
-        # Also rotate the inner up layer
-        if not inverted:
-            temp = [self.cube[0][1][j] for j in range(4)]
-            for j in range(4):
-                self.cube[0][1][j] = self.cube[3][1][j]
-                self.cube[3][1][j] = self.cube[2][1][j]
-                self.cube[2][1][j] = self.cube[1][1][j]
-                self.cube[1][1][j] = temp[j]
-        else:
-            temp = [self.cube[0][1][j] for j in range(4)]
-            for j in range(4):
-                self.cube[0][1][j] = self.cube[1][1][j]
-                self.cube[1][1][j] = self.cube[2][1][j]
-                self.cube[2][1][j] = self.cube[3][1][j]
-                self.cube[3][1][j] = temp[j]
+    def pushMove(self, move):
+        """
+        Applies a move of fast_cube4x4.MOVES to this cube, to be taken back by popMove(). The state
+        before the move is kept as it is (a tuple), so taking it back copies nothing.
 
-    def __rotateDownFace(self, inverted):
-        """Rotate the down face (only outer layer)"""
-        self.__rotateFace(4, inverted)
-        if not inverted:
-            temp = [self.cube[0][3][j] for j in range(4)]
-            for j in range(4):
-                self.cube[0][3][j] = self.cube[1][3][j]
-                self.cube[1][3][j] = self.cube[2][3][j]
-                self.cube[2][3][j] = self.cube[3][3][j]
-                self.cube[3][3][j] = temp[j]
-        else:
-            temp = [self.cube[0][3][j] for j in range(4)]
-            for j in range(4):
-                self.cube[0][3][j] = self.cube[3][3][j]
-                self.cube[3][3][j] = self.cube[2][3][j]
-                self.cube[2][3][j] = self.cube[1][3][j]
-                self.cube[1][3][j] = temp[j]
+        Example
+        -------
+        >>> cb.pushMove("Rw")
+        >>> cb.pushMove("U")
+        >>> cb.popMove()
+        >>> cb.popMove()
+        """
+        self.__trail.append(self.state)
+        self.state = MOVE_GETTERS[move](self.state)
 
-    def __rotateDownWide(self, inverted):
-        """Rotate both down layers (wide move)"""
-        self.__rotateDownFace(inverted)
-        # Also rotate the inner down layer
-        if not inverted:
-            temp = [self.cube[0][2][j] for j in range(4)]
-            for j in range(4):
-                self.cube[0][2][j] = self.cube[1][2][j]
-                self.cube[1][2][j] = self.cube[2][2][j]
-                self.cube[2][2][j] = self.cube[3][2][j]
-                self.cube[3][2][j] = temp[j]
-        else:
-            temp = [self.cube[0][2][j] for j in range(4)]
-            for j in range(4):
-                self.cube[0][2][j] = self.cube[3][2][j]
-                self.cube[3][2][j] = self.cube[2][2][j]
-                self.cube[2][2][j] = self.cube[1][2][j]
-                self.cube[1][2][j] = temp[j]
+    def popMove(self):
+        """
+        Takes back the last move of pushMove().
 
-    def __rotateFrontFace(self, inverted):
-        """Rotate the front face (only outer layer)"""
-        self.__rotateFace(0, inverted)
-        if not inverted:
-            temp = [self.cube[5][3][j] for j in range(4)]
-            for j in range(4):
-                self.cube[5][3][j] = self.cube[3][3-j][3]
-                self.cube[3][3-j][3] = self.cube[4][0][3-j]
-                self.cube[4][0][3-j] = self.cube[1][j][0]
-                self.cube[1][j][0] = temp[j]
-        else:
-            temp = [self.cube[5][3][j] for j in range(4)]
-            for j in range(4):
-                self.cube[5][3][j] = self.cube[1][j][0]
-                self.cube[1][j][0] = self.cube[4][0][3-j]
-                self.cube[4][0][3-j] = self.cube[3][3-j][3]
-                self.cube[3][3-j][3] = temp[j]
+        Raises
+        ------
+        IndexError
+            If there is no move to take back.
+        """
+        self.state = self.__trail.pop()
 
-    def __rotateFrontWide(self, inverted):
-        """Rotate both front layers (wide move)"""
-        self.__rotateFrontFace(inverted)
-        # Also rotate the inner front layer
-        if not inverted:
-            temp = [self.cube[5][2][j] for j in range(4)]
-            for j in range(4):
-                self.cube[5][2][j] = self.cube[3][3-j][2]
-                self.cube[3][3-j][2] = self.cube[4][1][3-j]
-                self.cube[4][1][3-j] = self.cube[1][j][1]
-                self.cube[1][j][1] = temp[j]
-        else:
-            temp = [self.cube[5][2][j] for j in range(4)]
-            for j in range(4):
-                self.cube[5][2][j] = self.cube[1][j][1]
-                self.cube[1][j][1] = self.cube[4][1][3-j]
-                self.cube[4][1][3-j] = self.cube[3][3-j][2]
-                self.cube[3][3-j][2] = temp[j]
+    def probe(self, moves, predicate):
+        """
+        Tests a predicate on this cube after some moves, and rolls the moves back.
 
-    def __rotateBackFace(self, inverted):
-        """Rotate the back face (only outer layer)"""
-        self.__rotateFace(2, inverted)
-        if not inverted:
-            temp = [self.cube[5][0][j] for j in range(4)]
-            for j in range(4):
-                self.cube[5][0][j] = self.cube[1][j][3]
-                self.cube[1][j][3] = self.cube[4][3][3-j]
-                self.cube[4][3][3-j] = self.cube[3][3-j][0]
-                self.cube[3][3-j][0] = temp[j]
-        else:
-            temp = [self.cube[5][0][j] for j in range(4)]
-            for j in range(4):
-                self.cube[5][0][j] = self.cube[3][3-j][0]
-                self.cube[3][3-j][0] = self.cube[4][3][3-j]
-                self.cube[4][3][3-j] = self.cube[1][j][3]
-                self.cube[1][j][3] = temp[j]
+        Parameters
+        ----------
+        moves : string or list of strings
+            Moves of fast_cube4x4.MOVES, separated by spaces if a string.
+        predicate : function
+            Called with this cube once the moves are applied.
 
-    def __rotateBackWide(self, inverted):
-        """Rotate both back layers (wide move)"""
-        self.__rotateBackFace(inverted)
-        # Also rotate the inner back layer
-        if not inverted:
-            temp = [self.cube[5][1][j] for j in range(4)]
-            for j in range(4):
-                self.cube[5][1][j] = self.cube[1][j][2]
-                self.cube[1][j][2] = self.cube[4][2][3-j]
-                self.cube[4][2][3-j] = self.cube[3][3-j][1]
-                self.cube[3][3-j][1] = temp[j]
-        else:
-            temp = [self.cube[5][1][j] for j in range(4)]
-            for j in range(4):
-                self.cube[5][1][j] = self.cube[3][3-j][1]
-                self.cube[3][3-j][1] = self.cube[4][2][3-j]
-                self.cube[4][2][3-j] = self.cube[1][j][2]
-                self.cube[1][j][2] = temp[j]
+        Returns
+        -------
+        result
+            What the predicate returned. The cube is back in its state before the moves either way.
 
-    def __rotateFace(self, face, inverted):
-        """Rotate a face clockwise or counterclockwise"""
-        if not inverted:
-            # Clockwise rotation for 4x4
-            temp = [[self.cube[face][i][j] for j in range(4)] for i in range(4)]
-            for i in range(4):
-                for j in range(4):
-                    self.cube[face][i][j] = temp[3-j][i]
-        else:
-            # Counterclockwise rotation for 4x4
-            temp = [[self.cube[face][i][j] for j in range(4)] for i in range(4)]
-            for i in range(4):
-                for j in range(4):
-                    self.cube[face][i][j] = temp[j][3-i]
+        Example
+        -------
+        >>> cb.probe("R U", Cube4x4.isSolved)
+        False
+        """
+        if(isinstance(moves, str)):
+            moves = moves.split()
+        state = self.state
+        try:
+            for move in moves:
+                self.state = MOVE_GETTERS[move](self.state)
+            return predicate(self)
+        finally:
+            self.state = state
@@ -0,0 +1,103 @@
+from functools import lru_cache
+from cube import Cube
+from helper import parseFormula
+from solver_tables import loadTables
+
+# every instruction parseFormula() can give
+TOKENS = ["U", "D", "R", "L", "F", "B", "E", "M", "S", "x", "y", "z", "u", "d", "r", "l", "f", "b"]
+TOKENS = TOKENS + [token + "P" for token in TOKENS]
+
+def _stickerIndex(side, row, col):
+    return side * 9 + row * 3 + col
+
+def buildPermutations():
+    """
+    Gives the permutation of every instruction, by applying it once to a cube whose stickers are their
+    own indices: for every position, it has the index of the sticker that moves there.
+    """
+    permutations = {}
+    for token in TOKENS:
+        cube = Cube(faces=[[[_stickerIndex(side, row, col) for col in range(3)] for row in range(3)] for side in range(6)])
+        cube.doMoves(token[0] + ("'" if token.endswith("P") else ""))
+        permutations[token] = tuple(sticker for face in cube.cube for row in face for sticker in row)
+    return permutations
+
+# compiled into the tables artifact by table_builder.py, built here when there is none
+PERMUTATIONS = loadTables().get("permutations") or buildPermutations()
+IDENTITY = tuple(range(54))
+
+def compose(first, second):
+    """
+    Gives the permutation of applying `first` and then `second`.
+    """
+    return tuple(first[i] for i in second)
+
+@lru_cache(maxsize=4096)
+def formulaPermutation(form):
+    """
+    Compiles a formula into a single permutation of the 54 sticker positions.
+
+    Parameters
+    ----------
+    form : string
+        The formula, in the notation Cube.doMoves() accepts.
+
+    Returns
+    -------
+    permutation : tuple of size 54
+        For every position, the position its sticker comes from. The identity if the formula is invalid,
+        like Cube.doMoves() ignores invalid formulas.
+    """
+    permutation = IDENTITY
+    for token in parseFormula(form):
+        permutation = compose(permutation, PERMUTATIONS[token])
+    return permutation
+
+def fromFaces(faces):
+    """
+    Flattens a cube faces matrix array into a state tuple of 54 stickers.
+    """
+    return tuple(sticker for face in faces for row in face for sticker in row)
+
+def toFaces(state):
+    """
+    Gives the cube faces matrix array of a state tuple.
+    """
+    return [[list(state[side * 9 + row * 3: side * 9 + row * 3 + 3]) for row in range(3)] for side in range(6)]
+
+def applyFormula(state, form):
+    """
+    Applies a formula to a state tuple, same as Cube.doMoves() but without copying lists around.
+
+    Example
+    -------
+    >>> state = applyFormula(fromFaces(Cube().getFaces()), "RUR'U'")
+    >>> toFaces(state) == Cube(faces=toFaces(state)).getFaces()
+    True
+    """
+    permutation = formulaPermutation(form)
+    return tuple(state[i] for i in permutation)
+
+def invertFormula(form):
+    """
+    Gives the formula that undoes a formula.
+
+    Example
+    -------
+    >>> invertFormula("RUR'U2")
+    "U'U'RU'R'"
+    """
+    moves = []
+    for token in reversed(parseFormula(form, condense=False)):
+        # wide turns are written as Rw rather than r, the notation the solver tables use
+        move = token[0].upper() + "w" if token[0] in "udrlfb" else token[0]
+        moves.append(move if token.endswith("P") else move + "'")
+    return "".join(moves)
+
+def getSticker(state, side, row, col):
+    """
+    Gives the sticker of a state tuple at a (side, row, col) position.
+    """
+    return state[_stickerIndex(side, row, col)]
+
+SOLVED = fromFaces(Cube().getFaces())
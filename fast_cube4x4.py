@@ -0,0 +1,161 @@
+from solver_tables import loadTables
+from validator import COLORS, NORMALS, stickerPosition
+
+# every face turn of a 4x4: outer layer and wide (two layers), quarter, inverse and half turns
+MOVES = [face + wide + turn for face in ["U", "D", "R", "L", "F", "B"] for wide in ["", "w"] for turn in ["", "'", "2"]]
+# the 3x3 instructions (see parseFormula()) as 4x4 moves on a reduced cube, the inner slices move with the middle layer
+REDUCED_MOVES = {
+    "U": "U", "D": "D", "R": "R", "L": "L", "F": "F", "B": "B",
+    "x": "Rw Lw'", "y": "Uw Dw'", "z": "Fw Bw'",
+    "M": "R L' Rw' Lw", "E": "U D' Uw' Dw", "S": "F' B Fw Bw'",
+    "r": "L Rw Lw'", "l": "R Rw' Lw", "u": "D Uw Dw'", "d": "U Uw' Dw", "f": "B Fw Bw'", "b": "F Fw' Bw"
+}
+SIDES = {"F": 0, "R": 1, "B": 2, "L": 3, "D": 4, "U": 5}
+
+def _stickerIndex(side, row, col):
+    return side * 16 + row * 4 + col
+
+def _quarterTurn(vector, axis):
+    # turns a vector a quarter clockwise, as seen from the end of the axis
+    cross = (axis[1] * vector[2] - axis[2] * vector[1], axis[2] * vector[0] - axis[0] * vector[2], axis[0] * vector[1] - axis[1] * vector[0])
+    along = sum(a * v for a, v in zip(axis, vector))
+    return tuple(a * along - c for a, c in zip(axis, cross))
+
+def buildPermutations():
+    """
+    Gives the permutation of every move: for every position, the position its sticker comes from.
+
+    The stickers are placed in space (see validator.stickerPosition()) and the ones in the turning
+    layers are rotated around the normal of the face.
+    """
+    stickers = [(side, row, col) for side in range(6) for row in range(4) for col in range(4)]
+    positions = {stickerPosition(4, *sticker): _stickerIndex(*sticker) for sticker in stickers}
+    permutations = {}
+    for move in MOVES:
+        axis = NORMALS[SIDES[move[0]]]
+        # the cubies of the outer layer are 3 out along the axis, the ones of the second layer 1
+        depth = 1 if "w" in move else 3
+        turns = {"'": 3, "2": 2}.get(move[-1], 1)
+        permutation = list(range(96))
+        for side, row, col in stickers:
+            position = stickerPosition(4, side, row, col)
+            cubie = tuple(p - n for p, n in zip(position, NORMALS[side]))
+            if(sum(a * c for a, c in zip(axis, cubie)) < depth):
+                continue
+            for _ in range(turns):
+                position = _quarterTurn(position, axis)
+            permutation[positions[position]] = _stickerIndex(side, row, col)
+        permutations[move] = tuple(permutation)
+    return permutations
+
+# compiled into the tables artifact by table_builder.py, built here when there is none
+PERMUTATIONS = loadTables().get("permutations4x4") or buildPermutations()
+IDENTITY = tuple(range(96))
+
+def compose(first, second):
+    """
+    Gives the permutation of applying `first` and then `second`.
+    """
+    return tuple(first[i] for i in second)
+
+def formulaPermutation(form):
+    """
+    Compiles a formula into a single permutation of the 96 sticker positions.
+
+    Parameters
+    ----------
+    form : string
+        Moves of MOVES separated by spaces, e.g. "Rw U2 Rw'".
+
+    Returns
+    -------
+    permutation : tuple of size 96
+        For every position, the position its sticker comes from.
+    """
+    permutation = IDENTITY
+    for move in form.split():
+        permutation = compose(permutation, PERMUTATIONS[move])
+    return permutation
+
+def inverseMove(move):
+    """
+    Gives the move that undoes a move of MOVES.
+    """
+    if(move.endswith("2")):
+        return move
+    if(move.endswith("'")):
+        return move[:-1]
+    return move + "'"
+
+def invertFormula(form):
+    """
+    Gives the formula that undoes a formula of moves separated by spaces.
+
+    Example
+    -------
+    >>> invertFormula("Rw U R'")
+    "R U' Rw'"
+    """
+    return " ".join(inverseMove(move) for move in reversed(form.split()))
+
+# layers in the order moves of a same axis are searched in: they commute, so only one order of them is tried
+LAYERS = ["U", "Uw", "D", "Dw", "R", "Rw", "L", "Lw", "F", "Fw", "B", "Bw"]
+
+def followingMoves(moves):
+    """
+    Gives the moves a search should try after every move (None at the start): never the same layer
+    twice in a row, and the layers of one axis only in the order of LAYERS.
+
+    Parameters
+    ----------
+    moves : list of strings
+        The moves of the search, of MOVES (or the outer ones only, as for a 3x3).
+
+    Returns
+    -------
+    successors : dict
+        For None and every move, the list of moves that can follow it.
+    """
+    def follows(previous, move):
+        if(previous is None):
+            return True
+        before = LAYERS.index(previous.rstrip("'2"))
+        after = LAYERS.index(move.rstrip("'2"))
+        return before // 4 != after // 4 or after > before
+    return {previous: [move for move in moves if follows(previous, move)] for previous in [None] + moves}
+
+def fromFaces(faces):
+    """
+    Flattens a 4x4 cube faces matrix array into a state tuple of 96 stickers.
+    """
+    return tuple(sticker for face in faces for row in face for sticker in row)
+
+def toFaces(state):
+    """
+    Gives the 4x4 cube faces matrix array of a state tuple.
+    """
+    return [[list(state[side * 16 + row * 4: side * 16 + row * 4 + 4]) for row in range(4)] for side in range(6)]
+
+def applyPermutation(state, permutation):
+    """
+    Applies a permutation (see formulaPermutation()) to a state tuple.
+    """
+    return tuple(state[i] for i in permutation)
+
+def applyFormula(state, form):
+    """
+    Applies a formula of moves separated by spaces to a state tuple, same as Cube4x4.doMoves().
+
+    Example
+    -------
+    >>> state = applyFormula(SOLVED, "Rw U Rw'")
+    """
+    return applyPermutation(state, formulaPermutation(form))
+
+def getSticker(state, side, row, col):
+    """
+    Gives the sticker of a state tuple at a (side, row, col) position.
+    """
+    return state[_stickerIndex(side, row, col)]
+
+SOLVED = tuple(COLORS[i // 16] for i in range(96))
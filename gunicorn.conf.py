@@ -0,0 +1,12 @@
+# gunicorn settings of the container (see the Dockerfile), the environment variables override them
+import os
+
+bind = "0.0.0.0:" + os.environ.get("PORT", "8080")
+workers = int(os.environ.get("WEB_CONCURRENCY", 1))
+# most threads wait, on the process pool or in an admission lane, and cheap solves need a free one
+threads = int(os.environ.get("PYCUBE_THREADS", 32))
+timeout = 120
+# the app is created once in the master, which loads the solver tables and fills the caches before
+# forking: the workers share all of it, so more workers do not take more memory for the tables
+wsgi_app = "app:create_app()"
+preload_app = True
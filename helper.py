@@ -1,4 +1,5 @@
 import random
+import re
 
 def getScramble(length):
     """
@@ -316,7 +317,7 @@ def parseFormula(form, condense = True):
     Parameters
     ----------
     form : string
-        The formula to be parsed.
+        The formula to be parsed. Whitespace and newlines are ignored.
     condense : bool, default=True
         If set to True, it will perform condensation to the formula before parsing.
         This will skip redundant moves if present.
@@ -334,6 +335,7 @@ def parseFormula(form, condense = True):
     >>> parseFormula("FRU(")
     []
     """
+    form = "".join(form.split())
     if(not isValid(form)):
         return []
     if(condense):
@@ -372,3 +374,63 @@ def parseFormula(form, condense = True):
             for _ in range(cnt):
                 ans.append(cm)
     return ans
+
+def splitFormula(form):
+    """
+    Splits a formula without parentheses into its moves, as written.
+
+    Parameters
+    ----------
+    form : string
+        The formula, with or without whitespace between the moves. Wide moves can be written "Rw".
+
+    Returns
+    -------
+    moves : list of strings
+        The moves of the formula. Empty list if the formula has anything else than moves.
+
+    Examples
+    --------
+    >>> splitFormula("RU'Rw2 y")
+    ['R', "U'", 'Rw2', 'y']
+    >>> splitFormula("(RU)2")
+    []
+    """
+    form = "".join(form.split())
+    moves = re.findall(r"[UDRLFBEMSxyzudrlfb]w?(?:'2|2'|'|2)?", form)
+    if("".join(moves) != form):
+        return []
+    return moves
+
+def countMoves(form, rotations = False):
+    """
+    Counts the moves of a formula in the half turn metric.
+
+    Parameters
+    ----------
+    form : string
+        The formula to be counted. Whitespace and newlines are ignored.
+    rotations : bool, default=False
+        If set to True, whole cube rotations (x, y, z) are counted as moves as well.
+
+    Returns
+    -------
+    count : int
+        Number of moves, where a double turn counts as one move.
+        -1 if the formula is invalid.
+
+    Examples
+    --------
+    >>> countMoves("RUR'U'")
+    4
+    >>> countMoves("yR2U R'")
+    3
+    """
+    form = "".join(form.split())
+    if(not isValid(form)):
+        return -1
+    count = 0
+    for ch in condenseFormula(form):
+        if(ch.isalpha() and ch != 'P' and ch != 'w' and (rotations or ch not in ['x', 'y', 'z'])):
+            count += 1
+    return count
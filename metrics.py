@@ -0,0 +1,190 @@
+import threading
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+class Histogram:
+    """
+    A process-wide histogram that can be exported in the Prometheus text format.
+
+    Parameters
+    ----------
+    name : string
+        Name of the metric, e.g. "pycube_solver_phase_seconds".
+    documentation : string
+        Help text written next to the metric.
+    buckets : list of floats
+        Upper bounds of the buckets. The "+Inf" bucket is always added.
+    labelnames : tuple of strings, default=()
+        Names of the labels the observations are split by.
+
+    Example
+    -------
+    >>> hist = Histogram("latency_seconds", "Latency.", [0.1, 1.0], ("route",))
+    >>> hist.observe(0.05, route="/api/solve")
+    """
+
+    def __init__(self, name, documentation, buckets, labelnames = ()):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = sorted(float(b) for b in buckets)
+        self.labelnames = tuple(labelnames)
+        self.__lock = threading.Lock()
+        # label values -> [bucket counts..., sum, count]
+        self.__series = {}
+
+    def observe(self, value, **labels):
+        """
+        Record a single observation.
+        """
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self.__lock:
+            series = self.__series.get(key)
+            if(series is None):
+                series = [0] * (len(self.buckets) + 2)
+                self.__series[key] = series
+            for i, bound in enumerate(self.buckets):
+                if(value <= bound):
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self):
+        """
+        Renders the histogram as lines of the Prometheus text format.
+        """
+        lines = ["# HELP " + self.name + " " + self.documentation, "# TYPE " + self.name + " histogram"]
+        with self.__lock:
+            items = sorted((key, list(series)) for key, series in self.__series.items())
+        for key, series in items:
+            pairs = [name + '="' + _escape(value) + '"' for name, value in zip(self.labelnames, key)]
+            for i, bound in enumerate(self.buckets):
+                lines.append(self.name + "_bucket{" + ",".join(pairs + ['le="' + repr(bound) + '"']) + "} " + str(series[i]))
+            lines.append(self.name + "_bucket{" + ",".join(pairs + ['le="+Inf"']) + "} " + str(series[-1]))
+            suffix = "{" + ",".join(pairs) + "}" if pairs else ""
+            lines.append(self.name + "_sum" + suffix + " " + repr(float(series[-2])))
+            lines.append(self.name + "_count" + suffix + " " + str(series[-1]))
+        return lines
+
+class Counter:
+    """
+    A process-wide monotonically increasing counter.
+
+    Parameters
+    ----------
+    name : string
+        Name of the metric, should end with "_total".
+    documentation : string
+        Help text written next to the metric.
+    labelnames : tuple of strings, default=()
+        Names of the labels the counter is split by.
+    """
+
+    def __init__(self, name, documentation, labelnames = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.__lock = threading.Lock()
+        # an unlabelled counter is exported as 0 before its first increment
+        self.__values = {} if self.labelnames else {(): 0}
+
+    def inc(self, amount = 1, **labels):
+        """
+        Increments the counter.
+        """
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self.__lock:
+            self.__values[key] = self.__values.get(key, 0) + amount
+
+    def render(self):
+        """
+        Renders the counter as lines of the Prometheus text format.
+        """
+        lines = ["# HELP " + self.name + " " + self.documentation, "# TYPE " + self.name + " counter"]
+        with self.__lock:
+            items = sorted(self.__values.items())
+        for key, value in items:
+            pairs = [name + '="' + _escape(label) + '"' for name, label in zip(self.labelnames, key)]
+            suffix = "{" + ",".join(pairs) + "}" if pairs else ""
+            lines.append(self.name + suffix + " " + str(value))
+        return lines
+
+class Gauge:
+    """
+    A gauge whose value is read from a callback every time the metrics are rendered.
+
+    Parameters
+    ----------
+    name : string
+        Name of the metric.
+    documentation : string
+        Help text written next to the metric.
+    callback : callable
+        Returns the current value.
+    """
+
+    def __init__(self, name, documentation, callback):
+        self.name = name
+        self.documentation = documentation
+        self.callback = callback
+
+    def render(self):
+        """
+        Renders the gauge as lines of the Prometheus text format.
+        """
+        return ["# HELP " + self.name + " " + self.documentation, "# TYPE " + self.name + " gauge", self.name + " " + repr(float(self.callback()))]
+
+class Registry:
+    """
+    A collection of metrics that are rendered together at the /metrics endpoint.
+    """
+
+    def __init__(self):
+        self.__lock = threading.Lock()
+        self.__metrics = {}
+
+    def register(self, metric):
+        """
+        Registers a metric. Registering a second metric with the same name returns the first one.
+        """
+        with self.__lock:
+            return self.__metrics.setdefault(metric.name, metric)
+
+    def render(self):
+        """
+        Renders every registered metric in the Prometheus text format.
+        """
+        with self.__lock:
+            metrics = list(self.__metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+REGISTRY = Registry()
+
+def histogram(name, documentation, buckets, labelnames = ()):
+    """
+    Creates (or fetches) a histogram registered in the process-wide registry.
+    """
+    return REGISTRY.register(Histogram(name, documentation, buckets, labelnames))
+
+def counter(name, documentation, labelnames = ()):
+    """
+    Creates (or fetches) a counter registered in the process-wide registry.
+    """
+    return REGISTRY.register(Counter(name, documentation, labelnames))
+
+def gauge(name, documentation, callback):
+    """
+    Creates (or fetches) a callback gauge registered in the process-wide registry.
+    """
+    return REGISTRY.register(Gauge(name, documentation, callback))
+
+def renderMetrics():
+    """
+    Renders the process-wide registry in the Prometheus text format.
+    """
+    return REGISTRY.render()
+
+def _escape(value):
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
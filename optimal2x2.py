@@ -0,0 +1,247 @@
+import argparse
+import hashlib
+import logging
+import mmap
+import multiprocessing
+import os
+import struct
+import time
+from array import array
+from cube2x2 import Cube2x2
+from coords2x2 import MOVES, ORIENTATIONS, SOLVED_INDEX, STATES, applyMove, moveTables, stateIndex
+from structured_log import logEvent
+
+# distance table artifact: magic, format version, number of states and sha256 of the packed distances
+HEADER = struct.Struct("<8sHI32s")
+MAGIC = b"PYC2X2DT"
+FORMAT_VERSION = 1
+DEFAULT_TABLE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "table2x2.bin")
+UNVISITED = 255
+
+class DistanceTable:
+    """
+    The distance to solved of every 2x2 state, modulo 3 in 2 bits per state (about 900 KB).
+
+    The file is memory-mapped, so lookups read straight from the page cache that every worker of the
+    host shares. A neighbour of a state is one move closer to solved exactly when its value is one
+    less modulo 3, which is all the greedy descent of OptimalSolver2x2 needs.
+
+    Raises
+    ------
+    ValueError
+        If the file is not a distance table, has another format version or is damaged.
+    """
+
+    def __init__(self, path):
+        with open(path, "rb") as file:
+            self.__mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, states, digest = HEADER.unpack_from(self.__mapped) if len(self.__mapped) >= HEADER.size else (None, None, None, None)
+        if(magic != MAGIC or version != FORMAT_VERSION or states != STATES):
+            raise ValueError(path + " is not a 2x2 distance table of format version " + str(FORMAT_VERSION))
+        if(len(self.__mapped) != HEADER.size + (STATES + 3) // 4):
+            raise ValueError(path + " is truncated")
+        with memoryview(self.__mapped)[HEADER.size:] as payload:
+            if(hashlib.sha256(payload).digest() != digest):
+                raise ValueError(path + " does not match its checksum")
+        self.path = path
+
+    def value(self, index):
+        """
+        Gives the distance to solved of a state index, modulo 3.
+        """
+        return (self.__mapped[HEADER.size + (index >> 2)] >> ((index & 3) * 2)) & 3
+
+_tables = {}
+
+def loadDistanceTable(path = None):
+    """
+    Gives the distance table, mapped once per process.
+
+    Parameters
+    ----------
+    path : string, default=None
+        Path of the table. None uses PYCUBE_2X2_TABLE_PATH, or table2x2.bin next to this file.
+
+    Returns
+    -------
+    table : DistanceTable object or None
+        None if there is no usable table (build it with `python optimal2x2.py`), which is
+        only looked for once per process and path.
+    """
+    if(path is None):
+        path = os.environ.get("PYCUBE_2X2_TABLE_PATH", DEFAULT_TABLE_PATH)
+    if(path not in _tables):
+        # a missing or unusable table is kept as None too, so that it is not opened again on every solve
+        try:
+            _tables[path] = DistanceTable(path)
+        except (OSError, ValueError) as e:
+            logEvent("table_unavailable", logging.WARNING, path=path, error=str(e))
+            _tables[path] = None
+    return _tables[path]
+
+class OptimalSolver2x2:
+    """
+    A 2x2 solver that gives a shortest solution (in the half turn metric), using the distance table.
+
+    Parameters
+    ----------
+    cube : Cube2x2 object
+        The cube to be solved. This object will not be modified due to the solve.
+    table : DistanceTable object, default=None
+        The distance table. None uses loadDistanceTable().
+
+    Example
+    -------
+    >>> cb = Cube2x2()
+    >>> cb.doMoves("R U F'")
+    >>> solver = OptimalSolver2x2(cb)
+    >>> solver.solveCube()
+    >>> solver.getMoves(decorated=False)
+    "F U' R'"
+    """
+
+    def __init__(self, cube, table = None):
+        self.cube = Cube2x2(faces=cube.getFaces())
+        self.table = table if table is not None else loadDistanceTable()
+        if(self.table is None):
+            raise RuntimeError("The 2x2 distance table is missing, build it with `python optimal2x2.py`")
+        self.moves = []
+
+    def solveCube(self, optimize = True):
+        """
+        Solves the cube by always making a move that brings it one move closer to solved.
+        `optimize` is accepted for compatibility with the other solvers, every solve is optimal.
+        """
+        index = stateIndex(self.cube.cube)
+        distance = self.table.value(index)
+        self.moves = []
+        while(index != SOLVED_INDEX):
+            # God's number of the 2x2 is 11, anything longer means the table is damaged
+            if(len(self.moves) > 11):
+                raise RuntimeError("The 2x2 distance table is inconsistent")
+            for m in range(len(MOVES)):
+                following = applyMove(index, m)
+                if(self.table.value(following) == (distance - 1) % 3):
+                    self.moves.append(MOVES[m])
+                    index = following
+                    distance = (distance - 1) % 3
+                    break
+            else:
+                raise RuntimeError("The 2x2 distance table is inconsistent")
+        self.cube.doMoves(" ".join(self.moves))
+
+    def getMoves(self, decorated = True):
+        """
+        Gives the solution, with its moves separated by spaces.
+        """
+        if(len(self.moves) == 0):
+            return "Already solved!"
+        solution = " ".join(self.moves)
+        if(decorated):
+            return "Optimal Solution: " + solution
+        return solution
+
+# the table being built, inherited by the forked BFS workers
+_building = None
+
+def _expand(chunk):
+    # neighbours of a chunk of the frontier that the table has not reached yet
+    permutationTable, orientationTable = moveTables()
+    found = set()
+    for index in chunk:
+        permutation, orientation = divmod(index, ORIENTATIONS)
+        permutation *= len(MOVES)
+        orientation *= len(MOVES)
+        for m in range(len(MOVES)):
+            following = permutationTable[permutation + m] * ORIENTATIONS + orientationTable[orientation + m]
+            if(_building[following] == UNVISITED):
+                found.add(following)
+    return array("I", found).tobytes()
+
+def _saveCheckpoint(path, depth, table):
+    with open(path + ".tmp", "wb") as file:
+        file.write(struct.pack("<B", depth))
+        file.write(table)
+    os.replace(path + ".tmp", path)
+
+def buildDistanceTable(path = DEFAULT_TABLE_PATH, workers = None, log = print):
+    """
+    Builds the distance table by a breadth first search from the solved state and writes it to a file.
+
+    Every level of the search is split between worker processes. After each level the table so far is
+    saved next to the output (as <path>.partial), and a build that is stopped resumes from there.
+    The build needs well under 512 MB.
+
+    Parameters
+    ----------
+    path : string, default=DEFAULT_TABLE_PATH
+        Where to write the table.
+    workers : int, default=None
+        Number of worker processes, the number of CPUs if not given.
+    log : function, default=print
+        Gets the progress messages.
+    """
+    global _building
+    moveTables()
+    checkpoint = path + ".partial"
+    if(os.path.exists(checkpoint)):
+        with open(checkpoint, "rb") as file:
+            depth = struct.unpack("<B", file.read(1))[0]
+            table = bytearray(file.read())
+        log("resuming at depth " + str(depth))
+    else:
+        depth = 0
+        table = bytearray([UNVISITED]) * STATES
+        table[SOLVED_INDEX] = 0
+    frontier = array("I")
+    position = table.find(depth)
+    while(position >= 0):
+        frontier.append(position)
+        position = table.find(depth, position + 1)
+    workers = workers or len(os.sched_getaffinity(0))
+    # the workers are forked for every level, so that they see the table as it is
+    context = multiprocessing.get_context("fork")
+    while(len(frontier) > 0):
+        started = time.monotonic()
+        _building = table
+        size = max(1, -(-len(frontier) // (workers * 4)))
+        chunks = [frontier[i: i + size] for i in range(0, len(frontier), size)]
+        following = array("I")
+        if(workers > 1):
+            with context.Pool(workers) as pool:
+                for found in pool.imap_unordered(_expand, chunks):
+                    following.frombytes(found)
+        else:
+            for chunk in chunks:
+                following.frombytes(_expand(chunk))
+        depth += 1
+        frontier = array("I")
+        for index in following:
+            if(table[index] == UNVISITED):
+                table[index] = depth
+                frontier.append(index)
+        if(len(frontier) > 0):
+            log("depth " + str(depth) + ": " + str(len(frontier)) + " states in " + str(round(time.monotonic() - started, 1)) + " s")
+            _saveCheckpoint(checkpoint, depth, table)
+    _building = None
+    if(table.find(UNVISITED) >= 0):
+        raise RuntimeError("The search did not reach every state")
+    packed = bytearray((STATES + 3) // 4)
+    for index in range(STATES):
+        packed[index >> 2] |= (table[index] % 3) << ((index & 3) * 2)
+    with open(path + ".tmp", "wb") as file:
+        file.write(HEADER.pack(MAGIC, FORMAT_VERSION, STATES, hashlib.sha256(packed).digest()))
+        file.write(packed)
+    os.replace(path + ".tmp", path)
+    # a process that found no table before now maps the new one
+    _tables.pop(path, None)
+    if(os.path.exists(checkpoint)):
+        os.remove(checkpoint)
+    log("wrote " + path)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Builds the distance table of the optimal 2x2 solver.")
+    parser.add_argument("--output", default=DEFAULT_TABLE_PATH, help="path of the table")
+    parser.add_argument("--workers", type=int, default=None, help="number of worker processes")
+    args = parser.parse_args()
+    buildDistanceTable(args.output, args.workers)
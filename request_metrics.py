@@ -0,0 +1,43 @@
+from metrics import counter, histogram
+
+# cube types used as label values, anything else is "other" so that requests cannot make up new series
+CUBE_TYPES = ("2x2", "3x3", "4x4")
+
+requestSeconds = histogram("pycube_http_request_seconds", "Time from a request coming in to its response being sent, by route and cube type.",
+                           [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0], ("route", "cube_type"))
+requestBytes = histogram("pycube_http_request_bytes", "Size of the request bodies, by route and cube type.",
+                         [256, 1024, 4096, 16384, 65536, 262144, 1048576], ("route", "cube_type"))
+responseBytes = histogram("pycube_http_response_bytes", "Size of the response bodies (not streamed ones), by route and cube type.",
+                          [256, 1024, 4096, 16384, 65536, 262144, 1048576], ("route", "cube_type"))
+requestsTotal = counter("pycube_http_requests_total", "Requests answered, by route, cube type and status.", ("route", "cube_type", "status"))
+errorsTotal = counter("pycube_http_errors_total", "Requests that failed, with an error status or a payload the route marks as failed, by route, cube type and status.",
+                      ("route", "cube_type", "status"))
+cacheLookups = counter("pycube_http_cache_lookups_total", "Solves answered from a cache (hit), by another request's solve (coalesced) or solved (miss), by route and cube type.",
+                       ("route", "cube_type", "result"))
+
+def cubeTypeLabel(cube_type):
+    """
+    Gives the label value of a cube type: the cube type, "" if there is none, or "other".
+    """
+    if(cube_type is None):
+        return ""
+    return cube_type if cube_type in CUBE_TYPES else "other"
+
+def observeRequest(route, cube_type, status, seconds, request_bytes, response_bytes, failed):
+    """
+    Records a finished request. `response_bytes` is None for a streamed response.
+    """
+    requestSeconds.observe(seconds, route=route, cube_type=cube_type)
+    requestsTotal.inc(route=route, cube_type=cube_type, status=status)
+    if(request_bytes is not None):
+        requestBytes.observe(request_bytes, route=route, cube_type=cube_type)
+    if(response_bytes is not None):
+        responseBytes.observe(response_bytes, route=route, cube_type=cube_type)
+    if(failed):
+        errorsTotal.inc(route=route, cube_type=cube_type, status=status)
+
+def countCacheLookup(route, cube_type, result):
+    """
+    Records how a solve was answered: "hit", "coalesced" or "miss".
+    """
+    cacheLookups.inc(route=route, cube_type=cubeTypeLabel(cube_type), result=result)
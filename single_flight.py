@@ -0,0 +1,94 @@
+import threading
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from metrics import counter, gauge
+
+flightLeaders = counter("pycube_single_flight_leaders_total", "Solves run by the first request for a state.")
+flightFollowers = counter("pycube_single_flight_followers_total", "Requests that waited for the solve of an identical request in flight.",
+                          ("outcome",))
+
+class SingleFlight:
+    """
+    Runs one call at a time per key: a call for a key that is already in flight waits for the
+    running one (the leader) and gets its result, rather than doing the same work again.
+
+    Parameters
+    ----------
+    timeout : float, default=10
+        Seconds a follower waits for the leader. None waits for as long as it takes.
+
+    Example
+    -------
+    >>> flight = SingleFlight()
+    >>> payload, shared = flight.do(key, lambda: solveState(cube_type, cube_state))
+    """
+
+    def __init__(self, timeout = 10):
+        self.timeout = timeout
+        self.__lock = threading.Lock()
+        self.__calls = {}
+
+    def do(self, key, function, timeout = None):
+        """
+        Calls the function, or waits for the call in flight for the same key.
+
+        Parameters
+        ----------
+        key : hashable
+            What identical calls share.
+        function : function
+            The call, without arguments.
+        timeout : float, default=None
+            Seconds a follower waits for the leader, e.g. what is left until its deadline.
+            None uses `timeout` of the object.
+
+        Returns
+        -------
+        result
+            What the function returned, to the leader and to every follower (the same object).
+        shared : bool
+            True for a follower.
+
+        Raises
+        ------
+        concurrent.futures.TimeoutError
+            If the leader takes longer than `timeout`. The leader goes on, the follower is free to
+            call the function itself.
+        Exception
+            Whatever the function raised, for the leader and its followers.
+        """
+        with self.__lock:
+            future = self.__calls.get(key)
+            leader = future is None
+            if(leader):
+                future = Future()
+                self.__calls[key] = future
+        if(not leader):
+            try:
+                result = future.result(self.timeout if timeout is None else timeout)
+            except FutureTimeoutError:
+                flightFollowers.inc(outcome="timeout")
+                raise
+            flightFollowers.inc(outcome="shared")
+            return result, True
+        flightLeaders.inc()
+        try:
+            result = function()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result, False
+        finally:
+            with self.__lock:
+                del self.__calls[key]
+
+    def __len__(self):
+        with self.__lock:
+            return len(self.__calls)
+
+def registerGauges(flight):
+    """
+    Exports the number of calls in flight at /metrics.
+    """
+    gauge("pycube_single_flight_in_flight", "Distinct solves in flight.", lambda: len(flight))
@@ -0,0 +1,160 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from coords2x2 import stateKey
+from metrics import counter, gauge
+
+cacheHits = counter("pycube_solution_cache_hits_total", "Solves answered from the in-process solution cache.")
+cacheMisses = counter("pycube_solution_cache_misses_total", "Solves that missed the in-process solution cache.")
+cacheEvictions = counter("pycube_solution_cache_evictions_total", "Entries evicted from the in-process solution cache.", ("reason",))
+
+def stateHash(cube_state):
+    """
+    Hashes a cube faces matrix array into a canonical digest.
+
+    Parameters
+    ----------
+    cube_state : list of size (6, N, N)
+        The cube faces matrix array.
+
+    Returns
+    -------
+    digest : string
+        Hex digest of the stickers read face by face, row by row.
+        Two states have the same digest only if every sticker matches.
+
+    Raises
+    ------
+    ValueError
+        If the state is not a list of faces made of single letter stickers.
+    """
+    try:
+        stickers = "/".join("|".join("".join(row) for row in face) for face in cube_state)
+    except TypeError:
+        raise ValueError("Cube state must be a list of faces of single letter stickers")
+    return hashlib.sha1(stickers.encode("utf-8")).hexdigest()
+
+def solutionKey(cube_type, engine, optimize, cube_state):
+    """
+    Builds the cache key of a solve request.
+
+    A 2x2 state is keyed by its single int from coords2x2.stateKey() rather than by a digest.
+    """
+    if(cube_type == "2x2"):
+        try:
+            return (cube_type, engine, bool(optimize), stateKey(cube_state))
+        except (ValueError, TypeError, IndexError):
+            pass
+    return (cube_type, engine, bool(optimize), stateHash(cube_state))
+
+class SolutionCache:
+    """
+    A thread-safe in-process LRU cache of finished /api/solve payloads.
+
+    Entries expire after `ttl` seconds and the least recently used entry is evicted once
+    more than `maxsize` entries are stored.
+
+    Parameters
+    ----------
+    maxsize : int, default=1024
+        Maximum number of payloads kept.
+    ttl : float, default=600
+        Seconds an entry stays valid. 0 or less disables expiry.
+
+    Example
+    -------
+    >>> cache = SolutionCache(maxsize=2)
+    >>> key = solutionKey("3x3", "cfop", True, state)
+    >>> cache.get(key) is None
+    True
+    >>> cache.put(key, payload)
+    """
+
+    def __init__(self, maxsize = 1024, ttl = 600):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.__lock = threading.Lock()
+        self.__entries = OrderedDict()
+
+    def get(self, key, count = True):
+        """
+        Gives the stored payload for the key, or None if it is missing or expired.
+        With `count` False the lookup is left out of the hits and misses, e.g. a second look for a key
+        that just missed.
+        """
+        now = time.monotonic()
+        with self.__lock:
+            entry = self.__entries.get(key)
+            if(entry is not None and self.ttl > 0 and now - entry[0] > self.ttl):
+                del self.__entries[key]
+                self.evictions += 1
+                cacheEvictions.inc(reason="ttl")
+                entry = None
+            if(entry is None):
+                if(count):
+                    self.misses += 1
+                    cacheMisses.inc()
+                return None
+            self.__entries.move_to_end(key)
+            if(count):
+                self.hits += 1
+        if(count):
+            cacheHits.inc()
+        return entry[1]
+
+    def put(self, key, payload):
+        """
+        Stores a payload. The payload must not be modified afterwards as it is shared between requests.
+        """
+        if(self.maxsize <= 0):
+            return
+        with self.__lock:
+            self.__entries[key] = (time.monotonic(), payload)
+            self.__entries.move_to_end(key)
+            while(len(self.__entries) > self.maxsize):
+                self.__entries.popitem(last=False)
+                self.evictions += 1
+                cacheEvictions.inc(reason="size")
+
+    def clear(self):
+        with self.__lock:
+            self.__entries.clear()
+
+    def __len__(self):
+        with self.__lock:
+            return len(self.__entries)
+
+    def hitRate(self):
+        """
+        Gives the fraction of lookups that were hits, 0 if there were no lookups.
+        """
+        with self.__lock:
+            total = self.hits + self.misses
+            return self.hits / total if total else 0.0
+
+    def getStats(self):
+        """
+        Gives the hit-rate counters of the cache as a dictionary.
+        """
+        with self.__lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self.__entries),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / total if total else 0.0
+            }
+
+def registerGauges(cache):
+    """
+    Exports the size and hit rate of a cache at /metrics.
+    """
+    gauge("pycube_solution_cache_entries", "Entries held by the in-process solution cache.", lambda: len(cache))
+    gauge("pycube_solution_cache_hit_ratio", "Hit rate of the in-process solution cache.", cache.hitRate)
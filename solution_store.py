@@ -0,0 +1,153 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from metrics import counter
+from structured_log import logEvent
+
+storeHits = counter("pycube_solution_store_hits_total", "Solves answered from the persistent solution store.")
+storeMisses = counter("pycube_solution_store_misses_total", "Solves that missed the persistent solution store.")
+storeErrors = counter("pycube_solution_store_errors_total", "Persistent solution store operations that failed.")
+
+class SolutionStore:
+    """
+    A persistent store of finished /api/solve payloads shared by every worker process on a host.
+
+    The payloads are kept in a SQLite database in WAL mode, so readers in one worker never block
+    on a writer in another. The store is bounded: once every `compact_every` writes, the least
+    recently used entries beyond `max_entries` are deleted.
+
+    Parameters
+    ----------
+    path : string
+        Location of the SQLite database file. It is created if it does not exist.
+    max_entries : int, default=100000
+        Maximum number of payloads kept after a compaction.
+    compact_every : int, default=256
+        Number of writes (in this process) between two compactions.
+
+    Example
+    -------
+    >>> store = SolutionStore("/tmp/pycube.sqlite3")
+    >>> store.put(("3x3", "cfop", True, "9f86d0..."), payload)
+    >>> store.get(("3x3", "cfop", True, "9f86d0..."))["solution"]
+    "For Cross: ..."
+    """
+
+    def __init__(self, path, max_entries = 100000, compact_every = 256):
+        self.path = path
+        self.max_entries = max_entries
+        self.compact_every = compact_every
+        self.__local = threading.local()
+        self.__lock = threading.Lock()
+        self.__writes = 0
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        connection = self.__connect()
+        with connection:
+            connection.execute("CREATE TABLE IF NOT EXISTS solutions (key TEXT PRIMARY KEY, payload TEXT NOT NULL, last_used REAL NOT NULL)")
+            connection.execute("CREATE INDEX IF NOT EXISTS solutions_last_used ON solutions (last_used)")
+
+    def __connect(self):
+        # sqlite connections must not be shared between threads nor survive a fork,
+        # so every thread of every process opens its own
+        connection = getattr(self.__local, "connection", None)
+        if(connection is None or self.__local.pid != os.getpid()):
+            connection = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self.__local.connection = connection
+            self.__local.pid = os.getpid()
+        return connection
+
+    @staticmethod
+    def encodeKey(key):
+        """
+        Converts a solution cache key tuple into the text key stored in the database.
+        """
+        return ":".join(str(int(part)) if isinstance(part, bool) else str(part) for part in key)
+
+    def get(self, key, count = True):
+        """
+        Gives the stored payload for the key, or None if it is missing or the store failed.
+        With `count` False the lookup is left out of the hits and misses.
+        """
+        try:
+            connection = self.__connect()
+            skey = self.encodeKey(key)
+            row = connection.execute("SELECT payload FROM solutions WHERE key = ?", (skey,)).fetchone()
+            if(row is None):
+                if(count):
+                    storeMisses.inc()
+                return None
+            connection.execute("UPDATE solutions SET last_used = ? WHERE key = ?", (time.time(), skey))
+            if(count):
+                storeHits.inc()
+            return json.loads(row[0])
+        except (sqlite3.Error, ValueError) as e:
+            logEvent("solution_store_failed", logging.ERROR, operation="read", error=str(e))
+            storeErrors.inc()
+            return None
+
+    def put(self, key, payload):
+        """
+        Stores a payload, compacting the store every `compact_every` writes.
+        """
+        try:
+            connection = self.__connect()
+            connection.execute("INSERT OR REPLACE INTO solutions (key, payload, last_used) VALUES (?, ?, ?)",
+                               (self.encodeKey(key), json.dumps(payload, separators=(",", ":")), time.time()))
+        except (sqlite3.Error, TypeError, ValueError) as e:
+            logEvent("solution_store_failed", logging.ERROR, operation="write", error=str(e))
+            storeErrors.inc()
+            return
+        with self.__lock:
+            self.__writes += 1
+            due = self.__writes % self.compact_every == 0
+        if(due):
+            self.compact()
+
+    def compact(self):
+        """
+        Deletes the least recently used entries beyond `max_entries`.
+
+        Returns
+        -------
+        removed : int
+            Number of deleted entries.
+        """
+        try:
+            connection = self.__connect()
+            cursor = connection.execute("DELETE FROM solutions WHERE key IN (SELECT key FROM solutions ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                                        (self.max_entries,))
+            return cursor.rowcount
+        except sqlite3.Error as e:
+            logEvent("solution_store_failed", logging.ERROR, operation="compact", error=str(e))
+            storeErrors.inc()
+            return 0
+
+    def __len__(self):
+        return self.__connect().execute("SELECT COUNT(*) FROM solutions").fetchone()[0]
+
+def openStore():
+    """
+    Opens the store configured through the environment.
+
+    The store is optional: it is only used if PYCUBE_STORE_PATH is set. PYCUBE_STORE_MAX_ENTRIES
+    bounds its size.
+
+    Returns
+    -------
+    store : SolutionStore object or None
+        None if the store is not configured or cannot be opened.
+    """
+    path = os.environ.get("PYCUBE_STORE_PATH")
+    if(not path):
+        return None
+    try:
+        return SolutionStore(path, max_entries=int(os.environ.get("PYCUBE_STORE_MAX_ENTRIES", 100000)))
+    except (sqlite3.Error, OSError) as e:
+        logEvent("solution_store_disabled", logging.ERROR, path=path, error=str(e))
+        return None
@@ -0,0 +1,317 @@
+from solver_pool import POLL_SECONDS, DeadlineExceeded, RequestAbandoned, poolCancelled
+from solver_stats import SolverStats
+import importlib
+import queue
+import threading
+import time
+
+# the solvers, their tables and the cube classes are imported on first use by cube type, so that a
+# process that only gets 3x3 cubes never loads the 4x4 code, and starts (e.g. from zero) faster
+
+# engines that can be requested for each cube type, the first one is the default
+# neutral runs CFOP from every cross color, neutral24 from all 24 orientations and
+# anytime keeps looking for shorter solutions until its time budget runs out
+# optimal needs the 2x2 distance table (see optimal2x2.py), ortega is the default when it is not built,
+# and staged needs the 4x4 stage tables (see staged4x4.py), reduction is the default when they are not built
+ENGINES = {
+    "2x2": ["optimal", "ortega"],
+    "3x3": ["cfop", "neutral", "neutral24", "anytime"],
+    "4x4": ["staged", "reduction"]
+}
+
+def getEngine(cube_type, engine = None, budget_ms = None):
+    """
+    Resolves the engine to use for a cube type.
+
+    Parameters
+    ----------
+    cube_type : string
+        '2x2', '3x3' or '4x4'. Anything else is treated as '3x3'.
+    engine : string, default=None
+        Requested engine. None selects the default engine of the cube type, or the anytime
+        engine if a time budget is given and the cube type has one.
+    budget_ms : float, default=None
+        Requested time budget.
+
+    Returns
+    -------
+    engine : string
+        The engine name.
+
+    Raises
+    ------
+    ValueError
+        If the engine is not available for the cube type.
+    """
+    engines = ENGINES.get(cube_type, ENGINES["3x3"])
+    if(engine is None or engine == ""):
+        if(budget_ms is not None and "anytime" in engines):
+            return "anytime"
+        if(engines[0] == "optimal"):
+            from optimal2x2 import loadDistanceTable
+            if(loadDistanceTable() is None):
+                return engines[1]
+        if(engines[0] == "staged"):
+            from staged4x4 import loadStageTables
+            if(loadStageTables() is None):
+                return engines[1]
+        return engines[0]
+    if(engine not in engines):
+        raise ValueError("Unknown engine '" + str(engine) + "' for " + str(cube_type) + ", expected one of " + ", ".join(engines))
+    return engine
+
+# time budget of the engines that keep searching for shorter solutions
+DEFAULT_BUDGET_MS = 1000
+
+def solveState(cube_type, cube_state, engine = None, optimize = True, budget_ms = None, listener = None):
+    """
+    Solves a cube state and builds the /api/solve response payload.
+
+    Parameters
+    ----------
+    cube_type : string
+        '2x2', '3x3' or '4x4'.
+    cube_state : list of size (6, N, N)
+        The cube faces matrix array.
+    engine : string, default=None
+        The engine to solve with, see ENGINES.
+    optimize : bool, default=True
+        Passed on to the solver.
+    budget_ms : float, default=None
+        Time budget of the color neutral and anytime engines, DEFAULT_BUDGET_MS if not given.
+    listener : function, default=None
+        Called with the name and moves of every step as soon as the solver is done with it (see
+        streamSolve()). Only the CFOP and 4x4 solvers report their steps as they go.
+
+    Returns
+    -------
+    payload : dict
+        The response payload. The per-phase stats of the solve are stored under 'stats',
+        they are not published to /metrics as the solve may run in a pool worker (see publishStats()).
+        'complete' is False if the time budget ran out before every candidate was tried.
+    """
+    engine = getEngine(cube_type, engine)
+    extra = {}
+    if cube_type == '2x2':
+        from cube2x2 import Cube2x2
+        from optimal2x2 import OptimalSolver2x2
+        from solver2x2 import Solver2x2
+        cube = Cube2x2(faces=cube_state)
+        solver = OptimalSolver2x2(cube) if engine == "optimal" else Solver2x2(cube)
+        # the 2x2 solvers have no separate phases, so the whole solve is timed as one
+        stats = SolverStats()
+        stats.beginPhase('solve')
+        solver.solveCube(optimize=optimize)
+        stats.finish()
+        solution_plain = solver.getMoves(decorated=False)
+        solution_decorated = solver.getMoves(decorated=True)
+
+        # the 2x2 solvers don't have detailed steps like CFOP
+        method = "Optimal" if engine == "optimal" else "Ortega Method"
+        steps = [{"name": "2x2 Solution (" + method + ")", "moves": solution_plain}]
+        if engine == "ortega":
+            # peak memory and time of the first layer search
+            extra = {'first_layer_search': solver.searchStats}
+        if "Could not solve" in solution_plain:
+            # not an answer, so that it is neither cached nor kept
+            extra.update({'success': False, 'error': getattr(solver, 'error', None) or solution_plain})
+
+        solved_cube = newCube(cube_type, cube_state)
+        if solution_plain and "Already solved" not in solution_plain and "Could not solve" not in solution_plain:
+            solved_cube.doMoves(solution_plain)
+
+    elif cube_type == '4x4':
+        from cube4x4 import Cube4x4
+        from solver4x4 import Solver4x4
+        from staged4x4 import StagedSolver4x4
+        cube = Cube4x4(faces=cube_state)
+        solver = StagedSolver4x4(cube, listener=listener) if engine == "staged" else Solver4x4(cube, listener=listener)
+        solver.solveCube(optimize=optimize)
+        # timed by stage: centers, edges, parity and 3x3
+        stats = solver.getStats()
+        solution_decorated = solver.getMoves(decorated=True)
+        solution_plain = solver.getMoves(decorated=False)
+        method = "Staged Search" if engine == "staged" else "Reduction Method"
+        steps = parse_solution_steps(solution_decorated) or [{"name": "4x4 " + method, "moves": solution_plain}]
+        if "Could not solve" in solution_plain:
+            # a stage failed or ran out of its budget: not an answer, so that it is neither cached nor kept
+            extra = {'success': False, 'error': solver.error or solution_plain}
+
+        solved_cube = newCube(cube_type, cube_state)
+        if solution_plain and "Already solved" not in solution_plain and "Could not solve" not in solution_plain:
+            solved_cube.doMoves(solution_plain)
+
+    elif engine in ("neutral", "neutral24"):
+        from color_neutral import solveNeutral
+        best = solveNeutral(cube_state, orientations=24 if engine == "neutral24" else 6,
+                            budget_ms=DEFAULT_BUDGET_MS if budget_ms is None else budget_ms, optimize=optimize)
+        stats = SolverStats.fromDict(best["stats"])
+        solution_decorated = best["decorated"]
+        solution_plain = best["plain"]
+        steps = parse_solution_steps(solution_decorated)
+        solved_cube = newCube(cube_type, cube_state)
+        solved_cube.doMoves("".join(solution_plain.split()))
+        extra = {'cross_color': best["cross"], 'orientations_tried': best["tried"], 'complete': best["complete"]}
+
+    elif engine == "anytime":
+        import anytime
+        best = anytime.solve(cube_state, DEFAULT_BUDGET_MS if budget_ms is None else budget_ms, optimize=optimize)
+        stats = SolverStats.fromDict(best["stats"])
+        solution_decorated = best["decorated"]
+        solution_plain = best["plain"]
+        steps = parse_solution_steps(solution_decorated)
+        solved_cube = newCube(cube_type, cube_state)
+        solved_cube.doMoves("".join(solution_plain.split()))
+        extra = {'cross_color': best["cross"], 'candidates_tried': best["tried"], 'complete': best["complete"],
+                 'elapsed_ms': best["elapsed_ms"]}
+
+    else:
+        # Create 3x3 cube with the given state (default)
+        from cube import Cube
+        from solver import Solver
+        cube = Cube(faces=cube_state)
+        solver = Solver(cube, listener=listener)
+        solver.solveCube(optimize=optimize)
+        stats = solver.getStats()
+        solution_decorated = solver.getMoves(decorated=True)
+        solution_plain = solver.getMoves(decorated=False)
+        steps = parse_solution_steps(solution_decorated)
+        solved_cube = newCube(cube_type, cube_state)
+        if solution_plain and "Already solved" not in solution_plain:
+            # the plain solution has one formula per line, which doMoves() does not accept as is
+            solved_cube.doMoves("".join(solution_plain.split()))
+
+    payload = {
+        'success': True,
+        'solution': solution_decorated,
+        'solution_plain': solution_plain,
+        'steps': steps,
+        'solved_state': solved_cube.getFaces(),
+        'solved_display': str(solved_cube),
+        'cube_type': cube_type,
+        'engine': engine,
+        'complete': True,
+        'stats': stats.toDict()
+    }
+    payload.update(extra)
+    return payload
+
+def solveItem(cube_type, cube_state, engine = None, optimize = True, budget_ms = None):
+    """
+    Same as solveState(), but failures are returned as an error payload rather than raised.
+    Meant to be submitted to a process pool, where one bad item must not fail the others.
+    """
+    try:
+        return solveState(cube_type, cube_state, engine, optimize, budget_ms)
+    except Exception as e:
+        return {'success': False, 'error': str(e), 'cube_type': cube_type}
+
+# the module and the class of the cube of every cube type
+CUBES = {'2x2': ('cube2x2', 'Cube2x2'), '3x3': ('cube', 'Cube'), '4x4': ('cube4x4', 'Cube4x4')}
+
+def cubeClass(cube_type):
+    """
+    Gives the cube class of a cube type ('3x3' for anything unknown), importing its module on first use.
+    """
+    module, name = CUBES.get(cube_type, CUBES['3x3'])
+    return getattr(importlib.import_module(module), name)
+
+def newCube(cube_type, cube_state = None):
+    """
+    Gives a cube object of a cube type ('3x3' for anything unknown) on a copy of a faces matrix array,
+    as the 2x2 and 3x3 cubes move the faces they are given in place. None gives a solved cube.
+    """
+    if(cube_state is None):
+        return cubeClass(cube_type)()
+    return cubeClass(cube_type)(faces=[[list(row) for row in face] for face in cube_state])
+
+def streamSolve(cube_type, cube_state, engine = None, optimize = True, budget_ms = None, deadline = None, abandoned = None,
+                flight = None):
+    """
+    Solves a cube state like solveState(), giving every step as soon as it is computed.
+
+    The solve runs in a thread of its own, so the first steps can be sent while the later ones are
+    still being searched. Engines that do not report their steps (the 2x2 ones, neutral and anytime)
+    only give the final payload.
+
+    Parameters
+    ----------
+    deadline : float, default=None
+        time.monotonic() by when the solve is needed, DeadlineExceeded is given after it.
+    abandoned : function, default=None
+        Checked every POLL_SECONDS while waiting, RequestAbandoned is given once it is True.
+        In both cases the solve is not stopped, it is bounded by the time budget of its engine.
+    flight : function, default=None
+        Called with the solve (a function giving its payload) to run it, and gives (payload, shared),
+        e.g. through SingleFlight.do(), so that a state already being solved is not solved twice.
+
+    Yields
+    ------
+    event : tuple
+        ('step', {'name', 'moves', 'cube_state'}) for every step, cube_state being the cube after it,
+        then ('done', payload) with the payload of solveState(), ('shared', payload) with the payload
+        of the solve in flight `flight` waited for (no steps come before it), or ('error', exception).
+    """
+    events = queue.Queue()
+
+    def solve():
+        try:
+            run = lambda: solveState(cube_type, cube_state, engine, optimize, budget_ms,
+                                     listener=lambda name, moves: events.put(('step', (name, moves))))
+            payload, shared = (run(), False) if flight is None else flight(run)
+            events.put(('shared' if shared else 'done', payload))
+        except Exception as e:
+            events.put(('error', e))
+
+    cube = newCube(cube_type, cube_state)
+    threading.Thread(target=solve, name='stream-solve', daemon=True).start()
+    while True:
+        if deadline is not None and time.monotonic() >= deadline:
+            poolCancelled.inc(reason="deadline")
+            yield 'error', DeadlineExceeded("Deadline exceeded")
+            return
+        try:
+            kind, data = events.get(timeout=POLL_SECONDS if deadline is None else max(0, min(POLL_SECONDS, deadline - time.monotonic())))
+        except queue.Empty:
+            if abandoned is not None and abandoned():
+                poolCancelled.inc(reason="abandoned")
+                yield 'error', RequestAbandoned("The client went away")
+                return
+            continue
+        if kind != 'step':
+            yield kind, data
+            return
+        name, moves = data
+        cube.doMoves(moves)
+        yield 'step', {'name': name, 'moves': moves, 'cube_state': cube.getFaces()}
+
+def publishStats(payload):
+    """
+    Aggregates the stats of a solve payload into the process-wide histograms exported at /metrics.
+    """
+    if payload.get('success') and 'stats' in payload:
+        SolverStats.fromDict(payload['stats']).publish(payload['cube_type'])
+
+def parse_solution_steps(decorated_moves):
+    """Parse the decorated solution string into individual steps"""
+    if "Ortega" in decorated_moves:
+        moves = decorated_moves.replace("Ortega Solution: ", "").strip()
+        return [{"name": "Full Solve", "moves": moves}]
+
+    steps = []
+    lines = decorated_moves.strip().split('\n')
+
+    for line in lines:
+        if line.startswith('For '):
+            # Extract step name and moves
+            parts = line.split(': ')
+            if len(parts) == 2:
+                step_name = parts[0].replace('For ', '')
+                moves = parts[1].strip()
+                if moves:  # Only add non-empty move sequences
+                    steps.append({
+                        'name': step_name,
+                        'moves': moves
+                    })
+
+    return steps
@@ -1,6 +1,10 @@
 from cube import Cube
 from helper import rawCondense
-from solver_data import RunePatternMatcher, movedata, move_pole_perspective, positionTransformData, whiteEdgePairs, whiteEdgeDirectMoves, LyreLookUpSystem, ScythePatternMatcher, RunePatternMatcher
+from solver_stats import SolverStats
+from solver_tables import indexF2L, loadTables
+
+# the solver tables, from the compiled artifact when there is one (see table_builder.py)
+TABLES = loadTables()
 
 class Solver():
     """
@@ -11,6 +15,11 @@ class Solver():
     cube : Cube object
         The cube to be solved. This object will not be modified due to the solve, 
         but rather a copy is stored in the solver.
+    tables : dict, default=None
+        The tables to solve with (see solver_tables.loadTables()). None uses the tables loaded at import.
+    listener : function, default=None
+        Called with the name of a step ("Alignment", "Cross", "F2L", "OLL" or "PLL") and its moves as
+        soon as the step is done, once per inserted pair for F2L. Lets a caller stream the solve.
 
     Attributes
     ----------
@@ -29,10 +38,15 @@ class Solver():
     For F2L: URU'R'
     """
     
-    def __init__(self, cube):
+    def __init__(self, cube, tables = None, listener = None):
         self.cube = Cube(faces = cube.getFaces())
+        self.__listener = listener
+        self.__tables = TABLES if tables is None else tables
+        f2l = self.__tables["f2l"]
+        self.__f2lIndex = f2l["index"] if "index" in f2l else indexF2L(f2l["f2ldb"])
         self.__faces = self.cube.cube
         self.__forms = []
+        self.__stats = SolverStats()
 
     def solveCube(self, debug = False, optimize = False):
         """
@@ -55,17 +69,27 @@ class Solver():
             print(self.cube)
         try:
             self.__forms.append("--align--")
+            self.__stats.beginPhase("align")
             self.__alignFaces()
+            self.__report("Alignment", "--align--")
             self.__forms.append("--base--")
+            self.__stats.beginPhase("cross")
             self.__baseCross()
+            self.__report("Cross", "--base--")
             self.__forms.append("--first--")
+            self.__stats.beginPhase("f2l")
             self.__firstLayer()
             self.__forms.append("--oll--")
+            self.__stats.beginPhase("oll")
             self.__oll()
+            self.__report("OLL", "--oll--")
             self.__forms.append("--pll--")
+            self.__stats.beginPhase("pll")
             self.__pll()
+            self.__report("PLL", "--pll--")
         except Exception as exception:
             print(exception.__class__.__name__ + " raised in the program (looks like something is broken...)")
+        self.__stats.finish()
         self.__checkComplete()
         if(debug):
             print("After:")
@@ -136,6 +160,18 @@ class Solver():
             moves = moves.strip()
             return moves
     
+    def getStats(self):
+        """
+        Gives the per-phase instrumentation of the solve.
+
+        Returns
+        -------
+        stats : SolverStats object
+            Wall time, moves emitted, lookups performed and recursion count of each phase
+            (align, cross, f2l, oll and pll).
+        """
+        return self.__stats
+
     def isSolved(self):
         """
         Checks if the cube is solved or not.
@@ -186,8 +222,8 @@ class Solver():
                     moves[i] = ""
                 elif(onX != 0):
                     tmp = 0 if(onX == 1) else 4
-                    if moves[i] in move_pole_perspective:
-                        moves[i] = move_pole_perspective[moves[i]][tmp + side]
+                    if moves[i] in self.__tables["move_pole_perspective"]:
+                        moves[i] = self.__tables["move_pole_perspective"][moves[i]][tmp + side]
                     continue
             if(self.optimize and item[0] == "y"):
                 if(item == "y"):
@@ -195,8 +231,8 @@ class Solver():
                 else:
                     side = (side - 1) % 4
                 moves[i] = ""
-            if moves[i] in movedata:
-                moves[i] = movedata[moves[i]][side]
+            if moves[i] in self.__tables["movedata"]:
+                moves[i] = self.__tables["movedata"][moves[i]][side]
         return ''.join(moves)
 
     def __positionMapper(self, target, side, row=None, col=None):
@@ -205,14 +241,26 @@ class Solver():
             row = side[1]
             col = side[2]
             side = side[0]
-        aside, arow, acol = positionTransformData[target][side][row][col]
+        self.__stats.addLookups()
+        aside, arow, acol = self.__tables["positionTransformData"][target][side][row][col]
         return self.__faces[aside][arow][acol]
 
+    def __report(self, name, since):
+        # hands the moves applied since the last `since` marker (or form index) to the listener
+        if(self.__listener is None):
+            return
+        if(isinstance(since, str)):
+            since = len(self.__forms) - self.__forms[::-1].index(since)
+        moves = rawCondense("".join(self.__forms[since:]))
+        if(bool(moves)):
+            self.__listener(name, moves)
+
     def __move(self, form):
         # applying moves to the cube and then storing it in a list
         if(bool(form)):
             self.cube.doMoves(form)
             self.__forms.append(form)
+            self.__stats.addMoves(sum(ch.isalpha() for ch in form))
 
     def __alignFaces(self):
         # aligns the cube such that green is facing the screen (outwards) and yellow is facing upwards
@@ -262,17 +310,17 @@ class Solver():
         possible_moves = []
         # find all the edges and calculate the moves
         for persp in range(4):
-            for pos in whiteEdgePairs.keys():
+            for pos in self.__tables["whiteEdgePairs"].keys():
                 if(self.__positionMapper(persp, pos) == "W"):
                     # find the other color on this edge
-                    target_other = whiteEdgePairs[pos]
+                    target_other = self.__tables["whiteEdgePairs"][pos]
                     target_other_color = self.__positionMapper(persp, target_other)
                     # color to global slot
                     g_slot = slotToColorMap[target_other_color]
                     # global slot to perspective slot
                     p_slot = slot_to_persp[persp][g_slot]
                     # edge move for pos in perspective to perspective slot (as good as the global)
-                    edgeMove = whiteEdgeDirectMoves[pos][p_slot]
+                    edgeMove = self.__tables["whiteEdgeDirectMoves"][pos][p_slot]
                     # apply perspective edge move globally
                     possible_moves.append(self.__moveMapper(persp, edgeMove))
         if(len(possible_moves) > 0):
@@ -294,17 +342,15 @@ class Solver():
             else:
                 self.__move(self.__moveMapper(t_slot, "L2"))
         # repeatedly call this function till all the edges are oriented correctly
+        self.__stats.addRecursion()
         self.__baseCross()
 
     def __getf2lMove(self, section, attrib_corner, attrib_edge, attrib_dist_sign=None, attrib_dist=None):
-        # searches the dictionary and retrieves the move if found
-        for f2lmove in LyreLookUpSystem["f2ldb"]:
-            if(f2lmove[0] == section):
-                if(section == "1a" and f2lmove[1] == attrib_corner and f2lmove[2] == attrib_edge and f2lmove[3] == attrib_dist_sign and f2lmove[4] == attrib_dist):
-                    return f2lmove[5]
-                if((section == "1b1" or section == "1b2") and f2lmove[1] == attrib_corner and f2lmove[2] == attrib_edge):
-                    return f2lmove[3]
-        return ""
+        # searches the index of the F2L cases and retrieves the move if found
+        self.__stats.addLookups()
+        if(section == "1a"):
+            return self.__f2lIndex.get((section, attrib_corner, attrib_edge, attrib_dist_sign, attrib_dist), "")
+        return self.__f2lIndex.get((section, attrib_corner, attrib_edge), "")
 
     def __getCornerDetailBreakdown(self, c0, c1, c2):
         # standard corner details breakdown for finding attributes
@@ -346,10 +392,11 @@ class Solver():
         self.__faces[4][1][1] == self.__faces[4][2][0] and self.__faces[4][1][1] == self.__faces[4][2][2])
         if(con1 and con2 and con3 and con4):
             return
+        start = len(self.__forms)
         found = False
         # f2l 1a
         # trying to find a corner-edge pair
-        for corner in LyreLookUpSystem["corners"]:
+        for corner in self.__tables["f2l"]["corners"]:
             c0 = self.__positionMapper(0, corner[0])
             c1 = self.__positionMapper(0, corner[1])
             c2 = self.__positionMapper(0, corner[2])
@@ -361,7 +408,7 @@ class Solver():
                 diff_to_move = {0: "", 1: "U", 2: "U2", 3: "U'"}
                 orient_move = [["", ""], ["y", "y'"], ["y2", "y2"], ["y'", "y"]]
                 # top row edges
-                for edge in LyreLookUpSystem["edges"]:
+                for edge in self.__tables["f2l"]["edges"]:
                     te0 = self.__positionMapper(0, edge[0])
                     te1 = self.__positionMapper(0, edge[1])
                     if((te0 == e0 and te1 == e1) or (te0 == e1 and te1 == e0)):
@@ -420,7 +467,7 @@ class Solver():
         # f2l 1b1
         if(not found):
             # trying to find a corner-edge pair
-            for corner in LyreLookUpSystem["corners"]:
+            for corner in self.__tables["f2l"]["corners"]:
                 c0 = self.__positionMapper(0, corner[0])
                 c1 = self.__positionMapper(0, corner[1])
                 c2 = self.__positionMapper(0, corner[2])
@@ -432,7 +479,7 @@ class Solver():
                     diff_to_move = {0: "", 1: "U", 2: "U2", 3: "U'"}
                     orient_move = [["", ""], ["y", "y'"], ["y2", "y2"], ["y'", "y"]]
                     # middle row edges
-                    for edge in LyreLookUpSystem["edges-mid"]:
+                    for edge in self.__tables["f2l"]["edges-mid"]:
                         te0 = self.__positionMapper(0, edge[0])
                         te1 = self.__positionMapper(0, edge[1])
                         if(((te0 == e0 and te1 == e1) or (te0 == e1 and te1 == e0)) and ((te0 == self.__faces[edge[0][0]][1][1] and te1 == self.__faces[edge[1][0]][1][1]) or (te0 == self.__faces[edge[1][0]][1][1] and te1 == self.__faces[edge[0][0]][1][1]))):
@@ -452,7 +499,7 @@ class Solver():
         # f2l 1b2
         if(not found):
             # trying to find a corner-edge pair
-            for corner in LyreLookUpSystem["corners-down"]:
+            for corner in self.__tables["f2l"]["corners-down"]:
                 c0 = self.__positionMapper(0, corner[0])
                 c1 = self.__positionMapper(0, corner[1])
                 c2 = self.__positionMapper(0, corner[2])
@@ -463,7 +510,7 @@ class Solver():
                     # orienting the corner and front face properly
                     orient_move = [["", ""], ["y", "y'"], ["y2", "y2"], ["y'", "y"]]
                     # # top row edges
-                    for edge in LyreLookUpSystem["edges"]:
+                    for edge in self.__tables["f2l"]["edges"]:
                         te0 = self.__positionMapper(0, edge[0])
                         te1 = self.__positionMapper(0, edge[1])
                         if((te0 == e0 and te1 == e1) or (te0 == e1 and te1 == e0)):
@@ -523,6 +570,8 @@ class Solver():
                 fmoves.append([1, self.__moveMapper(i, "RU'R'")])
             fmoves = sorted(fmoves, key=lambda x: -x[0])
             self.__move(fmoves[0][1])
+        self.__report("F2L", start)
+        self.__stats.addRecursion()
         self.__firstLayer()
 
     def __ollhash(self, values):
@@ -534,8 +583,9 @@ class Solver():
             else:
                 shash += "x"
         shash = shash[0: 3] + "-" + shash[3: 8] + "-" + shash[8: 13] + "-" + shash[13: 18] + "-" + shash[18: 21]
-        if(shash in ScythePatternMatcher):
-            return ScythePatternMatcher[shash]
+        self.__stats.addLookups()
+        if(shash in self.__tables["oll"]):
+            return self.__tables["oll"][shash]
         else:
             return None
 
@@ -543,7 +593,7 @@ class Solver():
         # performs orientation of last layer
         for i in range(4):
             ocols = []
-            for pos in ScythePatternMatcher["target"]:
+            for pos in self.__tables["oll"]["target"]:
                 ocols.append(self.__positionMapper(i, pos))
             form = self.__ollhash(ocols)
             if(bool(form)):
@@ -557,19 +607,20 @@ class Solver():
     
     def __pllhash(self, values):
         # hashes and searches the dictionary and retrieves the move if found
-        for shuffle in RunePatternMatcher['shufflemap']:
+        for shuffle in self.__tables["pll"]["shufflemap"]:
             ohash = ""
             for val in values:
                 ohash += shuffle[val]
-            if(ohash in RunePatternMatcher):
-                return RunePatternMatcher[ohash]
+            self.__stats.addLookups()
+            if(ohash in self.__tables["pll"]):
+                return self.__tables["pll"][ohash]
         return None
     
     def __pll(self):
         # performs permutation of last layer
         for i in range(4):
             ocols = []
-            for pos in RunePatternMatcher["target"]:
+            for pos in self.__tables["pll"]["target"]:
                 ocols.append(self.__positionMapper(i, pos))
             form = self.__pllhash(ocols)
             if(bool(form)):
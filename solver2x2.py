@@ -1,5 +1,48 @@
 from cube2x2 import Cube2x2
-import random
+import itertools
+import os
+import sys
+import time
+from functools import lru_cache
+from coords2x2 import MOVES, ORIENTATIONS, SLOTS, SOLVED_INDEX, STANDARD_SCHEME, applyFormula, applyMove, rankOrientation, rankPermutation, schemeOf, stateFaces, stateIndex
+from helper import condenseFormula, splitFormula
+
+# the first layer (the one of the down-back-left corner, which R/U/F never move) takes at most 7 moves
+FIRST_LAYER_DEPTH = 7
+# states the bidirectional search may hold before it falls back to a depth first search
+MAX_SEARCH_STATES = int(os.environ.get("PYCUBE_2X2_SEARCH_MAX_STATES", 200000))
+INVERSE_MOVES = [MOVES.index(move[0] if move.endswith("'") else move if move.endswith("2") else move + "'") for move in MOVES]
+# turns of the last layer tried before an algorithm
+ALIGNMENTS = ["", "U", "U2", "U'"]
+
+@lru_cache(maxsize=None)
+def firstLayerStates():
+    """
+    Gives the state indices (see coords2x2.stateIndex()) of the 648 states whose first layer is solved:
+    the down corners are home and oriented, the 4 up corners can be anywhere.
+    """
+    down = [slot for slot, corner in enumerate(SLOTS) if any(side == 4 for side, _, _ in corner)]
+    up = [slot for slot in range(len(SLOTS)) if slot not in down]
+    states = set()
+    for pieces in itertools.permutations(up):
+        permutation = list(range(len(SLOTS)))
+        for slot, piece in zip(up, pieces):
+            permutation[slot] = piece
+        for twists in itertools.product(range(3), repeat=len(up)):
+            if(sum(twists) % 3 != 0):
+                continue
+            orientation = [0] * len(SLOTS)
+            for slot, twist in zip(up, twists):
+                orientation[slot] = twist
+            states.add(rankPermutation(permutation) * ORIENTATIONS + rankOrientation(orientation))
+    return frozenset(states)
+
+def _pathLength(parents, index):
+    length = 0
+    while(parents[index] is not None):
+        index = parents[index][0]
+        length += 1
+    return length
 
 class Solver2x2:
     """
@@ -11,30 +54,42 @@ class Solver2x2:
     
     def __init__(self, cube):
         self.cube = Cube2x2(faces=cube.getFaces())
+        # the solve is done in the color scheme of the down-back-left corner, recolored to the standard one,
+        # so that the white layer R/U/F can build is always the one of that corner
+        try:
+            scheme = schemeOf(self.cube.cube)
+            self.cube.cube = [[[STANDARD_SCHEME[scheme.index(sticker)] for sticker in row] for row in face] for face in self.cube.cube]
+        except ValueError:
+            pass
         self.moves = []
+        self.searchStats = {}
+        self.error = None
         
-        # OLL Algorithms (Top face is Yellow, Face 5)
-        # The key is the pattern of yellow stickers on the top face, read from top-left.
-        self.oll_algorithms = {
-            (1, 1, 1, 1): "",  # Solved
-            (0, 0, 0, 0): "R U R' U R U2 R'",
-            (1, 0, 1, 0): "F R U R' U' F'",
-            (0, 1, 0, 1): "F R U R' U' F'",
-            (1, 1, 0, 0): "R2 U2 R U2 R2",
-            (1, 0, 0, 1): "R U2 R' U' R U' R'",
-            (0, 1, 1, 0): "R U2 R' U' R U' R'",
-            (1, 0, 0, 0): "R U R' U R U2 R'",
-        }
+        # OLL algorithms, one per case up to a turn of the last layer (Sune, Antisune, H, Pi, U, T, L).
+        # They only turn R, U and F, so that the first layer stays built and they can be tried on the state index.
+        self.oll_algorithms = [
+            "R U R' U R U2 R'",
+            "R U2 R' U' R U' R'",
+            "R2 U2 R U2 R2",
+            "F R U R' U' R U R' U' F'",
+            "F R U R' U' F'",
+            "R U R' U' R' F R F'",
+            "F R' F' R U R U' R'",
+        ]
 
-        # PLL Algorithms
+        # PLL algorithms: swap two adjacent corners (the headlights are at the back) or two diagonal ones
         self.pll_algorithms = {
-            "Adjacent": "R' U R' U2 R U' R' U2 R2",
+            "Adjacent": "R U R' F' R U R' U' R' F R2 U' R'",
             "Diagonal": "F R U' R' U' R U R' F' R U R' U' R' F R F'",
         }
 
     def solveCube(self, optimize=True):
-        """Solve the 2x2 cube using the Ortega method."""
+        """
+        Solve the 2x2 cube using the Ortega method. If it does not end solved (e.g. the state is
+        not a valid one), no moves are kept and `error` tells why.
+        """
         self.moves = []
+        self.error = None
         if self._is_solved():
             return
             
@@ -47,6 +102,9 @@ class Solver2x2:
             if self._is_solved():
                 break
             self._apply_move("U")
+        if not self._is_solved():
+            self.error = "The Ortega method did not solve the cube"
+            self.moves = []
 
     def _apply_move(self, move_str):
         """Helper to apply a move or algorithm and record it."""
@@ -76,71 +134,154 @@ class Solver2x2:
                 self._apply_move(move)
 
     def _search_for_first_layer(self):
-        """Performs a breadth-first search to find a solution for the first layer."""
-        from collections import deque
-        
-        q = deque([([], self.cube.getFaces())])
-        visited = {self.cube.getFacesAsTuple()}
+        """
+        Finds a shortest solution for the first layer with a bidirectional search.
 
-        while q:
-            moves, current_faces_list = q.popleft()
-            
-            temp_cube = Cube2x2(faces=current_faces_list)
-            if self._is_first_face_solved(cube_obj=temp_cube):
-                return moves
+        States are integer indices (see coords2x2.stateIndex()). The search expands, a level at a time,
+        whichever is smaller of the frontier of the current state and the frontier of the 648 first layer
+        states, until they meet. If it would hold more than MAX_SEARCH_STATES states, it falls back to a
+        depth first search, which needs no memory but more time.
 
-            if len(moves) >= 11: # Limit search depth for performance
-                continue
+        The states held at the peak, an estimate of their memory, the search used and its time are
+        stored in self.searchStats.
 
-            for move in ["R", "R'", "R2", "U", "U'", "U2", "F", "F'", "F2"]:
-                next_cube = Cube2x2(faces=current_faces_list)
-                next_cube.doMoves(move)
-                next_faces_tuple = next_cube.getFacesAsTuple()
+        Returns
+        -------
+        moves : list of strings or None
+            The moves, None if the cube has no valid state.
+        """
+        started = time.perf_counter()
+        self.searchStats = {"search": "bidirectional", "peak_states": 0, "peak_bytes": 0, "elapsed_ms": 0.0}
+        try:
+            start = stateIndex(self.cube.cube)
+        except ValueError:
+            return None
+        goals = firstLayerStates()
+        # index -> (previous index, move) towards the current state, and (next index, move) towards a goal
+        forward = {start: None}
+        backward = {goal: None for goal in goals}
+        forwardFrontier = [start]
+        backwardFrontier = list(goals)
+        meetings = [start] if start in goals else []
+        while(len(meetings) == 0 and len(forwardFrontier) > 0 and len(backwardFrontier) > 0):
+            if(len(forward) + len(backward) > MAX_SEARCH_STATES):
+                break
+            if(len(forwardFrontier) <= len(backwardFrontier)):
+                frontier = []
+                for index in forwardFrontier:
+                    for m in range(len(MOVES)):
+                        following = applyMove(index, m)
+                        if(following not in forward):
+                            forward[following] = (index, m)
+                            frontier.append(following)
+                            if(following in backward):
+                                meetings.append(following)
+                forwardFrontier = frontier
+            else:
+                frontier = []
+                for index in backwardFrontier:
+                    for m in range(len(MOVES)):
+                        # the move m leads from the previous state back to this one
+                        previous = applyMove(index, INVERSE_MOVES[m])
+                        if(previous not in backward):
+                            backward[previous] = (index, m)
+                            frontier.append(previous)
+                            if(previous in forward):
+                                meetings.append(previous)
+                backwardFrontier = frontier
+            self.__recordPeak(forward, backward, forwardFrontier, backwardFrontier)
+        if(len(meetings) == 0):
+            self.searchStats["search"] = "depth_first"
+            moves = self.__depthFirst(start, goals)
+        else:
+            # the meetings of the last level are not all as short, the shortest one is kept
+            meeting = min(meetings, key=lambda index: _pathLength(forward, index) + _pathLength(backward, index))
+            moves = []
+            index = meeting
+            while(forward[index] is not None):
+                index, m = forward[index]
+                moves.insert(0, MOVES[m])
+            index = meeting
+            while(backward[index] is not None):
+                index, m = backward[index]
+                moves.append(MOVES[m])
+        self.searchStats["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 3)
+        return moves
+
+    def __recordPeak(self, forward, backward, forwardFrontier, backwardFrontier):
+        states = len(forward) + len(backward)
+        if(states > self.searchStats["peak_states"]):
+            # the dicts, the lists and about one (index, move) tuple and one int per state
+            entry = sys.getsizeof((2 ** 20, 0)) + sys.getsizeof(2 ** 20)
+            self.searchStats["peak_states"] = states
+            self.searchStats["peak_bytes"] = (sys.getsizeof(forward) + sys.getsizeof(backward) + sys.getsizeof(forwardFrontier)
+                                              + sys.getsizeof(backwardFrontier) + states * entry)
 
-                if next_faces_tuple not in visited:
-                    visited.add(next_faces_tuple)
-                    new_moves = moves + [move]
-                    q.append((new_moves, next_cube.getFaces()))
+    def __depthFirst(self, start, goals):
+        # iterative deepening, a turn of the face that was just turned is never useful
+        path = []
+        def search(index, depth, lastFace):
+            if(index in goals):
+                return True
+            if(depth == 0):
+                return False
+            for m in range(len(MOVES)):
+                if(MOVES[m][0] == lastFace):
+                    continue
+                path.append(MOVES[m])
+                if(search(applyMove(index, m), depth - 1, MOVES[m][0])):
+                    return True
+                path.pop()
+            return False
+        for depth in range(FIRST_LAYER_DEPTH + 1):
+            if(search(start, depth, None)):
+                return path
         return None
 
     def _orient_last_layer(self):
         """OLL step: Orient all yellow stickers to face up."""
         if self._is_oll_solved():
             return
-
-        # Try to find a matching case by rotating the top layer
-        for _ in range(4):
-            top_face_pattern = self._get_oll_pattern()
-            if top_face_pattern in self.oll_algorithms:
-                alg = self.oll_algorithms[top_face_pattern]
-                self._apply_move(alg)
-                # Now OLL should be solved, we might just need to align.
-                # The final alignment is handled by PLL and the final step.
-                return
-            self._apply_move("U")
-
-        # If we get here, no OLL case was matched. This can happen if the
-        # first face was not solved correctly. Apply a default alg to
-        # change the state and hope for the best in the next stages.
-        self._apply_move("R U R' U R U2 R'")
+        # the case is found by trying the algorithms after every turn of the last layer
+        formula = self._find_algorithm(self.oll_algorithms, self.__isOriented)
+        if formula:
+            self._apply_move(formula)
 
     def _permute_last_layer(self):
         """PLL step: Permute the top layer corners."""
-        for _ in range(5):
-            if self._is_pll_solved():
-                return
-            
-            pll_case = self._get_pll_case()
-            if pll_case in self.pll_algorithms:
-                self._apply_move(self.pll_algorithms[pll_case])
-                # Align after PLL
-                for _ in range(4):
-                    if self._is_pll_solved():
-                        break
-                    self._apply_move("U")
-                return
-            
-            self._apply_move("U")
+        if self._is_pll_solved():
+            return
+        formula = self._find_algorithm(self.pll_algorithms.values(), self.__isPermuted)
+        if formula:
+            self._apply_move(formula)
+
+    def _find_algorithm(self, algorithms, done):
+        """
+        Finds a turn of the last layer and an algorithm after which done() holds for the state index of the cube.
+
+        Returns
+        -------
+        formula : string or None
+            The turn and the algorithm, None if none of them works (the first layer is not built).
+        """
+        try:
+            start = stateIndex(self.cube.cube)
+        except ValueError:
+            return None
+        for alg in algorithms:
+            for alignment in ALIGNMENTS:
+                formula = (alignment + " " + alg).strip()
+                if done(applyFormula(start, formula)):
+                    return formula
+        return None
+
+    def __isOriented(self, index):
+        top = stateFaces(index)[5]
+        return all(sticker == STANDARD_SCHEME[5] for row in top for sticker in row)
+
+    def __isPermuted(self, index):
+        # solved up to a turn of the last layer, the final alignment turns it
+        return any(applyFormula(index, alignment) == SOLVED_INDEX for alignment in ALIGNMENTS)
 
     def _is_first_face_solved(self, cube_obj=None):
         """Check if the white face is solved and the side colors match."""
@@ -157,35 +298,10 @@ class Solver2x2:
             return False
         return True
 
-    def _get_oll_pattern(self):
-        """Get the orientation pattern of the top (yellow) face."""
-        top_face = self.cube.getFaces()[5]
-        # Pattern is read from top-left, top-right, bottom-left, bottom-right
-        return (
-            1 if top_face[0][0] == 'Y' else 0,
-            1 if top_face[0][1] == 'Y' else 0,
-            1 if top_face[1][0] == 'Y' else 0,
-            1 if top_face[1][1] == 'Y' else 0,
-        )
-
     def _is_oll_solved(self):
         """Check if all yellow stickers are on the top face."""
         return all(sticker == 'Y' for row in self.cube.getFaces()[5] for sticker in row)
 
-    def _get_pll_case(self):
-        """Determine the PLL case by checking for 'headlights'."""
-        faces = self.cube.getFaces()
-        # Check for a solved bar on any of the four side faces' top layer
-        if faces[0][0][0] == faces[0][0][1]: # Front
-            return "Adjacent"
-        if faces[1][0][0] == faces[1][0][1]: # Right
-            return "Adjacent"
-        if faces[2][0][0] == faces[2][0][1]: # Back
-            return "Adjacent"
-        if faces[3][0][0] == faces[3][0][1]: # Left
-            return "Adjacent"
-        return "Diagonal"
-
     def _is_pll_solved(self):
         """Check if the top layer corners are permuted correctly."""
         faces = self.cube.getFaces()
@@ -204,13 +320,8 @@ class Solver2x2:
         if not self.moves:
             return "Already solved!" if self._is_solved() else "Could not solve."
         
-        solution = " ".join(self.moves)
-        
-        # Simple move optimizer
-        solution = solution.replace("U U U U", "").replace("R R R R", "").replace("F F F F", "")
-        solution = solution.replace("U U U", "U'").replace("R R R", "R'").replace("F F F", "F'")
-        solution = solution.replace("U' U'", "U2").replace("R' R'", "R2").replace("F' F'", "F2")
-        solution = solution.replace("U U", "U2").replace("R R", "R2").replace("F F", "F2")
+        # the steps are condensed together, e.g. the last turn of the first layer with the turn before OLL
+        solution = " ".join(splitFormula(condenseFormula("".join("".join(self.moves).split()))))
         
         if decorated:
             return f"2x2 Solution: {solution}"
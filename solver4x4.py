@@ -1,271 +1,456 @@
+import os
+import time
+from functools import lru_cache
+from cube import Cube
 from cube4x4 import Cube4x4
-import random
+from coords2x2 import STANDARD_SCHEME, schemeOf
+from coords4x4 import cornerFaces
+from fast_cube4x4 import (MOVES, PERMUTATIONS, REDUCED_MOVES, SOLVED, applyPermutation, compose, followingMoves, formulaPermutation, inverseMove,
+                          invertFormula)
+from helper import parseFormula
+from solver import Solver
+from solver_stats import SolverStats
+from validator import PIECES, CubeStateError, validateState
+
+# time budget of every stage in milliseconds, a stage that runs out gives up the solve
+STAGE_BUDGETS_MS = {
+    "centers": float(os.environ.get("PYCUBE_4X4_CENTERS_BUDGET_MS", 250)),
+    "edges": float(os.environ.get("PYCUBE_4X4_EDGES_BUDGET_MS", 350)),
+    "3x3": float(os.environ.get("PYCUBE_4X4_3X3_BUDGET_MS", 250))
+}
+# nearly solved cubes are solved by a search of up to this many moves before any stage (4 costs about 10 ms)
+QUICK_DEPTH = int(os.environ.get("PYCUBE_4X4_QUICK_DEPTH", 3))
+SUCCESSORS = followingMoves(MOVES)
+OUTER_MOVES = [move for move in MOVES if "w" not in move]
+WIDE_MOVES = [move for move in MOVES if "w" in move]
+# the centers are built in this order of faces, the last one is done once the others are
+CENTER_ORDER = [4, 5, 0, 1, 2, 3]
+FACE_CENTERS = [[side * 16 + row * 4 + col for row in (1, 2) for col in (1, 2)] for side in range(6)]
+CENTERS = [position for face in FACE_CENTERS for position in face]
+# rows and columns of a 4x4 face that make the 3x3 face of a reduced cube
+REDUCED_INDICES = [0, 1, 3]
+# flips the orientation of one edge, and swaps two edges, of the reduced cube without touching the centers
+OLL_PARITY = "Rw2 B2 U2 Lw U2 Rw' U2 Rw U2 F2 Rw F2 Lw' B2 Rw2"
+PLL_PARITY = "Rw2 R2 U2 Rw2 R2 Uw2 Rw2 R2 Uw2"
+# sequences that take a paired edge out of the front-right slot and an unpaired one in, with the front-left one upside down
+FLIP_ALGORITHMS = ["R U R' F R' F' R", "R U' R' F R' F' R", "R F' U R' F", "R' F R F'"]
+
+def _recolored(state):
+    # the stickers as a string, with the colors renamed in the order they first show up: the same for every
+    # solved state, whatever its orientation and color scheme
+    text = "".join(state)
+    colors = "".join(sorted(set(text), key=text.find))
+    return text.translate(str.maketrans(colors, "abcdefghijklmnopqrstuvwxyz"[:len(colors)]))
+
+@lru_cache(maxsize=None)
+def _nearSolved(depth):
+    # the recolored states up to `depth` moves from solved, with the moves that solve them
+    near = {_recolored(SOLVED): []}
+    frontier = [(SOLVED, [], None)]
+    for _ in range(depth):
+        following = []
+        for state, moves, previous in frontier:
+            for move in SUCCESSORS[previous]:
+                moved = applyPermutation(state, PERMUTATIONS[move])
+                key = _recolored(moved)
+                if(key not in near):
+                    near[key] = [inverseMove(move)] + moves
+                    following.append((moved, near[key], move))
+        frontier = following
+    return near
+
+def _support(permutation, positions):
+    # (position, position its sticker comes from) of the given positions that the permutation moves
+    return tuple((i, permutation[i]) for i in positions if permutation[i] != i)
+
+def _relabelY():
+    # the face each face turns into when the whole cube is turned like U, found by conjugating every move
+    rotation = formulaPermutation("Uw Dw'")
+    inverse = formulaPermutation("Uw' Dw")
+    faces = {}
+    for face in "UDRLFB":
+        conjugate = compose(compose(rotation, PERMUTATIONS[face]), inverse)
+        faces[face] = [other for other in "UDRLFB" if PERMUTATIONS[other] == conjugate][0]
+    return faces
+
+@lru_cache(maxsize=None)
+def centerMacros():
+    """
+    Gives the sequences the centers are built with, as (support, formula, length) where the support
+    lists the (position, position its sticker comes from) of the centers the sequence moves.
+
+    They are the single moves, the conjugates X Y X' of a face turn by a wide turn, and the commutators
+    [X Y X', Z] of those with a face turn, which move 4 to 6 centers and nothing else among them.
+    """
+    macros = {}
+    def add(form, permutation):
+        support = _support(permutation, CENTERS)
+        if(len(support) > 0 and (support not in macros or len(form.split()) < len(macros[support].split()))):
+            macros[support] = form
+    for move in MOVES:
+        add(move, PERMUTATIONS[move])
+    for wide in WIDE_MOVES:
+        for outer in OUTER_MOVES:
+            conjugate = wide + " " + outer + " " + inverseMove(wide)
+            permutation = formulaPermutation(conjugate)
+            inverse = formulaPermutation(invertFormula(conjugate))
+            add(conjugate, permutation)
+            for face in OUTER_MOVES:
+                commutator = compose(compose(compose(permutation, PERMUTATIONS[face]), inverse), PERMUTATIONS[inverseMove(face)])
+                add(conjugate + " " + face + " " + invertFormula(conjugate) + " " + inverseMove(face), commutator)
+    return [(support, form, len(form.split())) for support, form in macros.items()]
+
+@lru_cache(maxsize=None)
+def wingChecks():
+    """
+    Gives, for each of the 12 edges, the positions (a, b, c, d) of its two wings such that the edge is
+    paired when the stickers at a and b match and the stickers at c and d match.
+    """
+    slots = {}
+    for wing in PIECES[4][2]:
+        slots.setdefault(frozenset(side for side, _, _ in wing), []).append(sorted(wing))
+    checks = []
+    for first, second in slots.values():
+        checks.append((first[0][0] * 16 + first[0][1] * 4 + first[0][2], second[0][0] * 16 + second[0][1] * 4 + second[0][2],
+                       first[1][0] * 16 + first[1][1] * 4 + first[1][2], second[1][0] * 16 + second[1][1] * 4 + second[1][2]))
+    return checks
+
+@lru_cache(maxsize=None)
+def edgeMacros():
+    """
+    Gives the sequences the edges are paired with, as (formula, length, checks) where checks has the
+    wing checks (see wingChecks()) of the edges the sequence touches, along with where their stickers come from.
+
+    They are slice-flip-slice sequences, S E S' with S a wide turn of U or D and E one of FLIP_ALGORITHMS
+    (or its inverse) done at any of the four middle slots, that leave every center where it was.
+    """
+    relabel = _relabelY()
+    flips = set()
+    for algorithm in FLIP_ALGORITHMS:
+        for form in [algorithm, invertFormula(algorithm)]:
+            for _ in range(4):
+                flips.add(form)
+                form = " ".join(relabel[move[0]] + move[1:] for move in form.split())
+    macros = {}
+    for wide in ["Uw", "Uw'", "Uw2", "Dw", "Dw'", "Dw2"]:
+        for flip in sorted(flips):
+            form = wide + " " + flip + " " + inverseMove(wide)
+            permutation = formulaPermutation(form)
+            if(all(permutation[i] // 16 == i // 16 for i in CENTERS) and permutation not in macros):
+                macros[permutation] = form
+    checks = wingChecks()
+    result = []
+    for permutation, form in macros.items():
+        touched = [check for check in checks if any(permutation[i] != i for i in check)]
+        result.append((form, len(form.split()), [tuple(permutation[i] for i in check) + check for check in touched]))
+    return result
+
+@lru_cache(maxsize=None)
+def setupSequences():
+    """
+    Gives the sequences of up to two outer turns, which never move a center to another face, as
+    (formula, length, permutation).
+    """
+    forms = [""] + OUTER_MOVES + [first + " " + second for first in OUTER_MOVES for second in OUTER_MOVES if first[0] != second[0]]
+    return [(form, len(form.split()), formulaPermutation(form)) for form in forms]
+
+def _pairedEdges(state):
+    return sum(1 for a, b, c, d in wingChecks() if state[a] == state[b] and state[c] == state[d])
+
+def reducedFaces(state):
+    """
+    Gives the 3x3 cube faces matrix array of a reduced 4x4 state tuple.
+    """
+    return [[[state[side * 16 + row * 4 + col] for col in REDUCED_INDICES] for row in REDUCED_INDICES] for side in range(6)]
+
+def mergeMoves(moves):
+    """
+    Merges consecutive turns of the same layers of a list of moves, e.g. R R2 into R'.
+    """
+    turns = {"": 1, "2": 2, "'": 3}
+    merged = []
+    for move in moves:
+        layer = move.rstrip("'2")
+        if(len(merged) > 0 and merged[-1].rstrip("'2") == layer):
+            count = (turns[merged.pop()[len(layer):]] + turns[move[len(layer):]]) % 4
+            if(count != 0):
+                merged.append(layer + ["", "", "2", "'"][count])
+        else:
+            merged.append(move)
+    return merged
+
+def pairEdges(state, deadline):
+    """
+    Pairs the edges of a 4x4 state tuple without moving the centers. Every step applies the sequence of
+    edgeMacros(), after the fewest outer turns of setupSequences(), that pairs the most edges per move.
+
+    Returns
+    -------
+    state, moves : tuple of size 96, list of strings
+        The state with every edge paired and the moves that pair them.
+
+    Raises
+    ------
+    TimeoutError
+        If the deadline (a time.perf_counter() value) passes.
+    RuntimeError
+        If no sequence pairs another edge.
+    """
+    moves = []
+    while(_pairedEdges(state) < 12):
+        best = None
+        for setupLength in range(3):
+            for setup, length, permutation in setupSequences():
+                if(length != setupLength):
+                    continue
+                if(time.perf_counter() > deadline):
+                    raise TimeoutError("The edges stage ran out of its budget")
+                current = applyPermutation(state, permutation) if length > 0 else state
+                for form, macroLength, checks in edgeMacros():
+                    gain = 0
+                    for pa, pb, pc, pd, a, b, c, d in checks:
+                        gain += ((current[pa] == current[pb] and current[pc] == current[pd])
+                                 - (current[a] == current[b] and current[c] == current[d]))
+                    if(gain > 0):
+                        score = gain / (length + macroLength)
+                        if(best is None or score > best[0]):
+                            best = (score, (setup + " " + form).strip())
+            if(best is not None):
+                break
+        if(best is None):
+            raise RuntimeError("The edges could not be paired")
+        state = applyPermutation(state, formulaPermutation(best[1]))
+        moves.extend(best[1].split())
+    return state, moves
+
+def fixParity(state):
+    """
+    Fixes the states a 3x3 cannot have in a reduced 4x4 state tuple: one flipped edge (OLL parity) and
+    two swapped edges (PLL parity). Gives the fixed state and the moves.
+
+    Raises
+    ------
+    CubeStateError
+        If the reduced cube is not a 3x3 state for another reason.
+    """
+    moves = []
+    for code, algorithm in [("FLIPPED_EDGE", OLL_PARITY), ("PARITY", PLL_PARITY)]:
+        try:
+            validateState("3x3", reducedFaces(state))
+        except CubeStateError as e:
+            if(e.code != code):
+                continue
+            state = applyPermutation(state, formulaPermutation(algorithm))
+            moves.extend(algorithm.split())
+    validateState("3x3", reducedFaces(state))
+    return state, moves
 
 class Solver4x4:
     """
-    A simplified 4x4 solver that focuses on getting reasonable solutions
-    without getting stuck in infinite loops.
+    A 4x4 solver using the reduction method, which involves three stages:
+    1. Build the 6 centers.
+    2. Pair the 24 edge wings into 12 edges.
+    3. Fix the OLL and PLL parities and solve the reduced cube as a 3x3 with solver.Solver.
+
+    Every stage has a time budget (STAGE_BUDGETS_MS), the solve is given up when one runs out.
+
+    Parameters
+    ----------
+    cube : Cube4x4 object
+        The cube to be solved. This object will not be modified due to the solve.
+    budgets : dict, default=None
+        Time budget of each stage ("centers", "edges" and "3x3") in milliseconds. None uses STAGE_BUDGETS_MS.
+    listener : function, default=None
+        Called with the name of a stage and its moves (separated by spaces) as soon as the stage is
+        done, before the moves are merged. Lets a caller stream the solve.
+
+    Example
+    -------
+    >>> cb = Cube4x4()
+    >>> cb.doMoves(getScramble4x4(30))
+    >>> solver = Solver4x4(cb)
+    >>> solver.solveCube()
+    >>> solver.getMoves(decorated=True)
+    "For Centers: ...\\nFor Edges: ...\\nFor Parity: ...\\nFor 3x3 Stage: ..."
     """
-    
-    def __init__(self, cube):
+
+    def __init__(self, cube, budgets = None, listener = None):
         self.cube = Cube4x4(faces=cube.getFaces())
         self.moves = []
-        
-    def solveCube(self, optimize=True):
-        """Solve the 4x4 cube using a simplified approach."""
+        self.budgets = dict(STAGE_BUDGETS_MS, **(budgets or {}))
+        self.listener = listener
+        self.error = None
+        self.__stages = []
+        self.__stats = SolverStats()
+
+    def solveCube(self, optimize = True):
+        """
+        Solves the cube. If a stage fails or runs out of its budget, no moves are kept and
+        `error` tells why.
+        """
+        self.moves = []
+        self.__stages = []
         if self._is_solved():
             return
-            
         # Try quick solutions first
         if self._try_quick_solutions():
             return
-            
-        # Apply a reasonable set of solving algorithms
-        self._apply_solving_sequence()
-        
+        try:
+            self.__reduce(optimize)
+        except (CubeStateError, RuntimeError, TimeoutError, ValueError) as e:
+            self.error = str(e)
+            self.moves = []
+            self.__stages = []
+        self.__stats.finish()
         if optimize and self.moves:
             self._optimize_moves()
 
+    def __reduce(self, optimize):
+        # the solve is done in the color scheme of the corners, recolored to the standard one, so that the
+        # centers get built around the corners and the reduced cube is solvable
+        scheme = schemeOf(cornerFaces(self.cube.state))
+        state = tuple(STANDARD_SCHEME[scheme.index(sticker)] for sticker in self.cube.state)
+        start = state
+
+        self.__stats.beginPhase("centers")
+        state, moves = self.__solveCenters(state, time.perf_counter() + self.budgets["centers"] / 1000.0)
+        self.__addStage("Centers", moves)
+
+        self.__stats.beginPhase("edges")
+        state, moves = pairEdges(state, time.perf_counter() + self.budgets["edges"] / 1000.0)
+        self.__addStage("Edges", moves)
+
+        self.__stats.beginPhase("parity")
+        state, moves = fixParity(state)
+        self.__addStage("Parity", moves)
+
+        self.__stats.beginPhase("3x3")
+        started = time.perf_counter()
+        solver = Solver(Cube(faces=reducedFaces(state)))
+        solver.solveCube(optimize=optimize)
+        moves = []
+        for instruction in parseFormula(solver.getMoves(decorated=False), condense=False):
+            form = REDUCED_MOVES[instruction[0]]
+            moves.extend((invertFormula(form) if instruction.endswith("P") else form).split())
+        if((time.perf_counter() - started) * 1000 > self.budgets["3x3"]):
+            raise TimeoutError("The 3x3 stage ran out of its budget")
+        self.__addStage("3x3 Stage", moves)
+
+        final = applyPermutation(start, formulaPermutation(" ".join(self.moves)))
+        if(any(final[i] != final[i - i % 16] for i in range(96))):
+            raise RuntimeError("The reduced cube could not be solved")
+
+    def __addStage(self, name, moves):
+        self.__stats.addMoves(len(moves))
+        self.__stages.append((name, moves))
+        self.moves.extend(moves)
+        if(self.listener is not None and moves):
+            self.listener(name, " ".join(moves))
+
+    def __solveCenters(self, state, deadline):
+        """
+        Builds the centers one face at a time. Every step applies the sequence of centerMacros() (after
+        one outer turn if needed) that brings the most centers of the color onto the face per move,
+        without taking any off the faces already built.
+        """
+        moves = []
+        for k, face in enumerate(CENTER_ORDER[:-1]):
+            built = CENTER_ORDER[:k]
+            color = STANDARD_SCHEME[face]
+            while(sum(1 for i in FACE_CENTERS[face] if state[i] == color) < 4):
+                if(time.perf_counter() > deadline):
+                    raise TimeoutError("The centers stage ran out of its budget")
+                best = None
+                for setup in [""] + OUTER_MOVES:
+                    current = applyPermutation(state, PERMUTATIONS[setup]) if setup else state
+                    for support, form, length in centerMacros():
+                        gain = 0
+                        for position, source in support:
+                            side = position // 16
+                            if(side in built):
+                                if(current[source] != STANDARD_SCHEME[side]):
+                                    break
+                            elif(side == face):
+                                gain += (current[source] == color) - (current[position] == color)
+                        else:
+                            if(gain > 0):
+                                score = gain / (length + (1 if setup else 0))
+                                if(best is None or score > best[0]):
+                                    best = (score, (setup + " " + form).strip())
+                    # an outer turn first is only tried when no sequence helps on its own
+                    if(best is not None):
+                        break
+                if(best is None):
+                    raise RuntimeError("The centers could not be built")
+                state = applyPermutation(state, formulaPermutation(best[1]))
+                moves.extend(best[1].split())
+        return state, moves
+
     def _try_quick_solutions(self):
-        """Try simple solutions for nearly solved cubes."""
+        """
+        Looks for a solution of up to QUICK_DEPTH moves, for nearly solved cubes. The first moves are
+        a depth-limited search probed in place on the cube (Cube4x4.pushMove()), and every node is
+        looked up in the states up to two moves from solved (_nearSolved()).
+        """
         if self._is_solved():
             return True
-            
-        # Try single moves
-        simple_moves = ["U", "U'", "U2", "R", "R'", "R2", "F", "F'", "F2", "D", "D'", "D2"]
-        for move in simple_moves:
-            test_cube = Cube4x4(faces=self.cube.getFaces())
-            try:
-                test_cube.doMoves(move)
-                if self._is_cube_solved(test_cube):
-                    self._apply_move(move)
-                    return True
-            except:
-                continue
-                
-        # Try two-move combinations
-        for move1 in ["U", "R", "F"]:
-            for move2 in ["U", "R", "F"]:
-                if move1 == move2:
-                    continue
-                test_cube = Cube4x4(faces=self.cube.getFaces())
-                try:
-                    test_cube.doMoves(f"{move1} {move2}")
-                    if self._is_cube_solved(test_cube):
-                        self._apply_move(f"{move1} {move2}")
-                        return True
-                except:
-                    continue
-        
-        return False
+        near = _nearSolved(min(2, QUICK_DEPTH))
+        path = []
 
-    def _apply_solving_sequence(self):
-        """Apply a sequence of proven 4x4 solving algorithms."""
-        # Standard 4x4 algorithms that work well
-        algorithms = [
-            # Basic 4x4 reduction moves
-            "r U r' F r F' r'",       # Center building
-            "r U R' U' r' F R F'",    # Edge pairing
-            "R U R' U R U2 R'",       # Sune (OLL)
-            "F R U R' U' F'",         # Basic OLL
-            "R U R' F' R U R' U' R' F R2 U' R'",  # T-perm (PLL)
-            
-            # Additional useful algorithms
-            "r U r' U r U2 r'",       # 4x4 Sune variation
-            "r U R' U' r' U R",       # Edge pairing variation
-            "F R U R' U' F' U F R U R' U' F'",  # Double OLL
-        ]
-        
-        max_attempts = 8  # Limit attempts to prevent infinite loops
-        for i, alg in enumerate(algorithms[:max_attempts]):
-            if self._is_solved():
-                break
-                
-            self._apply_move(alg)
-            
-            # Add setup moves occasionally
-            if i % 3 == 0:
-                self._apply_move("U")
-            elif i % 3 == 1:
-                self._apply_move("R U R'")
-                
-            # Check if we're getting close to solved
-            if i > 4 and self._is_mostly_solved():
-                # Apply finishing touches
-                self._apply_move("R U R' U R U2 R'")
-                break
+        def search(depth, previous):
+            tail = near.get(_recolored(self.cube.state))
+            if tail is not None and self.cube.probe(tail, Cube4x4.isSolved):
+                return path + tail
+            if depth == 0:
+                return None
+            for move in SUCCESSORS[previous]:
+                self.cube.pushMove(move)
+                path.append(move)
+                found = search(depth - 1, move)
+                path.pop()
+                self.cube.popMove()
+                if found is not None:
+                    return found
+            return None
 
-    def _is_mostly_solved(self):
-        """Check if the cube is mostly solved (simple heuristic)."""
-        try:
-            faces = self.cube.getFaces()
-            solved_faces = 0
-            
-            for face in faces:
-                first_color = face[0][0]
-                is_face_solved = True
-                for row in face:
-                    for sticker in row:
-                        if sticker != first_color:
-                            is_face_solved = False
-                            break
-                    if not is_face_solved:
-                        break
-                        
-                if is_face_solved:
-                    solved_faces += 1
-                    
-            return solved_faces >= 4  # At least 4 faces solved
-        except:
-            return False
-
-    def _apply_move(self, move_str):
-        """Helper to apply a move or algorithm and record it."""
-        if move_str and len(self.moves) < 100:  # Hard limit to prevent runaway
-            try:
-                self.cube.doMoves(move_str)
-                self.moves.extend(move_str.split())
-            except Exception as e:
-                # Silently ignore move errors to prevent crashes
-                pass
+        for depth in range(max(0, QUICK_DEPTH - 2) + 1):
+            found = search(depth, None)
+            if found is not None:
+                self.cube.applyMoves(found)
+                self.moves.extend(found)
+                return True
+        return False
 
     def _is_solved(self):
         """Check if the cube is solved."""
         return self._is_cube_solved(self.cube)
-        
+
     def _is_cube_solved(self, cube):
         """Check if a given cube is solved."""
-        try:
-            faces = cube.getFaces()
-            for face in faces:
-                first_color = face[0][0]
-                for row in face:
-                    for sticker in row:
-                        if sticker != first_color:
-                            return False
-            return True
-        except:
-            return False
+        return cube.isSolved()
 
     def _optimize_moves(self):
-        """Basic move optimization by removing redundant moves."""
-        if not self.moves:
+        """Merges consecutive turns of the same layers, stage by stage."""
+        if not self.__stages:
+            self.moves = mergeMoves(self.moves)
             return
-            
-        # Simple optimization: remove U U U U sequences
-        optimized = []
-        i = 0
-        while i < len(self.moves):
-            move = self.moves[i]
-            
-            # Count consecutive identical moves
-            count = 1
-            while i + count < len(self.moves) and self.moves[i + count] == move:
-                count += 1
-            
-            # Optimize based on count
-            if count % 4 == 0:
-                # 4 or more cycles = no move
-                pass
-            elif count % 4 == 3:
-                # 3 moves = 1 reverse move
-                if move.endswith("'"):
-                    optimized.append(move[:-1])
-                else:
-                    optimized.append(move + "'")
-            elif count % 4 == 2:
-                # 2 moves = 1 double move
-                if move.endswith("'") or move.endswith("2"):
-                    optimized.append(move[0] + "2")
-                else:
-                    optimized.append(move + "2")
-            elif count % 4 == 1:
-                # Single move
-                optimized.append(move)
-            
-            i += count
-        
-        self.moves = optimized
+        self.__stages = [(name, mergeMoves(moves)) for name, moves in self.__stages]
+        self.moves = [move for _, moves in self.__stages for move in moves]
 
-    def getMoves(self, decorated=True):
-        """Get the solution moves."""
-        if not self.moves:
-            if self._is_solved():
-                return "Already solved!"
-            else:
-                return "Could not solve the cube."
-        
-        moves_str = " ".join(self.moves)
-        
-        if decorated:
-            return f"4x4 Solution: {moves_str}"
-        else:
-            return moves_str
-        # Check bottom cross
-        return (faces[4][0][1] == faces[4][1][1] and
-                faces[4][1][0] == faces[4][1][1] and
-                faces[4][1][2] == faces[4][1][1] and
-                faces[4][2][1] == faces[4][1][1])
-
-    def _f2l_solved(self):
-        """Check if F2L is solved (simplified)."""
-        # Simplified check
-        return True
-
-    def _oll_solved(self):
-        """Check if OLL is solved."""
-        faces = self.cube.getFaces()
-        top_color = faces[5][1][1]
-        for i in range(4):
-            for j in range(4):
-                if faces[5][i][j] != top_color:
-                    return False
-        return True
-
-    def _is_solved(self):
-        """Check if the entire cube is solved."""
-        faces = self.cube.getFaces()
-        for face in faces:
-            color = face[0][0]
-            for i in range(4):
-                for j in range(4):
-                    if face[i][j] != color:
-                        return False
-        return True
-
-    def _optimize_moves(self):
-        """Basic move optimization."""
-        # Remove redundant moves
-        optimized = []
-        i = 0
-        while i < len(self.moves):
-            current = self.moves[i]
-            
-            # Look for consecutive same moves
-            count = 1
-            while i + count < len(self.moves) and self.moves[i + count] == current:
-                count += 1
-            
-            # Optimize based on count
-            if count % 4 == 1:
-                optimized.append(current)
-            elif count % 4 == 2:
-                optimized.append(current + "2" if not current.endswith("2") else current[:-1])
-            elif count % 4 == 3:
-                optimized.append(current + "'" if not current.endswith("'") else current[:-1])
-            # count % 4 == 0 means cancel out, add nothing
-            
-            i += count
-        
-        self.moves = optimized
+    def getStats(self):
+        """
+        Gives the per-stage instrumentation of the solve (centers, edges, parity and 3x3).
+        """
+        return self.__stats
 
     def getMoves(self, decorated=True):
-        """Get the solution moves."""
+        """Get the solution moves, stage by stage if decorated."""
         if not self.moves:
             return "Already solved!" if self._is_solved() else "Could not solve."
-        
+
+        if decorated and self.__stages:
+            return "\n".join(f"For {name}: {' '.join(moves)}" for name, moves in self.__stages if moves)
         solution = " ".join(self.moves)
-        
         if decorated:
             return f"4x4 Solution: {solution}"
         return solution
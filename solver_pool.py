@@ -0,0 +1,170 @@
+import multiprocessing
+import os
+import socket
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from metrics import counter, gauge
+
+_pool = None
+_poolPid = None
+_lock = threading.Lock()
+# the futures submitted through submit() that are not done yet
+_pending = set()
+# how often a request waiting on the pool checks whether its client is still there, in seconds
+POLL_SECONDS = 0.1
+
+poolCancelled = counter("pycube_pool_cancelled_total", "Solves given up before they finished.", ("reason",))
+
+class DeadlineExceeded(Exception):
+    """
+    Raised when a solve in the pool does not finish before the deadline of its request.
+    """
+
+class RequestAbandoned(Exception):
+    """
+    Raised when the client of a request waiting on the pool went away.
+    """
+
+def cpuCount():
+    """
+    Gives the number of CPUs this process may run on (honouring the container's CPU affinity).
+    """
+    try:
+        return max(1, len(os.sched_getaffinity(0)))
+    except AttributeError:
+        return max(1, os.cpu_count() or 1)
+
+def inWorker():
+    """
+    Checks if the current process is itself a pool worker. Pool workers never open a nested pool.
+    """
+    return multiprocessing.parent_process() is not None
+
+def getPool():
+    """
+    Gives the persistent process pool of this process, creating it on first use.
+
+    The pool is sized to the CPUs available to the container (PYCUBE_POOL_WORKERS overrides it, 0
+    does the work inline) and is shared by every request of the process.
+
+    Returns
+    -------
+    pool : ProcessPoolExecutor object or None
+        None inside a pool worker or with no pool workers, where the work should be done inline instead.
+    """
+    global _pool, _poolPid
+    workers = int(os.environ.get("PYCUBE_POOL_WORKERS", cpuCount()))
+    if(inWorker() or workers <= 0):
+        return None
+    with _lock:
+        # a pool inherited through a fork belongs to the parent and cannot be used
+        if(_pool is None or _poolPid != os.getpid()):
+            _pending.clear()
+            _pool = ProcessPoolExecutor(max_workers=workers)
+            _poolPid = os.getpid()
+        return _pool
+
+def shutdownPool(wait = True):
+    """
+    Shuts the persistent process pool down. The next getPool() call creates a new one.
+    """
+    global _pool
+    # the pool is shut down outside the lock: waiting for it runs the done callbacks (_forget()), which take the lock
+    with _lock:
+        pool = _pool if _poolPid == os.getpid() else None
+        _pool = None
+    if(pool is not None):
+        pool.shutdown(wait=wait, cancel_futures=True)
+
+def submit(pool, function, *args):
+    """
+    Submits a call to a pool, counted in the queue depth and in-flight gauges until it is done.
+    """
+    future = pool.submit(function, *args)
+    with _lock:
+        _pending.add(future)
+    future.add_done_callback(_forget)
+    return future
+
+def _forget(future):
+    with _lock:
+        _pending.discard(future)
+
+def queued():
+    """
+    Gives the number of submitted calls that wait for a pool worker.
+    """
+    with _lock:
+        return sum(1 for future in _pending if not future.running())
+
+def inFlight():
+    """
+    Gives the number of submitted calls that a pool worker has taken.
+    """
+    with _lock:
+        return sum(1 for future in _pending if future.running())
+
+def runInPool(function, args, deadline, abandoned = None):
+    """
+    Runs a call in the pool and waits for it, inline if there is no pool (see getPool()).
+
+    Parameters
+    ----------
+    function : function
+        A module level function, so that it can be sent to a worker.
+    args : tuple
+        Its arguments.
+    deadline : float
+        time.monotonic() by when the result is needed.
+    abandoned : function, default=None
+        Checked every POLL_SECONDS while waiting, True when nobody waits for the result any more.
+
+    Raises
+    ------
+    DeadlineExceeded
+        If the call is not done by the deadline.
+    RequestAbandoned
+        If `abandoned` says so first.
+
+    In both cases the call is cancelled if no worker has taken it yet, and its result is dropped
+    otherwise (a running solve is bounded by its own time budget).
+    """
+    pool = getPool()
+    if(pool is None):
+        return function(*args)
+    future = submit(pool, function, *args)
+    try:
+        while(True):
+            remaining = deadline - time.monotonic()
+            if(remaining <= 0):
+                poolCancelled.inc(reason="deadline")
+                raise DeadlineExceeded("Deadline exceeded")
+            try:
+                return future.result(timeout=min(POLL_SECONDS, remaining))
+            except FutureTimeoutError:
+                pass
+            if(abandoned is not None and abandoned()):
+                poolCancelled.inc(reason="abandoned")
+                raise RequestAbandoned("The client went away")
+    except BrokenProcessPool:
+        # a worker died (e.g. it ran out of memory): the next call gets a new pool
+        shutdownPool(wait=False)
+        raise
+    finally:
+        future.cancel()
+
+def socketClosed(sock):
+    """
+    Checks, without blocking or consuming anything, whether the peer of a connected socket has closed it.
+    """
+    try:
+        return sock.recv(1, socket.MSG_PEEK | socket.MSG_DONTWAIT) == b""
+    except (BlockingIOError, InterruptedError):
+        return False
+    except OSError:
+        return True
+
+gauge("pycube_pool_queued", "Solves submitted to the process pool that wait for a worker.", queued)
+gauge("pycube_pool_in_flight", "Solves running in the process pool.", inFlight)
@@ -0,0 +1,100 @@
+import time
+from metrics import histogram
+
+# process-wide histograms that every published solve is aggregated into
+phaseSeconds = histogram("pycube_solver_phase_seconds", "Wall time spent in each solver phase.",
+    [0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5], ("cube_type", "phase"))
+phaseMoves = histogram("pycube_solver_phase_moves", "Moves emitted by each solver phase.",
+    [0, 1, 2, 4, 8, 12, 16, 24, 32, 48, 64, 96, 128], ("cube_type", "phase"))
+phaseLookups = histogram("pycube_solver_phase_lookups", "Table lookups performed by each solver phase.",
+    [0, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000], ("cube_type", "phase"))
+phaseRecursions = histogram("pycube_solver_phase_recursions", "Recursive calls made by each solver phase.",
+    [0, 1, 2, 4, 8, 16, 32, 64, 128], ("cube_type", "phase"))
+
+class SolverStats:
+    """
+    Per-phase instrumentation of a single solve.
+
+    Every phase records its wall time, the number of moves emitted, the number of table lookups
+    performed and the number of recursive calls made.
+
+    Example
+    -------
+    >>> stats = SolverStats()
+    >>> stats.beginPhase("cross")
+    >>> stats.addMoves(3)
+    >>> stats.finish()
+    >>> stats.toDict()["phases"]["cross"]["moves"]
+    3
+    """
+
+    def __init__(self):
+        self.phases = {}
+        self.__current = None
+        self.__started = None
+
+    def beginPhase(self, name):
+        """
+        Starts timing a phase. The phase that is currently running (if any) is ended first.
+        """
+        self.endPhase()
+        self.__current = self.phases.setdefault(name, {"seconds": 0.0, "moves": 0, "lookups": 0, "recursions": 0})
+        self.__started = time.perf_counter()
+
+    def endPhase(self):
+        """
+        Ends the phase that is currently running. Does nothing if no phase is running.
+        """
+        if(self.__current is not None):
+            self.__current["seconds"] += time.perf_counter() - self.__started
+            self.__current = None
+
+    def finish(self):
+        """
+        Ends the solve. Same as endPhase(), kept separate for readability at call sites.
+        """
+        self.endPhase()
+
+    def addMoves(self, count):
+        if(self.__current is not None):
+            self.__current["moves"] += count
+
+    def addLookups(self, count = 1):
+        if(self.__current is not None):
+            self.__current["lookups"] += count
+
+    def addRecursion(self):
+        if(self.__current is not None):
+            self.__current["recursions"] += 1
+
+    def totalSeconds(self):
+        return sum(phase["seconds"] for phase in self.phases.values())
+
+    def toDict(self):
+        """
+        Gives the stats as a JSON serializable dictionary.
+        """
+        return {
+            "phases": {name: dict(phase) for name, phase in self.phases.items()},
+            "total_seconds": self.totalSeconds()
+        }
+
+    @classmethod
+    def fromDict(cls, data):
+        """
+        Rebuilds stats from toDict() output, e.g. when the solve ran in another process.
+        """
+        stats = cls()
+        for name, phase in data["phases"].items():
+            stats.phases[name] = dict(phase)
+        return stats
+
+    def publish(self, cube_type):
+        """
+        Aggregates the stats into the process-wide histograms exported at /metrics.
+        """
+        for name, phase in self.phases.items():
+            phaseSeconds.observe(phase["seconds"], cube_type=cube_type, phase=name)
+            phaseMoves.observe(phase["moves"], cube_type=cube_type, phase=name)
+            phaseLookups.observe(phase["lookups"], cube_type=cube_type, phase=name)
+            phaseRecursions.observe(phase["recursions"], cube_type=cube_type, phase=name)
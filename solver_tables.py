@@ -0,0 +1,127 @@
+import hashlib
+import marshal
+import mmap
+import os
+import struct
+
+# magic, format version, marshal version, payload length and sha256 of the payload
+HEADER = struct.Struct("<8sHHQ32s")
+MAGIC = b"PYCUBETB"
+# bumped whenever the meaning of a table changes, older artifacts are then ignored
+FORMAT_VERSION = 2
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "solver_tables.bin")
+# tables the 3x3 solver cannot do without, the derived ones are rebuilt by their modules when missing
+REQUIRED = ("f2l", "oll", "pll", "movedata", "move_pole_perspective", "positionTransformData", "whiteEdgePairs", "whiteEdgeDirectMoves")
+
+_loaded = {}
+
+def indexF2L(f2ldb):
+    """
+    Indexes the F2L cases by their attributes, so that a case is found with a single lookup.
+
+    Returns
+    -------
+    index : dict
+        Maps (section, corner, edge) (and (distance sign, distance) for section 1a) to the algorithm.
+    """
+    index = {}
+    for entry in f2ldb:
+        index.setdefault(tuple(entry[:-1]), entry[-1])
+    return index
+
+def defaultTables():
+    """
+    Gives the hand written tables of solver_data.
+    """
+    # solver_data is only imported when there is no artifact to load
+    import solver_data
+    f2l = dict(solver_data.LyreLookUpSystem)
+    f2l["index"] = indexF2L(f2l["f2ldb"])
+    return {
+        "f2l": f2l,
+        "oll": solver_data.ScythePatternMatcher,
+        "pll": solver_data.RunePatternMatcher,
+        "movedata": solver_data.movedata,
+        "move_pole_perspective": solver_data.move_pole_perspective,
+        "positionTransformData": solver_data.positionTransformData,
+        "whiteEdgePairs": solver_data.whiteEdgePairs,
+        "whiteEdgeDirectMoves": solver_data.whiteEdgeDirectMoves,
+        "source": "solver_data"
+    }
+
+def writeTables(tables, path = DEFAULT_PATH):
+    """
+    Writes solver tables to a versioned and checksummed binary artifact (see table_builder.py).
+
+    Parameters
+    ----------
+    tables : dict
+        The tables by name, made of the types marshal supports (dicts, lists, tuples, strings and numbers).
+    path : string, default=DEFAULT_PATH
+        Where to write the artifact.
+    """
+    payload = marshal.dumps({name: table for name, table in tables.items() if name != "source"})
+    header = HEADER.pack(MAGIC, FORMAT_VERSION, marshal.version, len(payload), hashlib.sha256(payload).digest())
+    with open(path + ".tmp", "wb") as file:
+        file.write(header)
+        file.write(payload)
+    # the artifact is replaced at once so that a starting worker never reads half of it
+    os.replace(path + ".tmp", path)
+
+def readTables(path = DEFAULT_PATH):
+    """
+    Reads an artifact written by writeTables().
+
+    The file is memory-mapped rather than read, so the checksum and the unmarshalling work straight
+    on the page cache, which every worker of the host shares.
+
+    Raises
+    ------
+    ValueError
+        If the file is not a tables artifact, has another format version, is damaged or misses a table.
+    """
+    with open(path, "rb") as file:
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            if(len(mapped) < HEADER.size):
+                raise ValueError(path + " is not a solver tables artifact")
+            magic, version, marshalVersion, length, digest = HEADER.unpack_from(mapped)
+            if(magic != MAGIC):
+                raise ValueError(path + " is not a solver tables artifact")
+            if(version != FORMAT_VERSION or marshalVersion > marshal.version):
+                raise ValueError(path + " has format version " + str(version) + ", expected " + str(FORMAT_VERSION))
+            if(len(mapped) != HEADER.size + length):
+                raise ValueError(path + " is truncated")
+            with memoryview(mapped)[HEADER.size:] as payload:
+                if(hashlib.sha256(payload).digest() != digest):
+                    raise ValueError(path + " does not match its checksum")
+                data = marshal.loads(payload)
+    missing = [name for name in REQUIRED if name not in data]
+    if(len(missing) > 0):
+        raise ValueError(path + " is missing the tables " + ", ".join(missing))
+    data["source"] = path
+    return data
+
+def loadTables(path = None):
+    """
+    Gives the solver tables, from the artifact if there is a usable one and from solver_data otherwise.
+    The artifact is only read once per process, every module gets the same tables.
+
+    Parameters
+    ----------
+    path : string, default=None
+        Path of the artifact. None uses PYCUBE_TABLES_PATH, or solver_tables.bin next to this file.
+
+    Returns
+    -------
+    tables : dict
+        The tables by name, in the format of solver_data, and the "source" they come from.
+        Derived tables (e.g. "permutations" of fast_cube) are only there when loaded from the artifact.
+    """
+    if(path is None):
+        path = os.environ.get("PYCUBE_TABLES_PATH", DEFAULT_PATH)
+    if(path not in _loaded):
+        try:
+            _loaded[path] = readTables(path)
+        except (OSError, ValueError, EOFError, TypeError):
+            _loaded[path] = defaultTables()
+    return _loaded[path]
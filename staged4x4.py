@@ -0,0 +1,596 @@
+import argparse
+import hashlib
+import logging
+import mmap
+import os
+import random
+import struct
+import time
+from array import array
+from coords2x2 import STANDARD_SCHEME, schemeOf
+from coords3x3 import (SOLVED as SOLVED_CUBIES, applyFormula as applyCubieFormula, applyMove as applyCubieMove, buildCornerClasses,
+                       cubies, flipIndex, middleIndex, rankPermutation, sliceIndex, slicePermutationIndex, twistIndex)
+from coords3x3 import MOVES as MOVES_3X3
+from coords4x4 import CENTER_SLOTS, MASK_MOVES, centerMask, cornerFaces, moveMask, rankMask
+from cube4x4 import Cube4x4
+from fast_cube4x4 import MOVES, applyPermutation, followingMoves, formulaPermutation
+from helper4x4 import getScramble4x4
+from solver4x4 import fixParity, mergeMoves, pairEdges, reducedFaces
+from solver_stats import SolverStats
+from structured_log import logEvent
+from validator import CubeStateError
+
+# stage tables artifact: magic, format version, layout of the center tables, number of tables and sha256 of the rest of the file
+HEADER = struct.Struct("<8sHHH32s")
+# every table: name, kind (distances packed 4 bits per state, or 16-bit values), largest distance, offset and number of entries
+SECTION = struct.Struct("<16sBBII")
+MAGIC = b"PYC4X4ST"
+FORMAT_VERSION = 1
+DISTANCES = 0
+VALUES = 1
+# the center tables are indexed by rank (small) or straight by the 24-bit center mask (about 8x bigger, no ranking per lookup)
+LAYOUTS = ["ranked", "direct"]
+DEFAULT_TABLE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "table4x4.bin")
+UNREACHED = 15
+
+# time budget of a whole solve in milliseconds, the solve is given up when it runs out
+BUDGET_MS = float(os.environ.get("PYCUBE_4X4_STAGED_BUDGET_MS", 1000))
+# how many of the shortest solutions of every stage are carried on to the next one: more gives shorter solves, but slower
+STAGE_WIDTH = int(os.environ.get("PYCUBE_4X4_STAGE_WIDTH", 4))
+
+def _slots(sides):
+    # the center mask of the centers of the given sides
+    return sum(1 << slot for slot, position in enumerate(CENTER_SLOTS) if position // 16 in sides)
+
+def _bits(mask, slots):
+    # packs the bits of a mask at the given slots (a mask) into the low bits
+    packed = 0
+    k = 0
+    for slot in range(24):
+        if(slots >> slot & 1):
+            packed |= (mask >> slot & 1) << k
+            k += 1
+    return packed
+
+UD_SLOTS = _slots((4, 5))
+RL_SLOTS = _slots((1, 3))
+FB_SLOTS = _slots((0, 2))
+
+class CenterStage:
+    """
+    A stage that brings the centers of some colors onto some sides, searched over the mask of
+    where those centers are (see coords4x4.centerMask()).
+
+    Parameters
+    ----------
+    name : string
+        Name of its table.
+    sides : list of ints
+        The sides whose colors are tracked, the stage is done when they are on these sides.
+    moves : list of strings
+        The moves of fast_cube4x4.MOVES the stage searches with, none of them undoes an earlier stage.
+    sizes : dict
+        Number of entries of its table in every layout.
+    index : function
+        Gives the index of a mask in the table, for a layout.
+    """
+
+    def __init__(self, name, sides, moves, sizes, index):
+        self.name = name
+        self.colors = [STANDARD_SCHEME[side] for side in sides]
+        self.goal = _slots(sides)
+        self.moves = moves
+        self.sizes = sizes
+        self.index = index
+
+    def project(self, state):
+        mask = 0
+        for color in self.colors:
+            mask |= centerMask(state, color)
+        return mask
+
+    def apply(self, mask, move):
+        return moveMask(mask, move)
+
+    def advance(self, state, solution):
+        return applyPermutation(state, formulaPermutation(" ".join(solution)))
+
+CENTER_STAGES = [
+    # the U and D centers onto U and D, with every move
+    CenterStage("centers1", [4, 5], MOVES, {"ranked": 735471, "direct": 1 << 24},
+                lambda mask, layout: rankMask(mask) if layout == "ranked" else mask),
+    # the R and L centers onto R and L, keeping the U and D ones there: no wide quarter turn of R, L, F or B
+    CenterStage("centers2", [1, 3], [move for move in MOVES if move[0] in "UD" or "w" not in move or move.endswith("2")],
+                {"ranked": 12870, "direct": 1 << 16},
+                lambda mask, layout: rankMask(mask & 0xFFFF) if layout == "ranked" else mask & 0xFFFF),
+    # every center home (the U, R and F ones), keeping every color on its axis: no wide quarter turn
+    CenterStage("centers3", [5, 1, 0], [move for move in MOVES if "w" not in move or move.endswith("2")],
+                {"ranked": 343000, "direct": 1 << 24},
+                lambda mask, layout: ((rankMask(_bits(mask, UD_SLOTS)) * 70 + rankMask(_bits(mask, RL_SLOTS))) * 70
+                                      + rankMask(_bits(mask, FB_SLOTS))) if layout == "ranked" else mask)
+]
+
+class Phase:
+    """
+    A phase of the Thistlethwaite solve of the reduced cube, searched over coords3x3 cubies.
+
+    Its coordinate mixes the values of some projections of the cubies, each one with its size.
+    `classes` are the corner classes of coords3x3.buildCornerClasses().
+    """
+
+    def __init__(self, name, moves, projections):
+        self.name = name
+        self.moves = moves
+        self.projections = projections
+
+    def size(self):
+        size = 1
+        for projectionSize, _ in self.projections:
+            size *= projectionSize
+        return size
+
+    def index(self, cubie, classes):
+        index = 0
+        for size, projection in self.projections:
+            index = index * size + projection(cubie, classes)
+        return index
+
+    def apply(self, cubie, move):
+        return applyCubieMove(cubie, move)
+
+    def advance(self, cubie, solution):
+        return applyCubieFormula(cubie, " ".join(solution))
+
+# every phase ends in a smaller group of the reduced cube, the last one in the solved state
+PHASES = [
+    # edges oriented, so that F and B are only turned by half from then on
+    Phase("phase1", MOVES_3X3, [(2048, lambda cubie, classes: flipIndex(cubie[3]))]),
+    # corners oriented and the E slice edges in the E slice, then R and L are only turned by half too
+    Phase("phase2", [move for move in MOVES_3X3 if move[0] in "UDRL" or move.endswith("2")],
+          [(2187, lambda cubie, classes: twistIndex(cubie[1])), (495, lambda cubie, classes: sliceIndex(cubie[2]))]),
+    # every edge in its slice and the corners where half turns alone can solve them
+    Phase("phase3", [move for move in MOVES_3X3 if move[0] in "UD" or move.endswith("2")],
+          [(70, lambda cubie, classes: middleIndex(cubie[2])), (420, lambda cubie, classes: classes[0][rankPermutation(cubie[0])])]),
+    # solved, with half turns
+    Phase("phase4", [move for move in MOVES_3X3 if move.endswith("2")],
+          [(96, lambda cubie, classes: classes[1][rankPermutation(cubie[0])]), (13824, lambda cubie, classes: slicePermutationIndex(cubie[2]))])
+]
+
+class StageTables:
+    """
+    The tables of the stages of StagedSolver4x4, in one memory-mapped file: the exact number of moves
+    every stage needs from every state of its coordinate (4 bits per state, UNREACHED for states it
+    cannot solve), and the corner classes of the Thistlethwaite phases.
+
+    As the distances are exact, IDA* never expands a node off a shortest path. The file is
+    memory-mapped, so every worker of the host shares it through the page cache.
+
+    Raises
+    ------
+    ValueError
+        If the file is not a stage tables file, has another format version or is damaged.
+    """
+
+    def __init__(self, path):
+        with open(path, "rb") as file:
+            self.__mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        if(len(self.__mapped) < HEADER.size):
+            raise ValueError(path + " is not a 4x4 stage tables file")
+        magic, version, layout, count, digest = HEADER.unpack_from(self.__mapped)
+        if(magic != MAGIC or version != FORMAT_VERSION or layout >= len(LAYOUTS)):
+            raise ValueError(path + " is not a 4x4 stage tables file of format version " + str(FORMAT_VERSION))
+        with memoryview(self.__mapped)[HEADER.size:] as payload:
+            if(hashlib.sha256(payload).digest() != digest):
+                raise ValueError(path + " does not match its checksum")
+        self.layout = LAYOUTS[layout]
+        self.__sections = {}
+        for k in range(count):
+            name, kind, depth, offset, entries = SECTION.unpack_from(self.__mapped, HEADER.size + k * SECTION.size)
+            self.__sections[name.rstrip(b"\0").decode()] = (kind, depth, offset, entries)
+        expected = {stage.name: stage.sizes[self.layout] for stage in CENTER_STAGES}
+        expected.update({phase.name: phase.size() for phase in PHASES})
+        for name, entries in expected.items():
+            if(name not in self.__sections or self.__sections[name][3] != entries):
+                raise ValueError(path + " has no table " + name + " of " + str(entries) + " entries")
+        self.classes = (self.values("cosets"), self.values("members"))
+        self.path = path
+
+    def depth(self, name):
+        """
+        Gives the largest distance in a table.
+        """
+        return self.__sections[name][1]
+
+    def distances(self, name):
+        """
+        Gives a function from an index of a table to its distance.
+        """
+        _, _, offset, _ = self.__sections[name]
+        mapped = self.__mapped
+        def distance(index):
+            return (mapped[offset + (index >> 1)] >> ((index & 1) << 2)) & 15
+        return distance
+
+    def values(self, name):
+        """
+        Gives the 16-bit values of a table as a sequence.
+        """
+        _, _, offset, entries = self.__sections[name]
+        return memoryview(self.__mapped)[offset: offset + 2 * entries].cast("H")
+
+_tables = {}
+
+def loadStageTables(path = None):
+    """
+    Gives the stage tables, mapped once per process.
+
+    Parameters
+    ----------
+    path : string, default=None
+        Path of the tables. None uses PYCUBE_4X4_TABLE_PATH, or table4x4.bin next to this file.
+
+    Returns
+    -------
+    tables : StageTables object or None
+        None if there are no usable tables (build them with `python staged4x4.py`), which are
+        only looked for once per process and path.
+    """
+    if(path is None):
+        path = os.environ.get("PYCUBE_4X4_TABLE_PATH", DEFAULT_TABLE_PATH)
+    if(path not in _tables):
+        # a missing or unusable table is kept as None too, so that it is not opened again on every solve
+        try:
+            _tables[path] = StageTables(path)
+        except (OSError, ValueError) as e:
+            logEvent("table_unavailable", logging.WARNING, path=path, error=str(e))
+            _tables[path] = None
+    return _tables[path]
+
+class StagedSolver4x4:
+    """
+    A 4x4 solver that reduces the cube one subgroup at a time, every stage being searched by IDA* with
+    its own table of exact distances (see StageTables):
+    1. The centers in three stages: U and D centers onto U and D, R and L centers onto R and L, then home.
+    2. The edges are paired and the parities fixed, as in solver4x4.
+    3. The reduced cube is solved in the four phases of Thistlethwaite's algorithm.
+
+    The `width` shortest solutions of every center stage and phase are carried on to the next one,
+    and the shortest overall is kept.
+
+    Parameters
+    ----------
+    cube : Cube4x4 object
+        The cube to be solved. This object will not be modified due to the solve.
+    tables : StageTables object, default=None
+        The stage tables. None uses loadStageTables().
+    budget_ms : float, default=None
+        Time budget of the solve in milliseconds. None uses BUDGET_MS.
+    width : int, default=None
+        Number of solutions carried on from every stage. None uses STAGE_WIDTH.
+    listener : function, default=None
+        Called with the name of a stage and its moves (separated by spaces) as soon as the stage is
+        done, before the moves are merged. Lets a caller stream the solve.
+
+    Example
+    -------
+    >>> cb = Cube4x4()
+    >>> cb.doMoves(getScramble4x4(30))
+    >>> solver = StagedSolver4x4(cb)
+    >>> solver.solveCube()
+    >>> solver.getMoves(decorated=True)
+    "For Centers: ...\\nFor Edges: ...\\nFor Parity: ...\\nFor 3x3 Stage: ..."
+    """
+
+    def __init__(self, cube, tables = None, budget_ms = None, width = None, listener = None):
+        self.cube = Cube4x4(faces=cube.getFaces())
+        self.tables = tables if tables is not None else loadStageTables()
+        if(self.tables is None):
+            raise RuntimeError("The 4x4 stage tables are missing, build them with `python staged4x4.py`")
+        self.budget_ms = BUDGET_MS if budget_ms is None else budget_ms
+        self.width = max(1, STAGE_WIDTH if width is None else width)
+        self.listener = listener
+        self.moves = []
+        self.error = None
+        self.__stages = []
+        self.__stats = SolverStats()
+
+    def solveCube(self, optimize = True):
+        """
+        Solves the cube. If a stage fails or the time budget runs out, no moves are kept and
+        `error` tells why.
+        """
+        self.moves = []
+        self.__stages = []
+        self.error = None
+        if(self.cube.isSolved()):
+            return
+        try:
+            self.__solve()
+        except (CubeStateError, RuntimeError, TimeoutError, ValueError) as e:
+            self.error = str(e)
+            self.moves = []
+            self.__stages = []
+        self.__stats.finish()
+        if(optimize and self.moves):
+            self.__stages = [(name, mergeMoves(moves)) for name, moves in self.__stages]
+            self.moves = [move for _, moves in self.__stages for move in moves]
+
+    def __solve(self):
+        deadline = time.perf_counter() + self.budget_ms / 1000.0
+        # solved in the color scheme of the corners, recolored to the standard one like Solver4x4 does
+        scheme = schemeOf(cornerFaces(self.cube.state))
+        start = tuple(STANDARD_SCHEME[scheme.index(sticker)] for sticker in self.cube.state)
+
+        self.__stats.beginPhase("centers")
+        state, moves = self.__searchStages(CENTER_STAGES, start, deadline)
+        self.__addStage("Centers", moves)
+
+        self.__stats.beginPhase("edges")
+        state, moves = pairEdges(state, deadline)
+        self.__addStage("Edges", moves)
+
+        self.__stats.beginPhase("parity")
+        state, moves = fixParity(state)
+        self.__addStage("Parity", moves)
+
+        self.__stats.beginPhase("3x3")
+        _, moves = self.__searchStages(PHASES, cubies(reducedFaces(state)), deadline)
+        self.__addStage("3x3 Stage", moves)
+
+        final = applyPermutation(start, formulaPermutation(" ".join(self.moves)))
+        if(any(final[i] != final[i - i % 16] for i in range(96))):
+            raise RuntimeError("The staged search did not solve the cube")
+
+    def __addStage(self, name, moves):
+        self.__stats.addMoves(len(moves))
+        self.__stages.append((name, moves))
+        self.moves.extend(moves)
+        if(self.listener is not None and moves):
+            self.listener(name, " ".join(moves))
+
+    def __searchStages(self, stages, start, deadline):
+        # a beam over the stages: the `width` shortest ways through them so far are kept
+        candidates = [(start, [])]
+        for stage in stages:
+            following = []
+            for node, moves in candidates:
+                for solution in self.__idaStar(stage, stage.project(node) if isinstance(stage, CenterStage) else node, deadline):
+                    following.append((stage.advance(node, solution), moves + solution))
+            following.sort(key=lambda candidate: len(candidate[1]))
+            candidates = following[:self.width]
+        return candidates[0]
+
+    def __idaStar(self, stage, node, deadline):
+        """
+        Gives up to `width` shortest solutions of a stage. The bound of the search starts at the
+        distance in the table and grows by one move until something is found.
+        """
+        distance = self.tables.distances(stage.name)
+        if(isinstance(stage, CenterStage)):
+            layout = self.tables.layout
+            heuristic = lambda node: distance(stage.index(node, layout))
+        else:
+            classes = self.tables.classes
+            heuristic = lambda node: distance(stage.index(node, classes))
+        successors = followingMoves(stage.moves)
+        solutions = []
+        path = []
+        lookups = [0]
+
+        def search(node, g, bound, previous):
+            h = heuristic(node)
+            lookups[0] += 1
+            if(g + h > bound):
+                return
+            if(h == 0):
+                if(g == bound):
+                    solutions.append(list(path))
+                return
+            if(time.perf_counter() > deadline):
+                raise TimeoutError("The 4x4 search ran out of its budget")
+            for move in successors[previous]:
+                path.append(move)
+                search(stage.apply(node, move), g + 1, bound, move)
+                path.pop()
+                if(len(solutions) >= self.width):
+                    return
+
+        bound = heuristic(node)
+        if(bound == UNREACHED and self.tables.depth(stage.name) < UNREACHED):
+            raise RuntimeError("The " + stage.name + " stage cannot be solved from this state")
+        while(len(solutions) == 0):
+            search(node, 0, bound, None)
+            bound += 1
+        self.__stats.addLookups(lookups[0])
+        return solutions
+
+    def getStats(self):
+        """
+        Gives the per-stage instrumentation of the solve (centers, edges, parity and 3x3).
+        """
+        return self.__stats
+
+    def getMoves(self, decorated = True):
+        """
+        Gives the solution, stage by stage if decorated.
+        """
+        if(len(self.moves) == 0):
+            return "Already solved!" if self.cube.isSolved() else "Could not solve."
+        if(decorated):
+            return "\n".join("For " + name + ": " + " ".join(moves) for name, moves in self.__stages if moves)
+        return " ".join(self.moves)
+
+def _searchMasks(goal, moves):
+    # breadth first search over the 24-bit center masks, from the goal, with every move kept as its mask tables
+    tables = [MASK_MOVES[move] for move in moves]
+    distances = bytearray([255]) * (1 << 24)
+    distances[goal] = 0
+    reached = array("I", [goal])
+    frontier = array("I", [goal])
+    depth = 0
+    while(len(frontier) > 0):
+        depth += 1
+        following = array("I")
+        for mask in frontier:
+            low, middle, high = mask & 255, (mask >> 8) & 255, mask >> 16
+            for lowTable, middleTable, highTable in tables:
+                moved = lowTable[low] | middleTable[middle] | highTable[high]
+                if(distances[moved] == 255):
+                    distances[moved] = depth
+                    following.append(moved)
+        reached.extend(following)
+        frontier = following
+    return distances, reached
+
+def _projectionMoves(size, projection, moves, classes):
+    # move table of a projection of the cubies: [value * len(moves) + move] is the value after the move,
+    # filled from one cubie state per value, found by a breadth first search from solved
+    table = array("I", [0] * (size * len(moves)))
+    seen = {projection(SOLVED_CUBIES, classes): SOLVED_CUBIES}
+    frontier = [SOLVED_CUBIES]
+    while(len(frontier) > 0):
+        following = []
+        for cubie in frontier:
+            value = projection(cubie, classes)
+            for m, move in enumerate(moves):
+                moved = applyCubieMove(cubie, move)
+                movedValue = projection(moved, classes)
+                table[value * len(moves) + m] = movedValue
+                if(movedValue not in seen):
+                    seen[movedValue] = moved
+                    following.append(moved)
+        frontier = following
+    return table
+
+def _searchPhase(phase, classes):
+    # breadth first search over the coordinate of a phase, from solved, with the move tables of its two projections
+    (firstSize, first), (secondSize, second) = phase.projections if len(phase.projections) == 2 else [(1, lambda cubie, classes: 0)] + phase.projections
+    count = len(phase.moves)
+    firstMoves = _projectionMoves(firstSize, first, phase.moves, classes)
+    secondMoves = _projectionMoves(secondSize, second, phase.moves, classes)
+    goal = phase.index(SOLVED_CUBIES, classes)
+    distances = bytearray([255]) * (firstSize * secondSize)
+    distances[goal] = 0
+    frontier = array("I", [goal])
+    depth = 0
+    while(len(frontier) > 0):
+        depth += 1
+        following = array("I")
+        for index in frontier:
+            a, b = divmod(index, secondSize)
+            a *= count
+            b *= count
+            for m in range(count):
+                moved = firstMoves[a + m] * secondSize + secondMoves[b + m]
+                if(distances[moved] == 255):
+                    distances[moved] = depth
+                    following.append(moved)
+        frontier = following
+    return distances
+
+def _pack(entries, distances):
+    # packs (index, distance) pairs 4 bits per entry, the others UNREACHED
+    packed = bytearray([UNREACHED * 17]) * ((entries + 1) // 2)
+    depth = 0
+    for index, distance in distances:
+        shift = (index & 1) << 2
+        packed[index >> 1] = (packed[index >> 1] & ~(15 << shift)) | (distance << shift)
+        depth = max(depth, distance)
+    if(depth > UNREACHED):
+        raise RuntimeError("A stage needs more than " + str(UNREACHED) + " moves")
+    return packed, depth
+
+def buildStageTables(path = DEFAULT_TABLE_PATH, layout = "ranked", log = print):
+    """
+    Builds the stage tables by a breadth first search of every stage from its goal and writes them to a file.
+
+    Parameters
+    ----------
+    path : string, default=DEFAULT_TABLE_PATH
+        Where to write the tables.
+    layout : string, default="ranked"
+        Layout of the center tables: "ranked" (about 2 MB in all) or "direct" (about 18 MB, lookups skip the ranking).
+    log : function, default=print
+        Gets the progress messages.
+    """
+    sections = []
+    for stage in CENTER_STAGES:
+        started = time.monotonic()
+        distances, reached = _searchMasks(stage.goal, stage.moves)
+        packed, depth = _pack(stage.sizes[layout], ((stage.index(mask, layout), distances[mask]) for mask in reached))
+        sections.append((stage.name, DISTANCES, depth, packed, stage.sizes[layout]))
+        log(stage.name + ": " + str(len(reached)) + " states, up to " + str(depth) + " moves, " + str(round(time.monotonic() - started, 1)) + " s")
+    classes = buildCornerClasses()
+    sections.append(("cosets", VALUES, 0, classes[0].tobytes(), len(classes[0])))
+    sections.append(("members", VALUES, 0, classes[1].tobytes(), len(classes[1])))
+    for phase in PHASES:
+        started = time.monotonic()
+        distances = _searchPhase(phase, classes)
+        packed, depth = _pack(phase.size(), ((index, distance) for index, distance in enumerate(distances) if distance != 255))
+        sections.append((phase.name, DISTANCES, depth, packed, phase.size()))
+        log(phase.name + ": " + str(phase.size() - distances.count(255)) + " states, up to " + str(depth) + " moves, " + str(round(time.monotonic() - started, 1)) + " s")
+    directory = bytearray()
+    payload = bytearray()
+    offset = HEADER.size + SECTION.size * len(sections)
+    for name, kind, depth, data, entries in sections:
+        directory += SECTION.pack(name.encode(), kind, depth, offset + len(payload), entries)
+        payload += data
+    with open(path + ".tmp", "wb") as file:
+        file.write(HEADER.pack(MAGIC, FORMAT_VERSION, LAYOUTS.index(layout), len(sections), hashlib.sha256(directory + payload).digest()))
+        file.write(directory)
+        file.write(payload)
+    os.replace(path + ".tmp", path)
+    # a process that found no table before now maps the new one
+    _tables.pop(path, None)
+    log("wrote " + path)
+
+def benchmark(count = 100, seed = 1, length = 40, tables = None, log = print):
+    """
+    Solves seeded getScramble4x4() scrambles and reports the solution lengths and solve times.
+
+    Returns
+    -------
+    results : list of dicts
+        For every scramble, whether it was solved, the number of moves (and of every stage before
+        merging) and the time in seconds.
+    """
+    random.seed(seed)
+    results = []
+    for _ in range(count):
+        cube = Cube4x4()
+        cube.doMoves(getScramble4x4(length))
+        solver = StagedSolver4x4(cube, tables=tables)
+        started = time.perf_counter()
+        solver.solveCube()
+        seconds = time.perf_counter() - started
+        check = Cube4x4(faces=cube.getFaces())
+        check.applyMoves(solver.moves)
+        stages = {name: phase["moves"] for name, phase in solver.getStats().phases.items()}
+        results.append({"solved": check.isSolved(), "moves": len(solver.moves), "stages": stages, "seconds": seconds})
+    solved = [result for result in results if result["solved"]]
+    times = sorted(result["seconds"] for result in results)
+    log(str(len(solved)) + "/" + str(count) + " solved")
+    if(len(solved) > 0):
+        lengths = [result["moves"] for result in solved]
+        log("moves: mean " + str(round(sum(lengths) / len(lengths), 1)) + ", max " + str(max(lengths)))
+        for name in solved[0]["stages"]:
+            log("  " + name + ": mean " + str(round(sum(result["stages"].get(name, 0) for result in solved) / len(solved), 1)))
+    log("time: p50 " + str(round(times[len(times) // 2] * 1000)) + " ms, p99 " + str(round(times[min(len(times) - 1, int(len(times) * 0.99))] * 1000))
+        + " ms, max " + str(round(times[-1] * 1000)) + " ms")
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Builds the stage tables of the staged 4x4 solver, or benchmarks it.")
+    parser.add_argument("--output", default=DEFAULT_TABLE_PATH, help="path of the tables")
+    parser.add_argument("--layout", choices=LAYOUTS, default="ranked", help="layout of the center tables: small, or bigger and faster")
+    parser.add_argument("--benchmark", type=int, metavar="COUNT", help="solve COUNT seeded scrambles with the tables at --output instead")
+    parser.add_argument("--seed", type=int, default=1, help="seed of the benchmark scrambles")
+    parser.add_argument("--length", type=int, default=40, help="length of the benchmark scrambles")
+    args = parser.parse_args()
+    if(args.benchmark):
+        tables = loadStageTables(args.output)
+        if(tables is None):
+            parser.error("no stage tables at " + args.output + ", build them first")
+        benchmark(args.benchmark, args.seed, args.length, tables)
+    else:
+        buildStageTables(args.output, args.layout)
@@ -0,0 +1,80 @@
+from validator import SIZES, CubeStateError
+
+# shapes a cube state can take on the wire: the faces matrix array, or a string of its stickers
+FORMATS = ("faces", "string")
+# fields of the API payloads that hold a cube state, and those that hold a list of objects with one
+STATE_FIELDS = ("cube_state", "solved_state", "initial_state")
+LIST_FIELDS = ("animation_states",)
+
+def encodeState(cube_state):
+    """
+    Gives the string of a cube faces matrix array: the stickers face by face (F, R, B, L, D, U),
+    row by row, e.g. 54 letters for a 3x3.
+
+    Example
+    -------
+    >>> encodeState(Cube2x2().getFaces())
+    'GGGGOOOOBBBBRRRRWWWWYYYY'
+    """
+    return "".join(sticker for face in cube_state for row in face for sticker in row)
+
+def decodeState(text, cube_type = None):
+    """
+    Gives the cube faces matrix array of a string from encodeState().
+
+    Parameters
+    ----------
+    text : string
+        The stickers, 24, 54 or 96 of them.
+    cube_type : string, default=None
+        '2x2', '3x3' or '4x4', the size the string must have. None takes the size from the string.
+
+    Raises
+    ------
+    CubeStateError
+        If the string does not have the size of a cube (of the cube type), with the INVALID_SHAPE code.
+    """
+    n = SIZES.get(cube_type, 3) if cube_type is not None else {6 * n * n: n for n in SIZES.values()}.get(len(text))
+    if(n is None or len(text) != 6 * n * n):
+        raise CubeStateError("INVALID_SHAPE", "A " + (cube_type or "cube") + " state string must have "
+                             + (str(6 * n * n) if n else "24, 54 or 96") + " stickers, got " + str(len(text)))
+    return [[list(text[(side * n + row) * n: (side * n + row + 1) * n]) for row in range(n)] for side in range(6)]
+
+def readState(cube_state, cube_type = None):
+    """
+    Gives the faces matrix array of a cube state received in either format, as is if it is one already.
+    """
+    if(isinstance(cube_state, str)):
+        return decodeState(cube_state, cube_type)
+    return cube_state
+
+def checkFormat(state_format):
+    """
+    Gives the format asked for, "faces" if None.
+
+    Raises
+    ------
+    ValueError
+        If it is not one of FORMATS.
+    """
+    if(state_format is None):
+        return "faces"
+    if(state_format not in FORMATS):
+        raise ValueError("Unknown format '" + str(state_format) + "', expected one of " + ", ".join(FORMATS))
+    return state_format
+
+def writeStates(payload, state_format):
+    """
+    Gives a payload with its cube states (STATE_FIELDS, also in the objects of LIST_FIELDS) in a format.
+    The payload is not modified, a copy is made if anything changes.
+    """
+    if(state_format == "faces"):
+        return payload
+    payload = dict(payload)
+    for field in STATE_FIELDS:
+        if(isinstance(payload.get(field), list)):
+            payload[field] = encodeState(payload[field])
+    for field in LIST_FIELDS:
+        if(isinstance(payload.get(field), list)):
+            payload[field] = [writeStates(item, state_format) for item in payload[field]]
+    return payload
@@ -0,0 +1,80 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+
+# PYCUBE_LOG_LEVEL=WARNING keeps the failures and drops the line of every request
+LEVEL = logging.getLevelName(os.environ.get("PYCUBE_LOG_LEVEL", "INFO").upper())
+
+_logger = logging.getLogger("pycube")
+_logger.propagate = False
+_logger.setLevel(LEVEL if isinstance(LEVEL, int) else logging.INFO)
+_lock = threading.Lock()
+_listener = None
+_listenerPid = None
+
+class JsonFormatter(logging.Formatter):
+    """
+    Formats a record as a single JSON line: its time, level and event, and the fields given to logEvent().
+    """
+
+    def format(self, record):
+        entry = {"time": round(record.created, 3), "level": record.levelname, "event": record.getMessage()}
+        entry.update(getattr(record, "fields", {}))
+        return json.dumps(entry, default=str)
+
+def _start():
+    # the request threads only put records on a queue, a thread of the process writes them out,
+    # so a slow stdout never holds up a response. A listener does not survive a fork (e.g. from the
+    # gunicorn master), so every process starts its own on its first event.
+    global _listener, _listenerPid
+    with _lock:
+        if(_listenerPid == os.getpid()):
+            return
+        records = queue.SimpleQueue()
+        handler = logging.StreamHandler(sys.stdout)
+        handler.setFormatter(JsonFormatter())
+        _logger.handlers = [logging.handlers.QueueHandler(records)]
+        _listener = logging.handlers.QueueListener(records, handler)
+        _listener.start()
+        _listenerPid = os.getpid()
+
+def logEvent(event, level = logging.INFO, **fields):
+    """
+    Logs an event as a JSON line on stdout, without waiting for it to be written.
+
+    Parameters
+    ----------
+    event : string
+        What happened, e.g. "request".
+    level : int, default=logging.INFO
+        The level of the event, events below PYCUBE_LOG_LEVEL are dropped.
+    **fields
+        Anything else to log with the event, e.g. route="/api/solve".
+
+    Example
+    -------
+    >>> logEvent("request_failed", logging.ERROR, route="/api/solve", error="No cube state provided")
+    {"time": 1792368000.123, "level": "ERROR", "event": "request_failed", "route": "/api/solve", "error": "No cube state provided"}
+    """
+    if(not _logger.isEnabledFor(level)):
+        return
+    if(_listenerPid != os.getpid()):
+        _start()
+    _logger.log(level, event, extra={"fields": fields})
+
+def flush():
+    """
+    Writes out the events logged so far and stops the writer thread, e.g. before the process exits.
+    """
+    global _listenerPid
+    with _lock:
+        if(_listener is not None and _listenerPid == os.getpid()):
+            _listener.stop()
+            _listenerPid = None
+
+atexit.register(flush)
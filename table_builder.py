@@ -0,0 +1,438 @@
+import argparse
+import contextlib
+import copy
+import io
+import itertools
+from cube import Cube
+from helper import countMoves
+from solver import Solver
+from solver_tables import DEFAULT_PATH, defaultTables, indexF2L, readTables, writeTables
+from validator import SIZES, PIECES, buildPieces, buildSchemes
+from color_neutral import schemeRotations
+from coords2x2 import buildMoveTables
+from fast_cube4x4 import buildPermutations as buildPermutations4x4
+from fast_cube import SOLVED, applyFormula, buildPermutations, formulaPermutation, fromFaces, getSticker, invertFormula, toFaces
+
+# entries of the OLL and PLL tables that are settings rather than cases
+CONFIG_KEYS = ("target", "shufflemap")
+AUF = ["", "U", "U2", "U'"]
+# moves of the F2L search, <R, U> is enough for most cases but cannot flip an edge, so the cases
+# it does not solve are searched with F turns as well, up to F2L_FLIP_DEPTH moves
+F2L_MOVES = ["R", "R'", "R2", "U", "U'", "U2"]
+F2L_FLIP_MOVES = F2L_MOVES + ["F", "F'", "F2"]
+F2L_FLIP_DEPTH = 8
+# the cube rotations the last layer algorithms are also tried from
+CONJUGATES = [("", ""), ("y", "y'"), ("y2", "y2"), ("y'", "y")]
+
+LL_CORNERS = [corner for corner in PIECES[3][0] if corner[0][0] == 5]
+LL_EDGES = [edge for edge in PIECES[3][1] if edge[0][0] == 5]
+# the front right F2L pair, which every F2L case is set up on
+FR_CORNER = [corner for corner in PIECES[3][0] if sorted(side for side, _, _ in corner) == [0, 1, 4]][0]
+FR_EDGE = [edge for edge in PIECES[3][1] if sorted(side for side, _, _ in edge) == [0, 1]][0]
+
+def _index(position):
+    side, row, col = position
+    return side * 9 + row * 3 + col
+
+def _place(state, slots, pieces, twists):
+    # puts the solved piece pieces[i] in slots[i], with its stickers shifted twists[i] times
+    stickers = list(state)
+    for slot, piece, twist in zip(slots, pieces, twists):
+        colors = [SOLVED[_index(position)] for position in piece]
+        colors = colors[twist:] + colors[:twist]
+        for position, color in zip(slot, colors):
+            stickers[_index(position)] = color
+    return tuple(stickers)
+
+def _parity(permutation):
+    return sum(1 for i, j in itertools.combinations(range(len(permutation)), 2) if permutation[i] > permutation[j]) % 2
+
+def ollKey(state, target):
+    """
+    Gives the OLL table key of a state, the way Solver recognizes it from the standard perspective.
+    """
+    shash = "".join("y" if getSticker(state, *position) == "Y" else "x" for position in target)
+    return shash[0: 3] + "-" + shash[3: 8] + "-" + shash[8: 13] + "-" + shash[13: 18] + "-" + shash[18: 21]
+
+def pllKey(state, target):
+    """
+    Gives the PLL table key of a state, the way Solver recognizes it from the standard perspective.
+    """
+    return "".join(getSticker(state, *position) for position in target)
+
+def ollCases():
+    """
+    Gives every orientation of the last layer (F2L solved), as a list of state tuples.
+    """
+    cases = []
+    for twists in itertools.product(range(3), repeat=3):
+        for flips in itertools.product(range(2), repeat=3):
+            state = _place(SOLVED, LL_CORNERS, LL_CORNERS, list(twists) + [-sum(twists) % 3])
+            cases.append(_place(state, LL_EDGES, LL_EDGES, list(flips) + [sum(flips) % 2]))
+    return cases
+
+def pllCases():
+    """
+    Gives every permutation of the oriented last layer (F2L solved), as a list of state tuples.
+    """
+    cases = []
+    for corners in itertools.permutations(range(4)):
+        for edges in itertools.permutations(range(4)):
+            if(_parity(corners) == _parity(edges)):
+                state = _place(SOLVED, LL_CORNERS, [LL_CORNERS[i] for i in corners], [0] * 4)
+                cases.append(_place(state, LL_EDGES, [LL_EDGES[i] for i in edges], [0] * 4))
+    return cases
+
+def f2lCases():
+    """
+    Gives every placement of the front right pair in the U layer and its own slot, the rest of F2L
+    solved, as a list of state tuples.
+    """
+    cases = []
+    corners = LL_CORNERS + [FR_CORNER]
+    edges = LL_EDGES + [FR_EDGE]
+    for cornerSlot, twist, edgeSlot, flip in itertools.product(range(5), range(3), range(5), range(2)):
+        cornerPieces = list(corners)
+        cornerPieces[cornerSlot], cornerPieces[4] = FR_CORNER, corners[cornerSlot]
+        edgePieces = list(edges)
+        edgePieces[edgeSlot], edgePieces[4] = FR_EDGE, edges[edgeSlot]
+        # the twist (or flip) of the pair is made up for by the piece it displaced, or by a last
+        # layer piece if it stays in its slot, and a single swap by swapping two last layer edges
+        twists = [0] * 5
+        twists[cornerSlot] = twist
+        twists[4 if cornerSlot != 4 else 0] = -twist % 3
+        flips = [0] * 5
+        flips[edgeSlot] = flip
+        flips[4 if edgeSlot != 4 else 0] = flip
+        if((cornerSlot != 4) != (edgeSlot != 4)):
+            others = [slot for slot in range(4) if slot != edgeSlot][:2]
+            edgePieces[others[0]], edgePieces[others[1]] = edgePieces[others[1]], edgePieces[others[0]]
+        state = _place(SOLVED, corners, cornerPieces, twists)
+        cases.append(_place(state, edges, edgePieces, flips))
+    return cases
+
+class _RecognitionProbe(Solver):
+    # a Solver that stops at its first F2L table lookup and keeps what it looked up, this reuses
+    # the recognition of the solver rather than copying it
+    def __init__(self, cube, tables):
+        super().__init__(cube, tables)
+        self.lookups = []
+
+    def _Solver__getf2lMove(self, section, attrib_corner, attrib_edge, attrib_dist_sign=None, attrib_dist=None):
+        self.lookups.append(([section, attrib_corner, attrib_edge] + ([attrib_dist_sign, attrib_dist] if section == "1a" else []), self.cube.getFaces()))
+        # the lookup gives nothing, the solver then turns U to line the case up and looks it up again
+        if(len(self.lookups) == 2):
+            raise StopIteration
+        return ""
+
+def recognizeF2L(tables):
+    """
+    Finds the F2L case every placement of f2lCases() is recognized as.
+
+    Returns
+    -------
+    cases : dict
+        Maps the case (the F2L table entry without its algorithm, as a tuple) to a pair of states: one
+        placement of the case and the same placement after the U turn the solver lines it up with.
+    """
+    cases = {}
+    for case in f2lCases():
+        probe = _RecognitionProbe(Cube(faces=toFaces(case)), tables)
+        with contextlib.redirect_stdout(io.StringIO()):
+            probe.solveCube(optimize=True)
+        if(len(probe.lookups) == 2 and tuple(probe.lookups[0][0]) not in cases):
+            cases[tuple(probe.lookups[0][0])] = (case, fromFaces(probe.lookups[1][1]))
+    return cases
+
+def _uniform(state, positions):
+    # checks that the stickers of every face at the given (row, col) positions match the face center
+    return all(state[side * 9 + row * 3 + col] == state[side * 9 + 4] for side, row, col in positions)
+
+F2L_POSITIONS = [(side, row, col) for side in range(4) for row in (1, 2) for col in range(3)] + [(4, row, col) for row in range(3) for col in range(3)]
+ALL_POSITIONS = [(side, row, col) for side in range(6) for row in range(3) for col in range(3)]
+
+def f2lSolved(state):
+    return _uniform(state, F2L_POSITIONS)
+
+def ollSolved(state):
+    # the algorithms may rotate the cube about the U/D axis, so the centers decide which face is which
+    return f2lSolved(state) and _uniform(state, [(5, row, col) for row in range(3) for col in range(3)])
+
+def aufLength(state):
+    """
+    Gives the number of moves (0 or 1) of the U turn that solves a state, or -1 if no U turn solves it.
+    """
+    for auf in AUF:
+        if(_uniform(applyFormula(state, auf), ALL_POSITIONS)):
+            return 0 if auf == "" else 1
+    return -1
+
+def seedAlgorithms(tables, extra = ()):
+    """
+    Gives the algorithms the last layer search picks from: the ones of the tables, their inverses and
+    any extra ones, every one of them also performed from the other sides and preceded by a U turn.
+    """
+    algorithms = []
+    for name in ("oll", "pll"):
+        for key, form in tables[name].items():
+            if(key not in CONFIG_KEYS):
+                algorithms += [form, invertFormula(form)]
+    algorithms += list(extra)
+    seeds = []
+    for form in algorithms:
+        for before, after in CONJUGATES:
+            for auf in AUF:
+                if(auf + before + form + after not in seeds):
+                    seeds.append(auf + before + form + after)
+    return seeds
+
+def _shortest(candidates):
+    # fewest moves first, then the shortest and lexicographically smallest text so builds are reproducible
+    return min(candidates, key=lambda form: (countMoves(form), len(form), form))
+
+def searchLastLayer(cases, key, seeds, cost, confirm):
+    """
+    Finds the shortest seed algorithm for every last layer case, checking each candidate by replay.
+
+    Parameters
+    ----------
+    cases : list of state tuples
+        The cases to solve.
+    key : function
+        Gives the table key of a case.
+    seeds : list of strings
+        The candidate algorithms.
+    cost : function
+        Gives the number of moves the solver still needs after an algorithm, -1 if it does not solve the case.
+    confirm : function
+        Checks a (key, algorithm, case) entry with the Solver, which maps the moves to its perspective first.
+
+    Returns
+    -------
+    table : dict
+        Maps the key of every case that some seed solves to its shortest algorithm. Cases that need
+        no algorithm are left out.
+    missing : list of strings
+        Keys of the cases no seed solves.
+    """
+    table = {}
+    missing = []
+    for case in cases:
+        if(cost(case) >= 0):
+            continue
+        found = []
+        for form in seeds:
+            extra = cost(applyFormula(case, form))
+            if(extra >= 0):
+                found.append((countMoves(form) + extra, len(form), form))
+        for _, _, form in sorted(found):
+            if(confirm(key(case), form, case)):
+                table[key(case)] = form
+                break
+        else:
+            missing.append(key(case))
+    return table, missing
+
+def searchF2L(case, limit, moves = F2L_MOVES):
+    """
+    Searches the shortest formula of the given moves that solves the F2L of a case, by iterative deepening.
+
+    Returns
+    -------
+    form : string or None
+        The formula, None if there is none of at most `limit` moves.
+    """
+    permutations = {move: formulaPermutation(move) for move in moves}
+
+    def search(state, depth, last, path):
+        if(depth == 0):
+            return "".join(path) if f2lSolved(state) else None
+        for move in moves:
+            if(move[0] == last):
+                continue
+            permutation = permutations[move]
+            found = search(tuple(state[i] for i in permutation), depth - 1, move[0], path + [move])
+            if(found is not None):
+                return found
+        return None
+
+    for depth in range(limit + 1):
+        found = search(case, depth, "", [])
+        if(found is not None):
+            return found
+    return None
+
+def replay(tables, case):
+    """
+    Solves a case with the real Solver and the given tables, in both the optimized and the literal mode.
+
+    Returns
+    -------
+    ok : bool
+        True if both solves end solved with a single F2L step.
+    """
+    for optimize in (True, False):
+        solver = Solver(Cube(faces=toFaces(case)), tables)
+        # a broken entry makes the solver print its error and possibly recurse until it gives up
+        with contextlib.redirect_stdout(io.StringIO()):
+            solver.solveCube(optimize=optimize)
+        if(not solver.isSolved() or solver.getStats().phases["f2l"]["recursions"] > 1):
+            return False
+    return True
+
+def _withEntries(tables, name, entries):
+    # the tables with one of them cut down to the given cases (and its settings)
+    trimmed = dict(tables)
+    if(name == "f2l"):
+        trimmed["f2l"] = dict(tables["f2l"])
+        trimmed["f2l"]["f2ldb"] = entries
+        trimmed["f2l"]["index"] = indexF2L(entries)
+    else:
+        trimmed[name] = {key: value for key, value in tables[name].items() if key in CONFIG_KEYS}
+        trimmed[name].update(entries)
+    return trimmed
+
+def _pllCase(key, cases, shufflemap, target):
+    # the case a PLL key stands for, the solver also matches keys with the side colors relabelled
+    for case in cases:
+        for shuffle in shufflemap:
+            if("".join(shuffle[color] for color in pllKey(case, target)) == key):
+                return case
+    return None
+
+def verifyTables(tables):
+    """
+    Replays every entry of the tables through the Solver, on its own, on a case it stands for.
+
+    Returns
+    -------
+    failures : list of strings
+        One line per entry that is not recognized or does not solve its case.
+    """
+    failures = []
+    ollTarget = tables["oll"]["target"]
+    ollByKey = {ollKey(case, ollTarget): case for case in ollCases()}
+    for key, form in tables["oll"].items():
+        if(key in CONFIG_KEYS):
+            continue
+        if(key not in ollByKey or not replay(_withEntries(tables, "oll", {key: form}), ollByKey[key])):
+            failures.append("oll " + key + ": " + form)
+    pllTarget = tables["pll"]["target"]
+    cases = pllCases()
+    for key, form in tables["pll"].items():
+        if(key in CONFIG_KEYS):
+            continue
+        case = _pllCase(key, cases, tables["pll"]["shufflemap"], pllTarget)
+        if(case is None or not replay(_withEntries(tables, "pll", {key: form}), case)):
+            failures.append("pll " + key + ": " + form)
+    f2lByKey = recognizeF2L(tables)
+    for entry in tables["f2l"]["f2ldb"]:
+        if(tuple(entry[:-1]) not in f2lByKey or not replay(_withEntries(tables, "f2l", [entry]), f2lByKey[tuple(entry[:-1])][0])):
+            failures.append("f2l " + " ".join(str(value) for value in entry))
+    return failures
+
+def buildTables(base = None, extra = (), f2lDepth = 9, log = print):
+    """
+    Generates the F2L, OLL and PLL tables, the other tables of the base are kept as they are.
+
+    The last layer tables get an entry for every case, keyed from the standard perspective so the
+    solver finds it with its first lookup, holding the shortest seed algorithm that solves it.
+    The F2L table gets an entry for every case the solver recognizes when the front right pair is in
+    the U layer or its slot, holding the shortest of the base table algorithm and the search result
+    that the Solver confirms.
+
+    Parameters
+    ----------
+    base : dict, default=None
+        Tables to start from, the ones of solver_data if not given.
+    extra : list of strings, default=()
+        More last layer algorithms to pick from.
+    f2lDepth : int, default=9
+        Longest F2L formula searched for.
+    log : function, default=print
+        Gets the progress messages.
+
+    Returns
+    -------
+    tables : dict
+        The tables by name, in the format of solver_data.
+    """
+    base = defaultTables() if base is None else base
+    seeds = seedAlgorithms(base, extra)
+    oll, missing = searchLastLayer(ollCases(), lambda case: ollKey(case, base["oll"]["target"]), seeds,
+                                   lambda state: 0 if ollSolved(state) else -1,
+                                   lambda key, form, case: replay(_withEntries(base, "oll", {key: form}), case))
+    log("oll: " + str(len(oll)) + " cases, " + str(len(missing)) + " without an algorithm")
+    pll, missing = searchLastLayer(pllCases(), lambda case: pllKey(case, base["pll"]["target"]), seeds, aufLength,
+                                   lambda key, form, case: replay(_withEntries(base, "pll", {key: form}), case))
+    log("pll: " + str(len(pll)) + " cases, " + str(len(missing)) + " without an algorithm")
+    tables = dict(base)
+    tables["oll"] = dict(oll, target=base["oll"]["target"])
+    tables["pll"] = dict(pll, target=base["pll"]["target"], shufflemap=base["pll"]["shufflemap"])
+    tables["f2l"] = copy.deepcopy(base["f2l"])
+    known = {tuple(entry[:-1]): entry[-1] for entry in base["f2l"]["f2ldb"]}
+    f2ldb = []
+    missing = 0
+    for key, (case, lined) in recognizeF2L(base).items():
+        candidates = [known[key]] if key in known else []
+        found = searchF2L(lined, f2lDepth)
+        if(found is not None):
+            candidates.append(found)
+        candidates = [form for form in candidates if replay(_withEntries(tables, "f2l", [list(key) + [form]]), case)]
+        if(len(candidates) == 0):
+            found = searchF2L(lined, min(f2lDepth, F2L_FLIP_DEPTH), F2L_FLIP_MOVES)
+            if(found is not None and replay(_withEntries(tables, "f2l", [list(key) + [found]]), case)):
+                candidates.append(found)
+        if(len(candidates) == 0):
+            missing += 1
+        else:
+            f2ldb.append(list(key) + [_shortest(candidates)])
+    # the solver looks the cases up in order, the order of the base table is kept for the known ones
+    order = list(known)
+    f2ldb.sort(key=lambda entry: (order.index(tuple(entry[:-1])) if tuple(entry[:-1]) in known else len(order), str(entry)))
+    tables["f2l"]["f2ldb"] = f2ldb
+    tables["f2l"]["index"] = indexF2L(f2ldb)
+    log("f2l: " + str(len(f2ldb)) + " cases, " + str(missing) + " without an algorithm")
+    return tables
+
+def derivedTables():
+    """
+    Gives the tables other modules build at import when the artifact does not have them.
+    """
+    return {
+        "permutations": buildPermutations(),
+        "pieces": {n: buildPieces(n) for n in SIZES.values()},
+        "schemes": buildSchemes(),
+        "recolorings": schemeRotations(),
+        "moves2x2": dict(zip(("permutation", "orientation"), (table.tobytes() for table in buildMoveTables()))),
+        "permutations4x4": buildPermutations4x4()
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Generates, verifies and compiles the solver tables artifact.")
+    parser.add_argument("--output", default=DEFAULT_PATH, help="path of the tables artifact")
+    parser.add_argument("--seeds", help="file with more last layer algorithms, one per line")
+    parser.add_argument("--f2l-depth", type=int, default=9, help="longest F2L formula searched for")
+    parser.add_argument("--verify", metavar="PATH", help="only verify an existing artifact")
+    args = parser.parse_args()
+    if(args.verify):
+        tables = readTables(args.verify)
+    else:
+        extra = []
+        if(args.seeds):
+            with open(args.seeds) as file:
+                extra = ["".join(line.split()) for line in file if line.strip() and not line.startswith("#")]
+        tables = buildTables(extra=extra, f2lDepth=args.f2l_depth)
+    failures = verifyTables(tables)
+    for failure in failures:
+        print("FAILED " + failure)
+    if(len(failures) > 0):
+        raise SystemExit(1)
+    print("verified " + str(sum(len(tables[name]) for name in ("oll", "pll")) - 3 + len(tables["f2l"]["f2ldb"])) + " entries")
+    if(not args.verify):
+        tables.update(derivedTables())
+        writeTables(tables, args.output)
+        print("wrote " + args.output)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+import threading
+import time
+import app
+from solve_service import newCube
+from solver_pool import DeadlineExceeded
+
+SOLVE_SECONDS = 1.0
+
+def scrambled(formula):
+    cube = newCube("3x3")
+    cube.doMoves(formula)
+    return cube.getFaces()
+
+def slowSolves(monkeypatch):
+    # every solve takes SOLVE_SECONDS, and is given up at the deadline of its request like runInPool() does
+    solve = app.solve_and_keep
+    def slow(key, cube_type, cube_state, engine, optimize, budget_ms, deadline, abandoned = None):
+        if(deadline < time.monotonic() + SOLVE_SECONDS):
+            time.sleep(max(0.0, deadline - time.monotonic()))
+            raise DeadlineExceeded("Deadline exceeded")
+        time.sleep(SOLVE_SECONDS)
+        return solve(key, cube_type, cube_state, engine, optimize, budget_ms, deadline, abandoned)
+    monkeypatch.setattr(app, "solve_and_keep", slow)
+
+def postTogether(formula, deadlines):
+    # the same cube from every request, one after the other while the first one is solving
+    body = {"cube_type": "3x3", "cube_state": scrambled(formula)}
+    responses = [None] * len(deadlines)
+    def post(index):
+        started = time.monotonic()
+        response = app.app.test_client().post("/api/solve", json=dict(body, deadline_ms=deadlines[index]))
+        responses[index] = (response.status_code, response.get_json(), time.monotonic() - started)
+    threads = [threading.Thread(target=post, args=(index,)) for index in range(len(deadlines))]
+    for thread in threads:
+        thread.start()
+        time.sleep(0.1)
+    for thread in threads:
+        thread.join()
+    return responses
+
+def test_a_joining_request_solves_on_its_own_when_the_first_one_runs_out_of_time(monkeypatch):
+    slowSolves(monkeypatch)
+    first, second = postTogether("R U2 F' L D B2 R' U F2", [300, 30000])
+    assert first[0] == 504 and first[1]["error_code"] == "DEADLINE_EXCEEDED"
+    assert second[0] == 200 and second[1]["success"]
+    assert not second[1]["coalesced"]
+
+def test_a_joining_request_waits_no_longer_than_its_deadline(monkeypatch):
+    slowSolves(monkeypatch)
+    first, second = postTogether("L' B U2 R D' F2 L U' B2", [30000, 300])
+    assert first[0] == 200 and first[1]["success"]
+    assert second[0] == 504 and second[1]["error_code"] == "DEADLINE_EXCEEDED"
+    assert second[2] < SOLVE_SECONDS
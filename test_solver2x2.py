@@ -0,0 +1,30 @@
+import random
+from solve_service import newCube, solveState
+
+SCRAMBLE_MOVES = ["R", "R'", "R2", "U", "U'", "U2", "F", "F'", "F2", "L", "D'", "B2", "x", "y'"]
+
+def isSolved(faces):
+    return all(len({sticker for row in face for sticker in row}) == 1 for face in faces)
+
+def test_ortega_solutions_solve_random_scrambles():
+    rng = random.Random(2026)
+    for _ in range(30):
+        cube = newCube("2x2")
+        cube.doMoves(" ".join(rng.choice(SCRAMBLE_MOVES) for _ in range(15)))
+        payload = solveState("2x2", cube.getFaces(), "ortega")
+        assert payload["success"]
+        assert isSolved(payload["solved_state"])
+        # replayed on the scramble, as a client would
+        replay = newCube("2x2", cube.getFaces())
+        if "Already solved" not in payload["solution_plain"]:
+            replay.doMoves(payload["solution_plain"])
+        assert isSolved(replay.getFaces())
+
+def test_ortega_reports_a_failed_solve():
+    cube = newCube("2x2")
+    faces = cube.getFaces()
+    # twist a corner in place, which no sequence of moves can solve
+    faces[0][0][1], faces[1][0][0], faces[5][1][1] = faces[5][1][1], faces[0][0][1], faces[1][0][0]
+    payload = solveState("2x2", faces, "ortega")
+    assert not payload["success"]
+    assert payload["solution_plain"] == "Could not solve."
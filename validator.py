@@ -0,0 +1,245 @@
+from functools import lru_cache
+from cube import Cube
+from solver_tables import loadTables
+
+COLORS = ["G", "O", "B", "R", "W", "Y"]
+# face normals in the (x, y, z) frame: x points right, y points up and z points out of the front face
+NORMALS = [(0, 0, 1), (1, 0, 0), (0, 0, -1), (-1, 0, 0), (0, -1, 0), (0, 1, 0)]
+SIZES = {"2x2": 2, "3x3": 3, "4x4": 4}
+
+class CubeStateError(ValueError):
+    """
+    Raised when a cube state is impossible. `code` tells what is wrong with it:
+
+    - INVALID_SHAPE: the faces matrix array does not have the size of the cube type.
+    - INVALID_COLOR: a sticker is not one of G, O, B, R, W, Y.
+    - STICKER_COUNT: a color does not appear exactly N*N times.
+    - INVALID_CENTERS: the 3x3 centers do not form the color scheme.
+    - INVALID_CORNER / INVALID_EDGE / INVALID_WING: a piece has a color combination that does not exist.
+    - DUPLICATE_CORNER / DUPLICATE_EDGE / DUPLICATE_WING: a piece appears twice (so another one is missing).
+    - TWISTED_CORNER: the corner orientations do not add up.
+    - FLIPPED_EDGE: the edge orientations do not add up.
+    - PARITY: the corner and edge permutations have different parities.
+    """
+
+    def __init__(self, code, message):
+        super().__init__(message)
+        self.code = code
+
+def stickerPosition(n, side, row, col):
+    """
+    Gives the position of a sticker of an NxN cube, in a frame where the cube spans -n..n
+    and the stickers are 2 apart.
+    """
+    u = 2 * col - (n - 1)
+    v = 2 * row - (n - 1)
+    return [(u, -v, n), (n, -v, -u), (-u, -v, -n), (-n, -v, u), (u, -n, -v), (u, n, v)][side]
+
+def _cross(a, b):
+    return (a[1] * b[2] - a[2] * b[1], a[2] * b[0] - a[0] * b[2], a[0] * b[1] - a[1] * b[0])
+
+def _dot(a, b):
+    return a[0] * b[0] + a[1] * b[1] + a[2] * b[2]
+
+def buildPieces(n):
+    """
+    Groups the stickers of an NxN cube by the cubie they belong to, every piece being a list of (side, row, col).
+    Corners are ordered clockwise starting at the U/D sticker, edges start at the U/D (else F/B) sticker
+    and wings start at the sticker that makes the pair right handed around the wing's offset.
+
+    Returns
+    -------
+    pieces : tuple
+        The lists of corners, edges and wings.
+    """
+    cubies = {}
+    for side in range(6):
+        for row in range(n):
+            for col in range(n):
+                position = stickerPosition(n, side, row, col)
+                cubie = tuple(c - d for c, d in zip(position, NORMALS[side]))
+                cubies.setdefault(cubie, []).append((side, row, col))
+    corners, edges, wings = [], [], []
+    for cubie, stickers in sorted(cubies.items()):
+        if(len(stickers) == 3):
+            first = [s for s in stickers if s[0] in (4, 5)][0]
+            rest = [s for s in stickers if s != first]
+            if(_dot(NORMALS[first[0]], _cross(NORMALS[rest[0][0]], NORMALS[rest[1][0]])) > 0):
+                rest.reverse()
+            corners.append([first] + rest)
+        elif(len(stickers) == 2):
+            inner = [axis for axis in range(3) if abs(cubie[axis]) != n - 1]
+            if(len(inner) == 1 and cubie[inner[0]] != 0):
+                offset = [0, 0, 0]
+                offset[inner[0]] = 1 if cubie[inner[0]] > 0 else -1
+                if(_dot(_cross(NORMALS[stickers[0][0]], NORMALS[stickers[1][0]]), offset) < 0):
+                    stickers.reverse()
+                wings.append(stickers)
+            else:
+                stickers.sort(key=lambda s: (s[0] not in (4, 5), s[0] not in (0, 2)))
+                edges.append(stickers)
+    return corners, edges, wings
+
+def buildSchemes():
+    """
+    Gives the 24 colorings of the faces (as tuples of center colors), one per orientation of the cube.
+    """
+    schemes = []
+    queue = [""]
+    while(len(queue) > 0):
+        form = queue.pop(0)
+        cube = Cube()
+        cube.doMoves(form)
+        scheme = tuple(cube.cube[side][1][1] for side in range(6))
+        if(scheme not in schemes):
+            schemes.append(scheme)
+            for rotation in ["x", "y", "z"]:
+                queue.append(form + rotation)
+    return schemes
+
+# compiled into the tables artifact by table_builder.py, built here when there is none
+PIECES = loadTables().get("pieces") or {n: buildPieces(n) for n in SIZES.values()}
+SCHEMES = loadTables().get("schemes") or buildSchemes()
+
+def _parity(permutation):
+    # parity of a permutation given as a list, 0 for even and 1 for odd
+    seen = [False] * len(permutation)
+    parity = 0
+    for start in range(len(permutation)):
+        length = 0
+        i = start
+        while(not seen[i]):
+            seen[i] = True
+            i = permutation[i]
+            length += 1
+        if(length > 0):
+            parity ^= (length - 1) & 1
+    return parity
+
+def _solvedColors(pieces, scheme):
+    return [tuple(scheme[side] for side, _, _ in piece) for piece in pieces]
+
+@lru_cache(maxsize=None)
+def _solvedTables(n, scheme):
+    # colors of every piece of the solved cube in the given scheme, mapped to (slot, orientation)
+    corners, edges, wings = PIECES[n]
+    cornerTable = {}
+    for slot, colors in enumerate(_solvedColors(corners, scheme)):
+        for twist in range(3):
+            cornerTable[colors[twist:] + colors[:twist]] = (slot, twist)
+    edgeTable = {}
+    for slot, colors in enumerate(_solvedColors(edges, scheme)):
+        edgeTable[colors] = (slot, 0)
+        edgeTable[colors[::-1]] = (slot, 1)
+    wingTable = frozenset(_solvedColors(wings, scheme))
+    return cornerTable, edgeTable, wingTable
+
+def _checkCorners(faces, corners, solved):
+    # gives the corner permutation after checking that the corners exist, are unique and are not twisted
+    permutation = []
+    twists = 0
+    for piece in corners:
+        colors = tuple(faces[side][row][col] for side, row, col in piece)
+        if(colors not in solved):
+            raise CubeStateError("INVALID_CORNER", "There is no corner with the colors " + "".join(colors))
+        slot, twist = solved[colors]
+        if(slot in permutation):
+            raise CubeStateError("DUPLICATE_CORNER", "The corner " + "".join(sorted(colors)) + " appears more than once")
+        permutation.append(slot)
+        twists += twist
+    if(twists % 3 != 0):
+        raise CubeStateError("TWISTED_CORNER", "A corner is twisted")
+    return permutation
+
+def _checkEdges(faces, edges, solved):
+    # gives the edge permutation after checking that the edges exist, are unique and are not flipped
+    permutation = []
+    flips = 0
+    for piece in edges:
+        colors = tuple(faces[side][row][col] for side, row, col in piece)
+        if(colors not in solved):
+            raise CubeStateError("INVALID_EDGE", "There is no edge with the colors " + "".join(colors))
+        slot, flip = solved[colors]
+        if(slot in permutation):
+            raise CubeStateError("DUPLICATE_EDGE", "The edge " + "".join(sorted(colors)) + " appears more than once")
+        permutation.append(slot)
+        flips += flip
+    if(flips % 2 != 0):
+        raise CubeStateError("FLIPPED_EDGE", "An edge is flipped")
+    return permutation
+
+def _checkWings(faces, wings, solved):
+    # wings cannot be flipped in place, so each one reads as a unique ordered color pair
+    seen = set()
+    for piece in wings:
+        colors = tuple(faces[side][row][col] for side, row, col in piece)
+        if(colors not in solved):
+            raise CubeStateError("INVALID_WING", "There is no edge wing with the colors " + "".join(colors))
+        if(colors in seen):
+            raise CubeStateError("DUPLICATE_WING", "The edge wing " + "".join(colors) + " appears more than once")
+        seen.add(colors)
+
+def validateState(cube_type, cube_state):
+    """
+    Checks that a cube state can be reached by turning a solved cube.
+
+    The stickers are grouped into cubies, then the pieces are checked for existence and
+    uniqueness, the corner twists and edge flips for their sums and the 3x3 permutations for
+    matching parity. This takes microseconds compared to the full solve it saves.
+
+    Parameters
+    ----------
+    cube_type : string
+        '2x2', '3x3' or '4x4'.
+    cube_state : list of size (6, N, N)
+        The cube faces matrix array.
+
+    Raises
+    ------
+    CubeStateError
+        If the state is impossible, with a `code` telling why.
+
+    Examples
+    --------
+    >>> validateState("3x3", Cube().getFaces())
+    >>> faces = Cube().getFaces()
+    >>> faces[0][0][0], faces[5][2][0] = faces[5][2][0], faces[0][0][0]
+    >>> validateState("3x3", faces)
+    Traceback (most recent call last):
+    ...
+    validator.CubeStateError: There is no corner with the colors GYR
+    """
+    n = SIZES.get(cube_type, 3)
+    if(not isinstance(cube_state, list) or len(cube_state) != 6 or
+       any(not isinstance(face, list) or len(face) != n or any(not isinstance(row, list) or len(row) != n for row in face) for face in cube_state)):
+        raise CubeStateError("INVALID_SHAPE", "A " + str(n) + "x" + str(n) + " cube needs 6 faces of " + str(n) + "x" + str(n) + " stickers")
+    counts = {color: 0 for color in COLORS}
+    for face in cube_state:
+        for row in face:
+            for sticker in row:
+                if(sticker not in counts):
+                    raise CubeStateError("INVALID_COLOR", "Unknown sticker color " + repr(sticker))
+                counts[sticker] += 1
+    for color in COLORS:
+        if(counts[color] != n * n):
+            raise CubeStateError("STICKER_COUNT", "There are " + str(counts[color]) + " " + color + " stickers instead of " + str(n * n))
+    corners, edges, wings = PIECES[n]
+    if(n == 3):
+        scheme = tuple(cube_state[side][1][1] for side in range(6))
+        if(scheme not in SCHEMES):
+            raise CubeStateError("INVALID_CENTERS", "The centers do not match the color scheme")
+    else:
+        # without fixed centers, the first corner decides the orientation of the color scheme
+        first = tuple(cube_state[side][row][col] for side, row, col in corners[0])
+        matches = [scheme for scheme in SCHEMES if tuple(scheme[side] for side, _, _ in corners[0]) == first]
+        if(len(matches) == 0):
+            raise CubeStateError("INVALID_CORNER", "There is no corner with the colors " + "".join(first))
+        scheme = matches[0]
+    cornerTable, edgeTable, wingTable = _solvedTables(n, scheme)
+    cornerPermutation = _checkCorners(cube_state, corners, cornerTable)
+    if(n == 3):
+        edgePermutation = _checkEdges(cube_state, edges, edgeTable)
+        if(_parity(cornerPermutation) != _parity(edgePermutation)):
+            raise CubeStateError("PARITY", "Two pieces are swapped")
+    if(n == 4):
+        _checkWings(cube_state, wings, wingTable)
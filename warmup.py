@@ -0,0 +1,162 @@
+import argparse
+import gc
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+from metrics import gauge
+
+# a scramble of every cube type, solved once by its default engine and by FALLBACKS, so that loading
+# the tables and compiling the formulas is done before the first request
+SCRAMBLES = {
+    "2x2": "R U2 F' R2 U' F R' U",
+    "3x3": "R U R' F2 D' L B2 U' R2 F D2 B' L2 U",
+    "4x4": "Rw U2 Fw' R D' Uw2 L B' Rw2 F U' Dw"
+}
+# the engines used when the tables of the default one are not built (the other 3x3 engines run CFOP)
+FALLBACKS = {
+    "2x2": ["ortega"],
+    "3x3": [],
+    "4x4": ["reduction"]
+}
+
+_warm = {}
+
+def warmUp(cube_types = None, log = None, freeze = False):
+    """
+    Loads the tables of the solvers and fills their caches, by solving SCRAMBLES.
+
+    Done in the gunicorn master before it forks its workers (see gunicorn.conf.py), the workers
+    inherit all of it: the memory-mapped tables (solver_tables.bin, table2x2.bin, table4x4.bin) are
+    shared through the page cache anyway, and the objects built from them (F2L index, move tables,
+    compiled formulas, macros) are shared copy-on-write. The objects are then moved out of reach of
+    the garbage collector with gc.freeze() (`freeze`), as a collection in a worker would otherwise
+    write to every page of them and have the worker copy them all.
+
+    Parameters
+    ----------
+    cube_types : list of strings, default=None
+        The cube types to warm up, every one of SCRAMBLES if None. Cube types already warm are skipped.
+    log : function, default=None
+        Called with a line of text per cube type.
+    freeze : bool, default=False
+        If set to True, everything alive afterwards is frozen with gc.freeze(). Only meant for a
+        process that is about to fork its workers: in a process serving requests it would also
+        keep the garbage of the requests in flight from ever being collected.
+
+    Returns
+    -------
+    timings : dict
+        The seconds the warm up of each cube type took, 0 for those already warm.
+
+    Raises
+    ------
+    ValueError
+        If a cube type is not one of SCRAMBLES.
+    """
+    # imported here so that importing this module (e.g. for the gunicorn config) loads nothing
+    from solve_service import getEngine, newCube, solveState
+    cube_types = list(SCRAMBLES) if cube_types is None else cube_types
+    unknown = [str(cube_type) for cube_type in cube_types if cube_type not in SCRAMBLES]
+    if(len(unknown) > 0):
+        raise ValueError("Unknown cube type " + ", ".join(unknown) + ", expected one of " + ", ".join(SCRAMBLES))
+    timings = {}
+    for cube_type in cube_types:
+        if(cube_type in _warm):
+            timings[cube_type] = 0.0
+            continue
+        start = time.perf_counter()
+        for engine in dict.fromkeys([getEngine(cube_type)] + FALLBACKS[cube_type]):
+            cube = newCube(cube_type)
+            cube.doMoves(SCRAMBLES[cube_type])
+            solveState(cube_type, cube.getFaces(), engine)
+        _warm[cube_type] = timings[cube_type] = time.perf_counter() - start
+        if(log is not None):
+            log(cube_type + " warm in " + str(round(_warm[cube_type] * 1000)) + " ms")
+    if(freeze and any(timings.values())):
+        gc.collect()
+        gc.freeze()
+    if(log is not None):
+        log("max RSS " + str(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss // 1024) + " MB, pid " + str(os.getpid()))
+    return timings
+
+def isWarm(cube_type):
+    """
+    Checks if a cube type was warmed up in this process (or in the process it was forked from).
+    """
+    return cube_type in _warm
+
+gauge("pycube_warmup_seconds", "Seconds the warm up of the solvers took, all cube types together.", lambda: sum(_warm.values()))
+
+def coldStart(cube_types = None, warm = False):
+    """
+    Measures how long a fresh process takes from importing app.py to its first response for a cube
+    type, as a worker started from zero would. Meant to run in a process of its own (see benchmark()).
+
+    Parameters
+    ----------
+    cube_types : list of strings, default=None
+        The cube types to solve one after the other, every one of SCRAMBLES if None.
+    warm : bool, default=False
+        If set to True, the app is created with create_app(), which warms PYCUBE_WARMUP up first.
+
+    Returns
+    -------
+    timings : dict
+        Milliseconds since the import started: "import" when app.py is imported, "ready" when the
+        app is created, and for every cube type when its /api/solve response is in.
+    """
+    started = time.perf_counter()
+    import app
+    timings = {"import": (time.perf_counter() - started) * 1000}
+    client = (app.create_app() if warm else app.app).test_client()
+    timings["ready"] = (time.perf_counter() - started) * 1000
+    for cube_type in (cube_types or list(SCRAMBLES)):
+        scramble = SCRAMBLES[cube_type]
+        response = client.post("/api/solve", json={"cube_type": cube_type, "cube_state": _scrambled(cube_type, scramble)})
+        if(not response.get_json().get("success")):
+            raise RuntimeError(cube_type + " solve failed: " + str(response.get_json().get("error")))
+        timings[cube_type] = (time.perf_counter() - started) * 1000
+    return timings
+
+def _scrambled(cube_type, scramble):
+    from solve_service import newCube
+    cube = newCube(cube_type)
+    cube.doMoves(scramble)
+    return cube.getFaces()
+
+def benchmark(runs = 5, cube_types = None, log = print):
+    """
+    Runs coldStart() in `runs` fresh processes, without and with the warm up, and reports the median
+    of every timing and the wall time of the whole process, interpreter start included.
+    """
+    results = {}
+    for warm in (False, True):
+        samples = []
+        for _ in range(runs):
+            started = time.perf_counter()
+            output = subprocess.run([sys.executable, os.path.abspath(__file__), "--cold-start", "--warm" if warm else "--lazy"]
+                                    + (cube_types or []), capture_output=True, text=True, check=True,
+                                    cwd=os.path.dirname(os.path.abspath(__file__))).stdout
+            timings = json.loads(output.strip().splitlines()[-1])
+            timings["process"] = (time.perf_counter() - started) * 1000
+            samples.append(timings)
+        medians = {name: sorted(sample[name] for sample in samples)[len(samples) // 2] for name in samples[0]}
+        results["warm" if warm else "lazy"] = medians
+        log(("warm: " if warm else "lazy: ") + ", ".join(name + " " + str(round(ms)) + " ms" for name, ms in medians.items()))
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmarks the cold start of the app: from importing it to its first responses.")
+    parser.add_argument("cube_types", nargs="*", help="cube types to solve, in order (default: all)")
+    parser.add_argument("--runs", type=int, default=5, help="fresh processes per measurement")
+    parser.add_argument("--cold-start", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--warm", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--lazy", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if(args.cold_start):
+        print(json.dumps(coldStart(args.cube_types or None, args.warm)))
+    else:
+        benchmark(args.runs, args.cube_types or None)